@@ -80,12 +80,17 @@ export function deleteBatch(batchId) {
   return apiDelete(`/batches/${batchId}`)
 }
 
+// maxAttempts only counts polls while the batch is running: a batch waiting
+// in the job queue (or for a retry) behind a long run is not timed out.
 export async function pollBatchUntilDone(batchId, { onProgress, intervalMs = 1000, maxAttempts = 600 } = {}) {
-  for (let attempt = 0; attempt < maxAttempts; attempt += 1) {
+  let attempts = 0
+  while (attempts < maxAttempts) {
     const status = await getBatchStatus(batchId)
     if (onProgress) onProgress(status.progress)
     if (status.status === 'done' || status.status === 'reviewed') return status
     if (status.status === 'failed') throw new Error('Batch processing failed')
+    if (status.status === 'cancelled') throw new Error('Batch processing was cancelled')
+    if (status.status !== 'queued') attempts += 1
     await new Promise((r) => setTimeout(r, intervalMs))
   }
   throw new Error('Batch polling timed out')
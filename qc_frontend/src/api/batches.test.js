@@ -66,6 +66,26 @@ describe('batches api', () => {
     await expect(pollBatchUntilDone('b1', { intervalMs: 0 })).rejects.toThrow(/failed/i)
   })
 
+  it('pollBatchUntilDone throws on cancelled', async () => {
+    vi.stubGlobal('fetch', fetchSequence([
+      { status: 200, body: { batch_id: 'b1', status: 'cancelled', progress: { done: 1, total: 3 } } },
+    ]))
+    await expect(pollBatchUntilDone('b1', { intervalMs: 0 })).rejects.toThrow(/cancelled/i)
+  })
+
+  it('pollBatchUntilDone does not count queued polls against maxAttempts', async () => {
+    const queued = { status: 200, body: { batch_id: 'b1', status: 'queued', progress: { done: 0, total: 0 } } }
+    const f = fetchSequence([
+      queued, queued, queued, queued,
+      { status: 200, body: { batch_id: 'b1', status: 'processing', progress: { done: 1, total: 3 } } },
+      { status: 200, body: { batch_id: 'b1', status: 'done', progress: { done: 3, total: 3 } } },
+    ])
+    vi.stubGlobal('fetch', f)
+    const res = await pollBatchUntilDone('b1', { intervalMs: 0, maxAttempts: 2 })
+    expect(res.status).toBe('done')
+    expect(f).toHaveBeenCalledTimes(6)
+  })
+
   it('listBatches maps snake_case to the frontend shape', async () => {
     vi.stubGlobal('fetch', fetchSequence([{
       status: 200,
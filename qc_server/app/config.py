@@ -10,6 +10,7 @@ class Settings(BaseSettings):
 
     database_url: str = f"sqlite:///{(BASE_DIR / 'data' / 'mqc.db').as_posix()}"
     data_dir: str = str(BASE_DIR / "data")
+    sqlite_profile: str = "performance"  # or "default" (SQLite's own settings)
     reviewer_email: str = "inspector@gspemail.com"
     cors_origins: str = "http://localhost:5757"
     camera_monitor_enabled: bool = True
@@ -17,6 +18,35 @@ class Settings(BaseSettings):
     models_dir: str = str(BASE_DIR / "models")
     stream_max_width: int = 960
     stream_max_fps: int = 15
+    # Detector seconds per second of live stream; with a budget the detector
+    # runs every k-th frame (k <= stream_max_stride) and boxes follow optical
+    # flow in between. 0 detects on every frame.
+    stream_detect_budget: float = 0.0
+    stream_max_stride: int = 8
+    stream_idle_grace_s: float = 10.0  # keep a camera's capture open after its last viewer
+    progress_stream_hz: float = 4.0  # max SSE progress events per second per client
+    job_workers: int = 1  # 0 runs jobs inline in the submitting request
+    interactive_job_workers: int = 1  # reserved for video extraction, on top of job_workers
+    job_max_attempts: int = 2  # retries resume from per-image checkpoints
+    ingest_workers: int = 8  # header reads when creating a batch
+    ingest_chunk: int = 500
+    watch_interval: float = 2.0  # seconds between watch-folder scans
+    batch_loader_workers: int = 4
+    batch_prefetch: int = 8
+    batch_write_queue: int = 32
+    batch_flush_images: int = 50
+    batch_flush_ms: int = 500
+    inference_batch_size: int = 4
+    result_jsonl: bool = False  # append result.jsonl per flushed chunk during runs
+    sam3_prompt_mode: str = "single_pass"  # or "per_class"
+    result_cache_enabled: bool = True
+    result_cache_max_rows: int = 200_000  # oldest entries are pruned beyond this; 0 = no cap
+    candidate_floor: float = 0.01  # matches SAM3SemanticPredictor(conf=0.01)
+    embedding_cache_mb: int = 1024  # 0 disables SAM image-embedding reuse
+    embedding_disk_cache_mb: int = 0  # >0 enables the on-disk tier under data_dir
+    warmup_enabled: bool = False  # preload + dummy inference at startup; /health 503 until done
+    model_memory_mb: int = 8192  # resident model budget (LRU, pinned models exempt)
+    inference_processes: int = 0  # >0 runs detection/segmentation in worker processes
 
 
 settings = Settings()
@@ -1,14 +1,49 @@
 from collections.abc import Iterator
 
-from sqlalchemy import create_engine, inspect as sa_inspect, text
+from sqlalchemy import create_engine, event, inspect as sa_inspect, text
 from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker
 
 from .config import settings
 
+# Connection-time pragmas per profile. "performance": WAL lets readers (UI
+# polling, exports) run alongside the batch writer; synchronous=NORMAL is
+# durable across app crashes under WAL and only risks the last commits on
+# power loss; busy_timeout makes concurrent writers wait instead of failing.
+SQLITE_PROFILES = {
+    "default": {},
+    "performance": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        "temp_store": "MEMORY",
+        "cache_size": -65536,  # KiB -> 64 MiB page cache per connection
+        "mmap_size": 268435456,
+    },
+}
+
+
+def apply_sqlite_profile(eng, profile: str) -> None:
+    if eng.dialect.name != "sqlite":
+        return
+    pragmas = SQLITE_PROFILES[profile]
+    if not pragmas:
+        return
+
+    @event.listens_for(eng, "connect")
+    def _set_pragmas(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
 engine = create_engine(
     settings.database_url,
     connect_args={"check_same_thread": False},
 )
+apply_sqlite_profile(engine, settings.sqlite_profile)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
 
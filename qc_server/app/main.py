@@ -2,9 +2,10 @@ import os
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from .config import settings
-from .database import Base, engine
+from .database import engine
 from .routers import (
     audit,
     batches,
@@ -12,6 +13,7 @@ from .routers import (
     defect_classes,
     detect,
     images,
+    jobs,
     models as models_router,
     settings as settings_router,
 )
@@ -30,18 +32,26 @@ app.add_middleware(
 def on_startup():
     os.makedirs(os.path.join(settings.data_dir, "batches"), exist_ok=True)
     from . import models  # noqa: F401
-    from .database import SessionLocal, ensure_active_model_column, ensure_column
+    from .database import SessionLocal
+    from .migrations import migrate
+    from .services import scheduler
+    from .services.pipeline import recover_interrupted
     from .services.seed import seed_if_empty
-    Base.metadata.create_all(engine)
-    ensure_active_model_column(engine)
-    ensure_column(engine, "settings", "input_mode_enabled", "BOOLEAN DEFAULT 1")
-    ensure_column(engine, "settings", "qc_model", "VARCHAR DEFAULT ''")
-    ensure_column(engine, "settings", "qc_confidence_threshold", "FLOAT DEFAULT 0.5")
+    migrate(engine)
     db = SessionLocal()
     try:
         seed_if_empty(db)
+        scheduler.recover(db)
+        recover_interrupted(db)
     finally:
         db.close()
+    scheduler.start(SessionLocal, settings.job_workers,
+                    lanes={scheduler.INTERACTIVE: settings.interactive_job_workers})
+    if settings.warmup_enabled or settings.inference_processes > 0:
+        # Worker processes always preload their models, but only an enabled
+        # warm-up (with dummy inference) holds /health at 503.
+        from .services import warmup
+        warmup.start(SessionLocal, infer=settings.warmup_enabled)
     if settings.camera_monitor_enabled:
         import threading
         from .database import SessionLocal as _SessionLocal
@@ -50,11 +60,30 @@ def on_startup():
         start_monitor(_SessionLocal, settings.camera_poll_interval, app.state.camera_monitor_stop)
 
 
+@app.on_event("shutdown")
+def on_shutdown():
+    from .services import camera_hub, folder_watch, inference_pool, scheduler
+    camera_hub.stop_all()
+    folder_watch.stop_all()
+    scheduler.stop()
+    inference_pool.shutdown()
+
+
 @app.get("/health")
 def health():
+    from .services import warmup
+    if warmup.warming():
+        # Not ready: keep the load balancer away until models are warm.
+        return JSONResponse({"status": "warming", "warmup": warmup.status()}, status_code=503)
     return {"status": "ok"}
 
 
+@app.get("/health/warmup")
+def health_warmup():
+    from .services import warmup
+    return warmup.status()
+
+
 app.include_router(cameras.router)
 app.include_router(defect_classes.router)
 app.include_router(models_router.router)
@@ -63,3 +92,4 @@ app.include_router(settings_router.router)
 app.include_router(audit.router)
 app.include_router(batches.router)
 app.include_router(images.router)
+app.include_router(jobs.router)
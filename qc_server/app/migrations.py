@@ -0,0 +1,162 @@
+"""Ordered schema migrations, recorded in the ``schema_version`` table.
+
+A new database is created straight from the models and stamped with the
+latest version. An existing one runs every migration newer than its recorded
+version, once and in order; a database from before this table existed starts
+at version 0, which is safe because the early migrations check what is
+already there. Startup on an up-to-date database is a single query.
+
+Add a migration by appending a ``@migration(n, "...")`` function with the
+next number; never renumber or edit one that has shipped.
+"""
+
+from collections.abc import Callable
+
+from sqlalchemy import (
+    Column, Integer, MetaData, String, Table, func, inspect as sa_inspect, select, text,
+)
+from sqlalchemy.exc import OperationalError
+
+from . import models  # noqa: F401  (register tables on Base)
+from .database import Base, ensure_column
+from .util import now_iso
+
+_meta = MetaData()
+schema_version = Table(
+    "schema_version",
+    _meta,
+    Column("version", Integer, primary_key=True),
+    Column("name", String),
+    Column("applied_at", String),
+)
+
+MIGRATIONS: list[tuple[int, str, Callable]] = []
+
+
+def migration(version, name):
+    """Register ``fn(engine)`` as migration ``version``."""
+
+    def register(fn):
+        if MIGRATIONS and version <= MIGRATIONS[-1][0]:
+            raise ValueError(f"migration {version} is out of order")
+        MIGRATIONS.append((version, name, fn))
+        return fn
+
+    return register
+
+
+def _create_indexes(eng, table, *names) -> None:
+    indexes = {i.name: i for i in Base.metadata.tables[table].indexes}
+    for name in names:
+        indexes[name].create(eng, checkfirst=True)
+
+
+@migration(1, "create missing tables")
+def _tables(eng):
+    Base.metadata.create_all(eng)
+
+
+@migration(2, "settings model columns")
+def _settings_columns(eng):
+    ensure_column(eng, "settings", "active_model", "VARCHAR DEFAULT ''")
+    ensure_column(eng, "settings", "input_mode_enabled", "BOOLEAN DEFAULT 1")
+    ensure_column(eng, "settings", "qc_model", "VARCHAR DEFAULT ''")
+    ensure_column(eng, "settings", "qc_confidence_threshold", "FLOAT DEFAULT 0.5")
+
+
+@migration(3, "batch candidate cache")
+def _candidate_cache(eng):
+    ensure_column(eng, "batches", "candidate_fingerprint", "VARCHAR")
+    ensure_column(eng, "batches", "candidate_floor", "FLOAT")
+
+
+@migration(4, "image checkpoints")
+def _image_checkpoints(eng):
+    ensure_column(eng, "images", "processed_fingerprint", "VARCHAR")
+
+
+@migration(5, "lookup indexes")
+def _lookup_indexes(eng):
+    _create_indexes(eng, "defects", "ix_defects_image_id")
+    _create_indexes(eng, "candidates", "ix_candidates_image_id")
+    _create_indexes(eng, "images", "ix_images_batch_filename", "ix_images_batch_reviewed")
+    _create_indexes(eng, "batches", "ix_batches_created_at")
+    _create_indexes(eng, "audit_logs", "ix_audit_logs_timestamp")
+    _create_indexes(eng, "jobs", "ix_jobs_status_priority", "ix_jobs_target_id")
+
+
+@migration(6, "batch counters")
+def _batch_counters(eng):
+    ensure_column(eng, "images", "defect_count", "INTEGER DEFAULT 0")
+    for name in ("reviewed_count", "pending_count", "clean_count", "defect_image_count"):
+        ensure_column(eng, "batches", name, "INTEGER DEFAULT 0")
+    # Plain SQL rather than the ORM: this must keep working as the models change.
+    with eng.begin() as conn:
+        if conn.execute(text("SELECT 1 FROM batches LIMIT 1")).first() is None:
+            return
+        conn.execute(text(
+            "UPDATE images SET defect_count = "
+            "(SELECT COUNT(*) FROM defects WHERE defects.image_id = images.id)"
+        ))
+        conn.execute(text(_BATCH_COUNTERS_SQL))
+
+
+_BATCH_COUNTERS_SQL = """
+UPDATE batches SET
+    image_count = (SELECT COUNT(*) FROM images WHERE images.batch_id = batches.id),
+    defect_count = (SELECT COALESCE(SUM(defect_count), 0) FROM images
+                    WHERE images.batch_id = batches.id),
+    reviewed_count = (SELECT COUNT(*) FROM images
+                      WHERE images.batch_id = batches.id AND images.reviewed = 1),
+    pending_count = (SELECT COUNT(*) FROM images
+                     WHERE images.batch_id = batches.id AND images.status = 'pending'),
+    clean_count = (SELECT COUNT(*) FROM images
+                   WHERE images.batch_id = batches.id AND images.status = 'clean'),
+    defect_image_count = (SELECT COUNT(*) FROM images
+                          WHERE images.batch_id = batches.id AND images.status = 'defect')
+"""
+
+
+@migration(7, "camera motion gate")
+def _camera_motion_gate(eng):
+    ensure_column(eng, "cameras", "motion_threshold", "FLOAT DEFAULT 0")
+
+
+def latest_version() -> int:
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def current_version(eng) -> int | None:
+    """Recorded version; None when the database has no ``schema_version``."""
+    try:
+        with eng.connect() as conn:
+            return conn.execute(select(func.max(schema_version.c.version))).scalar() or 0
+    except OperationalError:
+        return None
+
+
+def _record(eng, version, name) -> None:
+    with eng.begin() as conn:
+        conn.execute(schema_version.insert().values(
+            version=version, name=name, applied_at=now_iso()))
+
+
+def migrate(eng) -> list[int]:
+    """Bring the database up to the latest version; returns the versions applied."""
+    version = current_version(eng)
+    if version is None:
+        fresh = not sa_inspect(eng).get_table_names()
+        _meta.create_all(eng)
+        if fresh:
+            Base.metadata.create_all(eng)
+            _record(eng, latest_version(), "initial schema")
+            return []
+        version = 0
+    applied = []
+    for number, name, fn in MIGRATIONS:
+        if number <= version:
+            continue
+        fn(eng)
+        _record(eng, number, name)
+        applied.append(number)
+    return applied
@@ -1,4 +1,4 @@
-from sqlalchemy import JSON, Boolean, Float, ForeignKey, Integer, String
+from sqlalchemy import JSON, Boolean, Float, ForeignKey, Index, Integer, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .database import Base
@@ -15,6 +15,9 @@ class Camera(Base):
     resolution: Mapped[str] = mapped_column(String, default="")
     fps: Mapped[int] = mapped_column(Integer, default=0)
     count_mode: Mapped[str] = mapped_column(String, default="single")
+    # Fraction of a frame's thumbnail that must change for detection to run;
+    # 0 detects on every frame (see services/motion_gate.py).
+    motion_threshold: Mapped[float] = mapped_column(Float, default=0.0)
 
 
 class DefectClass(Base):
@@ -42,7 +45,7 @@ class Setting(Base):
 class AuditLog(Base):
     __tablename__ = "audit_logs"
     id: Mapped[str] = mapped_column(String, primary_key=True)
-    timestamp: Mapped[str] = mapped_column(String)
+    timestamp: Mapped[str] = mapped_column(String, index=True)
     user: Mapped[str] = mapped_column(String)
     action: Mapped[str] = mapped_column(String)
     detail: Mapped[str] = mapped_column(String, default="")
@@ -54,17 +57,32 @@ class Batch(Base):
     name: Mapped[str] = mapped_column(String)
     source_path: Mapped[str] = mapped_column(String)
     camera_id: Mapped[str | None] = mapped_column(String, nullable=True)
-    created_at: Mapped[str] = mapped_column(String)
+    created_at: Mapped[str] = mapped_column(String, index=True)
     image_count: Mapped[int] = mapped_column(Integer, default=0)
     defect_count: Mapped[int] = mapped_column(Integer, default=0)
+    # Maintained by services.batch_counters alongside image_count/defect_count.
+    reviewed_count: Mapped[int] = mapped_column(Integer, default=0)
+    pending_count: Mapped[int] = mapped_column(Integer, default=0)
+    clean_count: Mapped[int] = mapped_column(Integer, default=0)
+    defect_image_count: Mapped[int] = mapped_column(Integer, default=0)
     status: Mapped[str] = mapped_column(String, default="processing")
     reviewer: Mapped[str | None] = mapped_column(String, nullable=True)
     model_info: Mapped[dict] = mapped_column(JSON, default=dict)
     error: Mapped[str | None] = mapped_column(String, nullable=True)
+    # Set after a complete run: which model configuration produced the stored
+    # candidates and the lowest confidence they were kept at.
+    candidate_fingerprint: Mapped[str | None] = mapped_column(String, nullable=True)
+    candidate_floor: Mapped[float | None] = mapped_column(Float, nullable=True)
 
 
 class Image(Base):
     __tablename__ = "images"
+    # Batch lookups and result/export ordering by filename within a batch;
+    # (batch_id, reviewed) covers the per-batch reviewed counts of the batch list.
+    __table_args__ = (
+        Index("ix_images_batch_filename", "batch_id", "filename"),
+        Index("ix_images_batch_reviewed", "batch_id", "reviewed"),
+    )
     id: Mapped[str] = mapped_column(String, primary_key=True)
     batch_id: Mapped[str] = mapped_column(ForeignKey("batches.id"))
     filename: Mapped[str] = mapped_column(String)
@@ -73,17 +91,62 @@ class Image(Base):
     height: Mapped[int] = mapped_column(Integer)
     status: Mapped[str] = mapped_column(String, default="clean")
     reviewed: Mapped[bool] = mapped_column(Boolean, default=False)
+    defect_count: Mapped[int] = mapped_column(Integer, default=0)
+    # Checkpoint of the run configuration that last completed this image.
+    processed_fingerprint: Mapped[str | None] = mapped_column(String, nullable=True)
     defects: Mapped[list["Defect"]] = relationship(
         back_populates="image", cascade="all, delete-orphan"
     )
+    candidates: Mapped[list["Candidate"]] = relationship(cascade="all, delete-orphan")
 
 
 class Defect(Base):
     __tablename__ = "defects"
     id: Mapped[str] = mapped_column(String, primary_key=True)
-    image_id: Mapped[str] = mapped_column(ForeignKey("images.id"))
+    image_id: Mapped[str] = mapped_column(ForeignKey("images.id"), index=True)
     type: Mapped[str] = mapped_column(String)
     category: Mapped[str] = mapped_column(String)
     confidence: Mapped[float] = mapped_column(Float)
     polygon: Mapped[list] = mapped_column(JSON)
     image: Mapped["Image"] = relationship(back_populates="defects")
+
+
+class Candidate(Base):
+    """Raw strategy output above the candidate floor, re-filtered into
+    ``Defect`` rows when only the confidence threshold changes."""
+
+    __tablename__ = "candidates"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    image_id: Mapped[str] = mapped_column(ForeignKey("images.id"), index=True)
+    type: Mapped[str] = mapped_column(String)
+    category: Mapped[str] = mapped_column(String)
+    confidence: Mapped[float] = mapped_column(Float)
+    polygon: Mapped[list] = mapped_column(JSON)
+
+
+class ResultCacheEntry(Base):
+    __tablename__ = "result_cache"
+    key: Mapped[str] = mapped_column(String, primary_key=True)
+    detections: Mapped[list] = mapped_column(JSON)
+    created_at: Mapped[str] = mapped_column(String)
+
+
+class Job(Base):
+    """Persistent background job (batch run, ingest, video extract)."""
+
+    __tablename__ = "jobs"
+    __table_args__ = (Index("ix_jobs_status_priority", "status", "priority", "enqueued_at"),)
+    id: Mapped[str] = mapped_column(String, primary_key=True)
+    kind: Mapped[str] = mapped_column(String)
+    target_id: Mapped[str] = mapped_column(String, index=True)
+    params: Mapped[dict] = mapped_column(JSON, default=dict)
+    priority: Mapped[int] = mapped_column(Integer, default=0)
+    status: Mapped[str] = mapped_column(String, default="queued")
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    max_attempts: Mapped[int] = mapped_column(Integer, default=1)
+    cancel_requested: Mapped[bool] = mapped_column(Boolean, default=False)
+    error: Mapped[str | None] = mapped_column(String, nullable=True)
+    enqueued_at: Mapped[float] = mapped_column(Float)
+    created_at: Mapped[str] = mapped_column(String)
+    started_at: Mapped[str | None] = mapped_column(String, nullable=True)
+    finished_at: Mapped[str | None] = mapped_column(String, nullable=True)
@@ -1,13 +1,17 @@
+import base64
+import json
 import os
 import shutil
+from typing import Literal
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, select, tuple_, update
+from sqlalchemy.orm import Session, selectinload
 
 from ..config import settings as app_settings
 from ..database import SessionLocal, get_db
-from ..models import Batch, Defect, Image
+from ..models import Batch, Candidate, Defect, Image
 from ..schemas import (
     BatchCreate,
     BatchCreateResponse,
@@ -16,16 +20,22 @@ from ..schemas import (
     BatchRunRequest,
     BatchStatusOut,
     BatchSummary,
+    BatchWatchOut,
+    BatchWatchRequest,
     DefectCreate,
     DefectOut,
     DefectPatch,
     ImageOut,
+    ImagePage,
     ImagePatch,
+    ImageSummaryOut,
+    JobOut,
     SegmentRequest,
     SegmentResponse,
 )
-from ..services import job_queue
-from ..services.pipeline import prepare_images, run_batch
+from ..services import batch_counters, folder_watch, job_queue, scheduler
+from ..services.pipeline import BUSY_STATUSES, prepare_images
+from ..services.progress_stream import RUNNING, progress_events
 from ..util import gen_id, now_iso
 from .settings import get_or_create_setting
 
@@ -46,20 +56,6 @@ def _defect_for_image(db: Session, image_id: str, defect_id: str) -> Defect:
     return defect
 
 
-def _recompute_defects(db: Session, batch_id: str, image: Image):
-    db.flush()
-    image_count = db.query(func.count(Defect.id)).filter(Defect.image_id == image.id).scalar() or 0
-    image.status = "defect" if image_count else "clean"
-    batch = db.get(Batch, batch_id)
-    batch.defect_count = (
-        db.query(func.count(Defect.id))
-        .join(Image, Defect.image_id == Image.id)
-        .filter(Image.batch_id == batch_id)
-        .scalar()
-        or 0
-    )
-
-
 @router.post("", response_model=BatchCreateResponse, status_code=201)
 def submit_batch(payload: BatchCreate, db: Session = Depends(get_db)):
     # Creates the batch in a "pending" state. Segmentation is started
@@ -73,7 +69,7 @@ def submit_batch(payload: BatchCreate, db: Session = Depends(get_db)):
         source_path=payload.source_path,
         camera_id=payload.camera_id,
         created_at=now_iso(),
-        status="pending",
+        status="ingesting" if payload.background_ingest else "pending",
         model_info={
             "detection": setting.detection_model,
             "segmentation": setting.segmentation_model,
@@ -83,28 +79,37 @@ def submit_batch(payload: BatchCreate, db: Session = Depends(get_db)):
     )
     db.add(batch)
     db.commit()
-    prepare_images(db, batch)
+    if payload.background_ingest:
+        job_queue.set_total(batch_id, 0)
+        job_id = scheduler.submit(db, "batch_ingest", batch_id).id
+    else:
+        prepare_images(db, batch)
     return BatchCreateResponse(batch_id=batch_id, job_id=job_id)
 
 
 @router.post("/{batch_id}/run", response_model=BatchStatusOut)
 def run_batch_endpoint(batch_id: str, payload: BatchRunRequest,
-                       background: BackgroundTasks, db: Session = Depends(get_db)):
+                       db: Session = Depends(get_db)):
     batch = db.get(Batch, batch_id)
     if not batch:
         raise HTTPException(404, "batch not found")
-    if batch.status == "processing":
-        raise HTTPException(409, "batch already processing")
-    batch.status = "processing"
+    if batch.status in BUSY_STATUSES:
+        raise HTTPException(409, f"batch already {batch.status}")
+    batch.status = "queued"
     if payload.confidence_threshold is not None and isinstance(batch.model_info, dict):
         info = dict(batch.model_info)
         info["confidence"] = payload.confidence_threshold
         batch.model_info = info
     db.commit()
     job_queue.set_total(batch_id, 0)
-    background.add_task(run_batch, batch_id, SessionLocal, payload.confidence_threshold)
-    return BatchStatusOut(batch_id=batch_id, status="processing",
-                          progress=job_queue.get(batch_id))
+    job = scheduler.submit(
+        db, "batch_run", batch_id,
+        {"confidence_threshold": payload.confidence_threshold, "resume": payload.resume},
+        priority=payload.priority, max_attempts=app_settings.job_max_attempts,
+    )
+    db.refresh(batch)
+    return BatchStatusOut(batch_id=batch_id, status=batch.status,
+                          progress=job_queue.get(batch_id), job_id=job.id)
 
 
 @router.post("/{batch_id}/reset", response_model=BatchStatusOut)
@@ -112,15 +117,21 @@ def reset_batch(batch_id: str, db: Session = Depends(get_db)):
     batch = db.get(Batch, batch_id)
     if not batch:
         raise HTTPException(404, "batch not found")
-    if batch.status == "processing":
-        raise HTTPException(409, "batch is processing")
-    images = db.query(Image).filter(Image.batch_id == batch_id).all()
-    for image in images:
-        image.defects.clear()
-        image.status = "pending"
-        image.reviewed = False
+    if batch.status in BUSY_STATUSES:
+        raise HTTPException(409, f"batch is {batch.status}")
+    # Results and every checkpoint go: a resume after a reset must re-infer,
+    # and a re-run must not re-filter candidates from before the reset.
+    image_ids = select(Image.id).where(Image.batch_id == batch_id)
+    db.execute(delete(Defect).where(Defect.image_id.in_(image_ids)))
+    db.execute(delete(Candidate).where(Candidate.image_id.in_(image_ids)))
+    db.execute(
+        update(Image).where(Image.batch_id == batch_id)
+        .values(status="pending", reviewed=False, defect_count=0, processed_fingerprint=None)
+    )
+    batch_counters.recount(db, batch_id)
+    batch.candidate_fingerprint = None
+    batch.candidate_floor = None
     batch.status = "pending"
-    batch.defect_count = 0
     batch.reviewer = None
     batch.error = None
     db.commit()
@@ -128,24 +139,33 @@ def reset_batch(batch_id: str, db: Session = Depends(get_db)):
                           progress=job_queue.get(batch_id))
 
 
+def _summary(b: Batch) -> BatchSummary:
+    return BatchSummary(
+        id=b.id, name=b.name, source_path=b.source_path, camera_id=b.camera_id,
+        created_at=b.created_at, image_count=b.image_count, defect_count=b.defect_count,
+        status=b.status, reviewer=b.reviewer, model_info=b.model_info,
+        reviewed_count=b.reviewed_count or 0,
+        status_counts=batch_counters.status_counts(b),
+    )
+
+
 @router.get("", response_model=list[BatchSummary])
 def list_batches(db: Session = Depends(get_db)):
     batches = db.query(Batch).order_by(Batch.created_at.desc()).all()
-    reviewed_counts = dict(
-        db.query(Image.batch_id, func.count(Image.id))
-        .filter(Image.reviewed.is_(True))
-        .group_by(Image.batch_id)
-        .all()
-    )
-    return [
-        BatchSummary(
-            id=b.id, name=b.name, source_path=b.source_path, camera_id=b.camera_id,
-            created_at=b.created_at, image_count=b.image_count, defect_count=b.defect_count,
-            status=b.status, reviewer=b.reviewer, model_info=b.model_info,
-            reviewed_count=reviewed_counts.get(b.id, 0),
-        )
-        for b in batches
-    ]
+    return [_summary(b) for b in batches]
+
+
+@router.post("/recount", response_model=JobOut, status_code=202)
+def recount_all_batches(db: Session = Depends(get_db)):
+    """Repair job: recompute every batch's counters from its rows."""
+    return scheduler.submit(db, "batch_recount", batch_counters.ALL_BATCHES)
+
+
+@router.post("/{batch_id}/recount", response_model=JobOut, status_code=202)
+def recount_batch(batch_id: str, db: Session = Depends(get_db)):
+    if db.get(Batch, batch_id) is None:
+        raise HTTPException(404, "batch not found")
+    return scheduler.submit(db, "batch_recount", batch_id)
 
 
 @router.get("/{batch_id}/status", response_model=BatchStatusOut)
@@ -153,8 +173,56 @@ def batch_status(batch_id: str, db: Session = Depends(get_db)):
     batch = db.get(Batch, batch_id)
     if not batch:
         raise HTTPException(404, "batch not found")
+    job = scheduler.active_job(db, batch_id)
     return BatchStatusOut(batch_id=batch_id, status=batch.status,
-                          progress=job_queue.get(batch_id))
+                          progress=job_queue.get(batch_id), job_id=job.id if job else None)
+
+
+@router.get("/{batch_id}/progress/stream")
+def batch_progress_stream(batch_id: str):
+    # Server-sent progress; /status stays as the polling fallback. The DB is
+    # read once here, the stream itself only reads job_queue.
+    db = SessionLocal()
+    try:
+        batch = db.get(Batch, batch_id)
+        if not batch:
+            raise HTTPException(404, "batch not found")
+        fallback = RUNNING if batch.status in BUSY_STATUSES else batch.status
+    finally:
+        db.close()
+    return StreamingResponse(progress_events(batch_id, fallback), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.post("/{batch_id}/watch", response_model=BatchWatchOut)
+def start_watch(batch_id: str, payload: BatchWatchRequest, db: Session = Depends(get_db)):
+    # New files in source_path are ingested and segmented as they land.
+    batch = db.get(Batch, batch_id)
+    if not batch:
+        raise HTTPException(404, "batch not found")
+    if not os.path.isdir(batch.source_path):
+        raise HTTPException(400, "source_path is not a directory")
+    known = [name for (name,) in db.query(Image.filename).filter(Image.batch_id == batch_id)]
+    watcher = folder_watch.start(SessionLocal, batch, payload.interval or app_settings.watch_interval,
+                                 known)
+    return BatchWatchOut(batch_id=batch_id, **watcher.status())
+
+
+@router.get("/{batch_id}/watch", response_model=BatchWatchOut)
+def watch_status(batch_id: str):
+    watcher = folder_watch.get(batch_id)
+    if watcher is None:
+        return BatchWatchOut(batch_id=batch_id, watching=False)
+    return BatchWatchOut(batch_id=batch_id, **watcher.status())
+
+
+@router.delete("/{batch_id}/watch", response_model=BatchWatchOut)
+def stop_watch(batch_id: str):
+    watcher = folder_watch.get(batch_id)
+    if watcher is None:
+        raise HTTPException(404, "batch is not being watched")
+    folder_watch.stop(batch_id)
+    return BatchWatchOut(batch_id=batch_id, **{**watcher.status(), "watching": False})
 
 
 @router.get("/{batch_id}", response_model=BatchResult)
@@ -162,7 +230,11 @@ def get_batch(batch_id: str, db: Session = Depends(get_db)):
     batch = db.get(Batch, batch_id)
     if not batch:
         raise HTTPException(404, "batch not found")
-    images = db.query(Image).filter(Image.batch_id == batch_id).all()
+    images = db.scalars(
+        select(Image).where(Image.batch_id == batch_id)
+        .options(selectinload(Image.defects))
+        .order_by(Image.filename, Image.id)
+    ).all()
     return BatchResult(
         batch_name=batch.name,
         source_path=batch.source_path,
@@ -170,6 +242,68 @@ def get_batch(batch_id: str, db: Session = Depends(get_db)):
     )
 
 
+def _encode_cursor(image: Image) -> str:
+    raw = json.dumps([image.filename, image.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[str, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        filename, image_id = json.loads(raw)
+        return str(filename), str(image_id)
+    except (ValueError, TypeError) as exc:
+        raise HTTPException(400, "invalid cursor") from exc
+
+
+@router.get("/{batch_id}/images", response_model=ImagePage)
+def list_batch_images(
+    batch_id: str,
+    cursor: str | None = None,
+    limit: int = Query(200, ge=1, le=1000),
+    status: str | None = None,
+    reviewed: bool | None = None,
+    defect_type: list[str] | None = Query(None),
+    fields: Literal["summary", "full"] = "summary",
+    db: Session = Depends(get_db),
+):
+    """One page of a batch's images in filename order.
+
+    ``fields=summary`` (the default) leaves defect polygons out, which is
+    what the review strip needs; fetch the polygons of the image on screen
+    from ``GET /{batch_id}/images/{image_id}``.
+    """
+    if db.get(Batch, batch_id) is None:
+        raise HTTPException(404, "batch not found")
+    stmt = select(Image).where(Image.batch_id == batch_id)
+    if status is not None:
+        stmt = stmt.where(Image.status == status)
+    if reviewed is not None:
+        stmt = stmt.where(Image.reviewed.is_(reviewed))
+    if defect_type:
+        stmt = stmt.where(Image.defects.any(Defect.type.in_(defect_type)))
+    if cursor:
+        stmt = stmt.where(tuple_(Image.filename, Image.id) > tuple_(*_decode_cursor(cursor)))
+    defects = selectinload(Image.defects)
+    if fields == "summary":
+        defects = defects.load_only(Defect.id, Defect.type, Defect.category, Defect.confidence)
+    images = db.scalars(
+        stmt.options(defects).order_by(Image.filename, Image.id).limit(limit + 1)
+    ).all()
+    more = len(images) > limit
+    images = images[:limit]
+    out = ImageSummaryOut if fields == "summary" else ImageOut
+    return ImagePage(
+        items=[out.model_validate(im) for im in images],
+        next_cursor=_encode_cursor(images[-1]) if more else None,
+    )
+
+
+@router.get("/{batch_id}/images/{image_id}", response_model=ImageOut)
+def get_batch_image(batch_id: str, image_id: str, db: Session = Depends(get_db)):
+    return _batch_image(db, batch_id, image_id)
+
+
 @router.patch("/{batch_id}", response_model=BatchSummary)
 def patch_batch(batch_id: str, payload: BatchPatch, db: Session = Depends(get_db)):
     batch = db.get(Batch, batch_id)
@@ -179,7 +313,7 @@ def patch_batch(batch_id: str, payload: BatchPatch, db: Session = Depends(get_db
         setattr(batch, key, value)
     db.commit()
     db.refresh(batch)
-    return batch
+    return _summary(batch)
 
 
 @router.delete("/{batch_id}")
@@ -187,9 +321,13 @@ def delete_batch(batch_id: str, db: Session = Depends(get_db)):
     batch = db.get(Batch, batch_id)
     if not batch:
         raise HTTPException(404, "batch not found")
+    folder_watch.stop(batch_id)
     image_ids = [i.id for i in db.query(Image).filter(Image.batch_id == batch_id).all()]
     if image_ids:
-        db.query(Defect).filter(Defect.image_id.in_(image_ids)).delete(synchronize_session=False)
+        for model in (Defect, Candidate):
+            db.query(model).filter(model.image_id.in_(image_ids)).delete(
+                synchronize_session=False
+            )
     db.query(Image).filter(Image.batch_id == batch_id).delete(synchronize_session=False)
     db.delete(batch)
     db.commit()
@@ -203,7 +341,7 @@ def patch_image(batch_id: str, image_id: str, payload: ImagePatch,
     image = db.get(Image, image_id)
     if not image or image.batch_id != batch_id:
         raise HTTPException(404, "image not found")
-    image.reviewed = payload.reviewed
+    batch_counters.review_changed(db, image, payload.reviewed)
     db.commit()
     db.refresh(image)
     return ImageOut.model_validate(image)
@@ -223,7 +361,7 @@ def create_defect(batch_id: str, image_id: str, payload: DefectCreate,
         polygon=payload.polygon,
     )
     db.add(defect)
-    _recompute_defects(db, batch_id, image)
+    batch_counters.defects_changed(db, image, 1)
     db.commit()
     db.refresh(defect)
     return DefectOut.model_validate(defect)
@@ -237,7 +375,6 @@ def patch_defect(batch_id: str, image_id: str, defect_id: str, payload: DefectPa
     defect = _defect_for_image(db, image.id, defect_id)
     for key, value in payload.model_dump(exclude_none=True).items():
         setattr(defect, key, value)
-    _recompute_defects(db, batch_id, image)
     db.commit()
     db.refresh(defect)
     return DefectOut.model_validate(defect)
@@ -249,7 +386,7 @@ def delete_defect(batch_id: str, image_id: str, defect_id: str,
     image = _batch_image(db, batch_id, image_id)
     defect = _defect_for_image(db, image.id, defect_id)
     db.delete(defect)
-    _recompute_defects(db, batch_id, image)
+    batch_counters.defects_changed(db, image, -1)
     db.commit()
     return {"deleted": defect_id}
 
@@ -293,8 +430,7 @@ def delete_image(batch_id: str, image_id: str, db: Session = Depends(get_db)):
     path = os.path.join(batch.source_path, image.filename)
     if os.path.exists(path):
         os.remove(path)
+    batch_counters.image_removed(db, image)
     db.delete(image)
     db.commit()
-    batch.image_count = db.query(Image).filter(Image.batch_id == batch_id).count()
-    db.commit()
     return {"deleted": image_id}
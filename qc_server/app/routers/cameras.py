@@ -8,16 +8,13 @@ from ..config import settings as app_settings
 from ..database import get_db
 from ..models import Camera
 from ..schemas import CameraIn, CameraOut
-from ..services.annotated_stream import annotated_mjpeg, downscale
+from ..services import camera_hub
+from ..services.annotated_stream import downscale
 from ..services.crop_session import approve_session, crop_file_path, get_session, reset_session
-from ..services.frame_grabber import FrameGrabber
 from ..services.object_detection import detect, resolve_model_path
-from ..services.presence_counter import PresenceCounter
-from ..services.streaming import grab_one, mjpeg_frames
 from .settings import get_or_create_setting
 
 router = APIRouter(prefix="/api/cameras", tags=["cameras"])
-_latest_stats: dict[str, dict] = {}
 
 
 @router.get("", response_model=list[CameraOut])
@@ -41,11 +38,18 @@ def patch_camera(camera_id: str, payload: dict, db: Session = Depends(get_db)):
     cam = db.get(Camera, camera_id)
     if not cam:
         raise HTTPException(404, "camera not found")
+    if "motion_threshold" in payload:
+        value = payload["motion_threshold"]
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value <= 1:
+            raise HTTPException(422, "motion_threshold must be between 0 and 1")
     for key, value in payload.items():
         if hasattr(cam, key) and key != "id":
             setattr(cam, key, value)
     db.commit()
     db.refresh(cam)
+    if "motion_threshold" in payload:
+        # a running detection loop switches its gate without a restart
+        camera_hub.set_motion_threshold(camera_id, cam.motion_threshold or 0.0)
     return cam
 
 
@@ -64,8 +68,17 @@ def stream_camera(camera_id: str, db: Session = Depends(get_db)):
     cam = db.get(Camera, camera_id)
     if not cam:
         raise HTTPException(404, "camera not found")
+    source = cam.source
+
+    async def stream():
+        if not source:
+            return
+        with camera_hub.subscribe(camera_id, source) as sub:
+            async for part in sub.ajpeg():
+                yield part
+
     return StreamingResponse(
-        mjpeg_frames(cam.source),
+        stream(),
         media_type="multipart/x-mixed-replace; boundary=frame",
     )
 
@@ -80,27 +93,25 @@ def detect_stream(camera_id: str, db: Session = Depends(get_db)):
     if not model_path:
         raise HTTPException(409, "model not configured")
 
-    grabber = FrameGrabber(cam.source).start()
-    session = get_session(camera_id)
-    counter = PresenceCounter(session)
-
-    def on_stats(count, fps):
-        _latest_stats[camera_id] = {"count": count, "fps": fps}
-
-    def stream():
-        try:
-            yield from annotated_mjpeg(
-                grabber,
-                cam.count_mode,
-                setting.confidence_threshold,
-                model_path,
-                on_stats,
-                app_settings.stream_max_width,
-                app_settings.stream_max_fps,
-                counter=counter.update,
-            )
-        finally:
-            grabber.stop()
+    # The newest detection viewer's settings configure the camera's shared
+    # loop, which rebuilds its detector when they change; motion_threshold
+    # also follows a PATCH (see patch_camera).
+    config = camera_hub.DetectConfig(
+        cam.count_mode,
+        setting.confidence_threshold,
+        model_path,
+        app_settings.stream_max_width,
+        app_settings.stream_max_fps,
+        app_settings.stream_detect_budget,
+        app_settings.stream_max_stride,
+        cam.motion_threshold or 0.0,
+    )
+    source = cam.source
+
+    async def stream():
+        with camera_hub.subscribe(camera_id, source, config) as sub:
+            async for part in sub.ajpeg():
+                yield part
 
     return StreamingResponse(
         stream(),
@@ -110,7 +121,7 @@ def detect_stream(camera_id: str, db: Session = Depends(get_db)):
 
 @router.get("/{camera_id}/count")
 def camera_count(camera_id: str):
-    return _latest_stats.get(camera_id, {"count": 0, "fps": 0})
+    return camera_hub.stats(camera_id)
 
 
 @router.post("/{camera_id}/crop-session/finalize")
@@ -131,6 +142,9 @@ def start_crop_session(camera_id: str, db: Session = Depends(get_db)):
     if not db.get(Camera, camera_id):
         raise HTTPException(404, "camera not found")
     session = reset_session(camera_id)
+    hub = camera_hub.get(camera_id)
+    if hub is not None:
+        hub.reset_count()
     return {"session_ts": session.session_ts}
 
 
@@ -144,7 +158,7 @@ def capture(camera_id: str, db: Session = Depends(get_db)):
     if not model_path:
         raise HTTPException(409, "model not configured")
 
-    frame = grab_one(cam.source)
+    frame = camera_hub.snapshot(camera_id, cam.source) if cam.source else None
     if frame is None:
         raise HTTPException(503, "camera frame unavailable")
 
@@ -4,17 +4,19 @@ import uuid
 
 import cv2
 import numpy as np
-from fastapi import APIRouter, BackgroundTasks, Depends, File, HTTPException, UploadFile
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
 from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
 
 from ..config import settings as app_settings
 from ..database import get_db
-from ..services import detect_extract, job_queue
+from ..services import detect_extract, job_queue, scheduler
 from ..services.annotated_stream import annotate, annotated_mjpeg
+from ..services.broadcast import Mailbox, pump
 from ..services.crop_session import approve_session, crop_file_path, get_session, reset_session
 from ..services.frame_grabber import FrameGrabber
 from ..services.object_detection import detect, resolve_model_path, serialize_detections
+from ..services.progress_stream import RUNNING, progress_events
 from ..util import gen_id
 from .settings import get_or_create_setting
 
@@ -60,7 +62,11 @@ async def upload_video(file: UploadFile = File(...)):
 
 
 @router.get("/video/{video_id}/stream")
-def video_stream(video_id: str, db: Session = Depends(get_db)):
+def video_stream(
+    video_id: str,
+    motion_threshold: float = Query(0.0, ge=0.0, le=1.0),
+    db: Session = Depends(get_db),
+):
     path = _videos.get(video_id)
     if not path or not os.path.isfile(path):
         raise HTTPException(404, "video not found")
@@ -71,7 +77,7 @@ def video_stream(video_id: str, db: Session = Depends(get_db)):
 
     grabber = FrameGrabber(path).start()
 
-    def stream():
+    def frames():
         try:
             yield from annotated_mjpeg(
                 grabber,
@@ -81,10 +87,24 @@ def video_stream(video_id: str, db: Session = Depends(get_db)):
                 lambda count, fps: None,
                 app_settings.stream_max_width,
                 app_settings.stream_max_fps,
+                detect_budget=app_settings.stream_detect_budget,
+                max_stride=app_settings.stream_max_stride,
+                motion_threshold=motion_threshold,
             )
         finally:
             grabber.stop()
 
+    async def stream():
+        # decode/inference/encode run on a dedicated thread; the response
+        # only awaits finished parts
+        box = Mailbox()
+        pump(frames(), box, name=f"video-{video_id}")
+        try:
+            async for part in box.items():
+                yield part
+        finally:
+            box.close()
+
     return StreamingResponse(stream(), media_type="multipart/x-mixed-replace; boundary=frame")
 
 
@@ -115,7 +135,11 @@ async def process_image(files: list[UploadFile] = File(...), db: Session = Depen
 
 
 @router.post("/video/{video_id}/extract")
-def extract_video(video_id: str, background: BackgroundTasks, db: Session = Depends(get_db)):
+def extract_video(
+    video_id: str,
+    motion_threshold: float = Query(0.0, ge=0.0, le=1.0),
+    db: Session = Depends(get_db),
+):
     path = _videos.get(video_id)
     if not path or not os.path.isfile(path):
         raise HTTPException(404, "video not found")
@@ -124,15 +148,14 @@ def extract_video(video_id: str, background: BackgroundTasks, db: Session = Depe
     if not model_path:
         raise HTTPException(409, "model not configured")
     detect_extract.start(video_id)
-    background.add_task(
-        detect_extract.run_video_extract,
-        video_id,
-        path,
-        setting.confidence_threshold,
-        model_path,
-        app_settings.stream_max_width,
-    )
-    return {"video_id": video_id, "status": "processing"}
+    job = scheduler.submit(db, "video_extract", video_id, {
+        "path": path,
+        "conf_threshold": setting.confidence_threshold,
+        "model_path": model_path,
+        "max_width": app_settings.stream_max_width,
+        "motion_threshold": motion_threshold,
+    })
+    return {"video_id": video_id, "status": "processing", "job_id": job.id}
 
 
 @router.get("/video/{video_id}/extract/status")
@@ -141,6 +164,14 @@ def extract_status(video_id: str):
     return {**st, "progress": job_queue.get(video_id)}
 
 
+@router.get("/video/{video_id}/extract/stream")
+def extract_progress_stream(video_id: str):
+    state = detect_extract.status(video_id)["status"]
+    fallback = RUNNING if state == "processing" else state
+    return StreamingResponse(progress_events(video_id, fallback), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
 @router.get("/crop-session/{key}")
 def crop_session_list(key: str):
     result = get_session(key).finalize()
@@ -1,10 +1,14 @@
 import os
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
 from ..config import settings as app_settings
 from ..database import get_db
+from ..schemas import ModelPinRequest
+from ..services import model_registry
+from ..services import object_detection  # noqa: F401  (registers "yolo")
+from ..services.inference import sam3, sam_interactive  # noqa: F401  (register SAM loaders)
 from .settings import get_or_create_setting
 
 router = APIRouter(prefix="/api/models", tags=["models"])
@@ -17,3 +21,41 @@ def list_models(db: Session = Depends(get_db)):
     if os.path.isdir(folder):
         models = sorted(f for f in os.listdir(folder) if f.lower().endswith(".pt"))
     return {"models": models, "active": get_or_create_setting(db).active_model}
+
+
+@router.get("/resident")
+def resident_models():
+    return {**model_registry.get_registry().stats(), "kinds": model_registry.kinds()}
+
+
+def _model_file(payload: ModelPinRequest) -> str:
+    if payload.kind not in model_registry.kinds():
+        raise HTTPException(400, f"unknown model kind {payload.kind!r}")
+    path = os.path.join(app_settings.models_dir, os.path.basename(payload.name))
+    if not os.path.isfile(path):
+        raise HTTPException(404, "model file not found")
+    return path
+
+
+@router.post("/resident/pin")
+def pin_model(payload: ModelPinRequest):
+    path = _model_file(payload)
+    try:
+        model_registry.get_registry().pin(payload.kind, path)
+    except Exception as exc:  # noqa: BLE001
+        raise HTTPException(500, f"model load failed: {exc}") from exc
+    return resident_models()
+
+
+@router.post("/resident/unpin")
+def unpin_model(payload: ModelPinRequest):
+    if not model_registry.get_registry().unpin(payload.kind, _model_file(payload)):
+        raise HTTPException(404, "model is not resident")
+    return resident_models()
+
+
+@router.post("/resident/evict")
+def evict_model(payload: ModelPinRequest):
+    if not model_registry.get_registry().evict(payload.kind, _model_file(payload)):
+        raise HTTPException(404, "model is not resident")
+    return resident_models()
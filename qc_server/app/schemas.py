@@ -1,4 +1,4 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class CameraIn(BaseModel):
@@ -11,6 +11,7 @@ class CameraIn(BaseModel):
     resolution: str = ""
     fps: int = 0
     count_mode: str = "single"
+    motion_threshold: float = Field(0.0, ge=0.0, le=1.0)
 
 
 class CameraOut(CameraIn):
@@ -79,10 +80,34 @@ class BatchCreate(BaseModel):
     batch_name: str
     source_path: str
     camera_id: str | None = None
+    # Read the folder in a background job; the batch stays "ingesting" until done.
+    background_ingest: bool = False
 
 
 class BatchRunRequest(BaseModel):
     confidence_threshold: float | None = None
+    # Skip images already completed under the same model configuration.
+    resume: bool = False
+    priority: int = 0
+
+
+class ModelPinRequest(BaseModel):
+    kind: str  # "yolo", "sam3_semantic" or "sam_interactive"
+    name: str  # file name in models_dir
+
+
+class BatchWatchRequest(BaseModel):
+    interval: float | None = None
+
+
+class BatchWatchOut(BaseModel):
+    batch_id: str
+    watching: bool
+    folder: str | None = None
+    interval: float | None = None
+    ingested: int = 0
+    last_scan: float | None = None
+    error: str | None = None
 
 
 class BatchCreateResponse(BaseModel):
@@ -94,6 +119,24 @@ class BatchStatusOut(BaseModel):
     batch_id: str
     status: str
     progress: dict
+    job_id: str | None = None
+
+
+class JobOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    id: str
+    kind: str
+    target_id: str
+    params: dict
+    priority: int
+    status: str
+    attempts: int
+    max_attempts: int
+    cancel_requested: bool
+    error: str | None
+    created_at: str
+    started_at: str | None
+    finished_at: str | None
 
 
 class BatchSummary(BaseModel):
@@ -109,6 +152,8 @@ class BatchSummary(BaseModel):
     reviewer: str | None
     model_info: dict
     reviewed_count: int = 0
+    # images per status: pending / clean / defect
+    status_counts: dict[str, int] = {}
 
 
 class DefectOut(BaseModel):
@@ -160,6 +205,34 @@ class BatchResult(BaseModel):
     images: list[ImageOut]
 
 
+class DefectSummaryOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    id: str
+    type: str
+    category: str
+    confidence: float
+
+
+class ImageSummaryOut(BaseModel):
+    """``ImageOut`` without defect polygons (``fields=summary``)."""
+
+    model_config = ConfigDict(from_attributes=True)
+    id: str
+    filename: str
+    url: str
+    width: int
+    height: int
+    status: str
+    reviewed: bool
+    defects: list[DefectSummaryOut]
+
+
+class ImagePage(BaseModel):
+    items: list[ImageOut | ImageSummaryOut]
+    # Pass back as ``cursor`` for the next page; None on the last page.
+    next_cursor: str | None = None
+
+
 class BatchPatch(BaseModel):
     status: str | None = None
     reviewer: str | None = None
@@ -1,8 +1,11 @@
+import math
 import time
 
 import cv2
 
+from .box_propagation import BoxPropagator
 from .counting import count_single, update_tracking
+from .motion_gate import MotionGate
 from .object_detection import detect
 
 _BOX = (72, 161, 36)
@@ -42,6 +45,128 @@ def downscale(frame, max_width):
     return cv2.resize(frame, (max_width, int(h * scale)))
 
 
+class FpsMeter:
+    """Exponentially smoothed loop rate."""
+
+    def __init__(self):
+        self._last = None
+        self.fps = 0.0
+
+    def tick(self) -> float:
+        now = time.monotonic()
+        if self._last is not None and now > self._last:
+            inst = 1.0 / (now - self._last)
+            self.fps = inst if self.fps == 0.0 else (0.8 * self.fps + 0.2 * inst)
+        self._last = now
+        return round(self.fps, 1)
+
+
+class DetectStride:
+    """Run the detector on every ``stride``-th frame, with ``stride`` chosen
+    so detection takes at most ``budget`` seconds per second of stream.
+
+    ``budget`` 0 detects on every frame.
+    """
+
+    def __init__(self, budget=0.0, max_stride=8):
+        self.budget = budget
+        self.max_stride = max(1, max_stride)
+        self.stride = 1
+        self.detect_s = 0.0  # smoothed detector time
+        self._meter = FpsMeter()
+        self._since = 0
+
+    def due(self) -> bool:
+        """Call once per frame: whether this frame gets a detector pass."""
+        self._meter.tick()
+        if not self.budget or self._since + 1 >= self.stride:
+            self._since = 0
+            return True
+        self._since += 1
+        return False
+
+    def record(self, seconds) -> None:
+        self.detect_s = seconds if not self.detect_s else 0.8 * self.detect_s + 0.2 * seconds
+        if self.budget and self._meter.fps:
+            wanted = math.ceil(self._meter.fps * self.detect_s / self.budget)
+            self.stride = min(self.max_stride, max(1, wanted))
+
+
+class StreamDetector:
+    """Downscale -> detect -> count for one live stream, without drawing.
+
+    ``counter(original, detections, scale)`` replaces the built-in counting
+    (and the crop sink); otherwise ``count_mode`` picks single-frame counts
+    or ByteTrack ids. With a ``detect_budget`` (see ``DetectStride``) frames
+    between detector passes get the previous boxes moved by optical flow;
+    with a ``motion_threshold`` (see ``MotionGate``) static frames reuse the
+    last detections. Both kinds of frame are counted like detected frames
+    but not sent to the crop sink.
+    """
+
+    def __init__(self, count_mode, conf_threshold, model_path, max_width=960,
+                 crop_sink=None, counter=None, detect_budget=0.0, max_stride=8,
+                 motion_threshold=0.0):
+        self.conf_threshold = conf_threshold
+        self.model_path = model_path
+        self.max_width = max_width
+        self.crop_sink = crop_sink
+        self.counter = counter
+        self.stride = DetectStride(detect_budget, max_stride)
+        self._propagator = BoxPropagator() if detect_budget else None
+        self.gate = MotionGate(motion_threshold) if motion_threshold else None
+        self._last = None
+        self._tracker = None
+        self._seen_ids = set()
+        if count_mode == "tracking" and counter is None:
+            import supervision as sv  # lazy, server-only
+
+            self._tracker = sv.ByteTrack()
+
+    def set_motion_threshold(self, value) -> None:
+        """Switch the motion gate on, off or to a new threshold mid-stream."""
+        if not value:
+            self.gate = None
+        elif self.gate is None:
+            self.gate = MotionGate(value)
+        else:
+            self.gate.threshold = value
+
+    def process(self, original):
+        """Returns ``(frame, detections, count)``; ``frame`` is the downscaled
+        frame the detections refer to (possibly ``original`` itself)."""
+        frame = downscale(original, self.max_width)
+        scale = original.shape[1] / frame.shape[1] if frame.shape[1] else 1.0
+        fresh = False
+        if self.gate is not None and not self.gate.moving(frame) and self._last is not None:
+            detections = list(self._last)
+        elif self._propagator is None or self.stride.due():
+            fresh = True
+            started = time.perf_counter()
+            detections = detect(frame, self.conf_threshold, self.model_path)
+            self.stride.record(time.perf_counter() - started)
+        else:
+            detections = self._propagator.step(frame)
+
+        if self.counter is not None:
+            count = self.counter(original, detections, scale)
+        elif self._tracker is not None:
+            if fresh:
+                from .detect_tracker import apply_tracker
+
+                detections = apply_tracker(self._tracker, detections)
+            count = update_tracking(self._seen_ids, detections)
+        else:
+            count = count_single(detections)
+
+        self._last = detections
+        if fresh and self._propagator is not None:
+            self._propagator.reset(frame, detections)
+        if fresh and self.counter is None and self.crop_sink is not None:
+            self.crop_sink(original, detections, scale)
+        return frame, detections, count
+
+
 def annotated_mjpeg(
     grabber,
     count_mode,
@@ -52,17 +177,16 @@ def annotated_mjpeg(
     max_fps=15,
     crop_sink=None,
     counter=None,
+    detect_budget=0.0,
+    max_stride=8,
+    motion_threshold=0.0,
 ):
-    tracker = None
-    seen_ids = set()
-    if count_mode == "tracking" and counter is None:
-        import supervision as sv  # lazy, server-only
-
-        tracker = sv.ByteTrack()
-
+    detector = StreamDetector(count_mode, conf_threshold, model_path, max_width,
+                              crop_sink=crop_sink, counter=counter,
+                              detect_budget=detect_budget, max_stride=max_stride,
+                              motion_threshold=motion_threshold)
+    meter = FpsMeter()
     min_interval = 1.0 / max_fps if max_fps else 0.0
-    last = None
-    fps = 0.0
 
     while True:
         frame = grabber.read()
@@ -72,31 +196,10 @@ def annotated_mjpeg(
             time.sleep(0.03)
             continue
 
-        original = frame
-        frame = downscale(original, max_width)
-        scale = original.shape[1] / frame.shape[1] if frame.shape[1] else 1.0
-        detections = detect(frame, conf_threshold, model_path)
-        if counter is not None:
-            count = counter(original, detections, scale)
-        elif tracker is not None:
-            from .detect_tracker import apply_tracker
-
-            detections = apply_tracker(tracker, detections)
-            count = update_tracking(seen_ids, detections)
-        else:
-            count = count_single(detections)
-
-        if counter is None and crop_sink is not None:
-            crop_sink(original, detections, scale)
-
+        started = time.monotonic()
+        frame, detections, count = detector.process(frame)
         annotate(frame, detections, count)
-
-        now = time.monotonic()
-        if last is not None and now > last:
-            inst = 1.0 / (now - last)
-            fps = inst if fps == 0.0 else (0.8 * fps + 0.2 * inst)
-        last = now
-        on_stats(count, round(fps, 1))
+        on_stats(count, meter.tick())
 
         ok, buf = cv2.imencode(".jpg", frame)
         if not ok:
@@ -104,6 +207,6 @@ def annotated_mjpeg(
         yield b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + buf.tobytes() + b"\r\n"
 
         if min_interval:
-            remaining = min_interval - (time.monotonic() - now)
+            remaining = min_interval - (time.monotonic() - started)
             if remaining > 0:
                 time.sleep(remaining)
@@ -0,0 +1,147 @@
+import queue
+import threading
+import time
+from types import SimpleNamespace
+
+from sqlalchemy import delete, insert, select, update
+
+from .. import storage
+from ..models import Candidate, Defect, Image
+from ..util import gen_id
+from . import job_queue, result_cache
+
+_STOP = object()
+
+
+class ResultWriter:
+    """Writer stage of ``run_batch``: persists detections on its own thread.
+
+    Results arrive through a bounded queue and are flushed in chunks, every
+    ``flush_images`` images or ``flush_ms`` milliseconds, with one bulk
+    statement per table and a single commit. Progress advances per flushed
+    chunk, and a failure only loses the chunk in flight; earlier chunks stay
+    committed and consistent. ``threshold`` None keeps every detection as a
+    defect (strategies that apply their own threshold).
+    """
+
+    def __init__(self, session_factory, batch_id, threshold, maxsize=32,
+                 flush_images=50, flush_ms=500, checkpoint=None, jsonl=False):
+        self._session_factory = session_factory
+        self._batch_id = batch_id
+        self._threshold = threshold
+        self._checkpoint = checkpoint
+        self._jsonl = jsonl
+        self._queue = queue.Queue(maxsize=max(1, maxsize))
+        self._flush_images = max(1, flush_images)
+        self._flush_seconds = max(0, flush_ms) / 1000
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self.error = None
+        self.defect_count = 0
+        self.flushes = 0
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def put(self, image_id, detections, cache_key=None) -> None:
+        self._offer((image_id, detections, cache_key))
+        if self.error is not None:
+            raise self.error
+
+    def close(self) -> None:
+        self._offer(_STOP)
+        self._thread.join()
+
+    def raise_error(self) -> None:
+        if self.error is not None:
+            raise self.error
+
+    def _offer(self, item) -> None:
+        while self._thread.is_alive():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _run(self):
+        db = self._session_factory()
+        pending = []
+        deadline = None
+        try:
+            while True:
+                timeout = None
+                if deadline is not None:
+                    timeout = max(0.0, deadline - time.monotonic())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+                if item is not None and item is not _STOP:
+                    pending.append(item)
+                    if deadline is None:
+                        deadline = time.monotonic() + self._flush_seconds
+                due = deadline is not None and time.monotonic() >= deadline
+                if pending and (item is _STOP or due or len(pending) >= self._flush_images):
+                    self._flush(db, pending)
+                    pending, deadline = [], None
+                if item is _STOP:
+                    return
+        except Exception as exc:  # noqa: BLE001
+            db.rollback()
+            self.error = exc
+        finally:
+            db.close()
+
+    def _flush(self, db, pending) -> None:
+        image_ids = [image_id for image_id, _, _ in pending]
+        candidate_rows, defect_rows, image_rows, cache_entries = [], [], [], []
+        defects = 0
+        for image_id, candidates, cache_key in pending:
+            kept = 0
+            for det in candidates:
+                row = {"image_id": image_id, "type": det.type, "category": det.category,
+                       "confidence": det.confidence, "polygon": det.polygon}
+                candidate_rows.append(row)
+                if self._threshold is None or det.confidence >= self._threshold:
+                    defect_rows.append({"id": gen_id("d"), **row})
+                    kept += 1
+            image_rows.append({"id": image_id, "status": "defect" if kept else "clean",
+                               "reviewed": False, "defect_count": kept,
+                               "processed_fingerprint": self._checkpoint})
+            if cache_key is not None:
+                cache_entries.append((cache_key, candidates))
+            defects += kept
+
+        for model in (Defect, Candidate):
+            db.execute(delete(model).where(model.image_id.in_(image_ids)))
+        if candidate_rows:
+            db.execute(insert(Candidate), candidate_rows)
+        if defect_rows:
+            db.execute(insert(Defect), defect_rows)
+        db.execute(update(Image), image_rows)
+        result_cache.store(db, cache_entries)
+        db.commit()
+        if self._jsonl:
+            self._append_jsonl(db, image_ids, image_rows, defect_rows)
+
+        self.defect_count += defects
+        self.flushes += 1
+        job_queue.increment(self._batch_id, len(pending))
+
+    def _append_jsonl(self, db, image_ids, image_rows, defect_rows) -> None:
+        status = {row["id"]: row["status"] for row in image_rows}
+        by_image = {image_id: [] for image_id in image_ids}
+        for row in defect_rows:
+            by_image[row["image_id"]].append(SimpleNamespace(**row))
+        images = {
+            im.id: SimpleNamespace(**im._mapping, status=status[im.id])
+            for im in db.execute(
+                select(Image.id, Image.filename, Image.url, Image.width, Image.height)
+                .where(Image.id.in_(image_ids))
+            )
+        }
+        storage.append_result_jsonl(self._batch_id, [
+            storage.image_record(images[image_id], by_image[image_id])
+            for image_id in image_ids if image_id in images
+        ])
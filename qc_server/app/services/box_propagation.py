@@ -0,0 +1,81 @@
+"""Carry the last detections forward on frames the detector skips.
+
+``BoxPropagator`` picks a few corner features inside each detected box and
+follows them with pyramidal Lucas-Kanade optical flow; each box moves by
+the median displacement of its surviving points. Its label, confidence and
+track id are kept. A box without trackable texture stays where it was.
+"""
+
+from dataclasses import replace
+
+import cv2
+import numpy as np
+
+_LK_PARAMS = dict(
+    winSize=(15, 15),
+    maxLevel=2,
+    criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03),
+)
+
+
+def _gray(frame):
+    return frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+
+class BoxPropagator:
+    def __init__(self, max_points=12):
+        self.max_points = max_points
+        self._gray = None
+        self._tracks = []  # [detection, points (N, 1, 2) float32, dx, dy]
+
+    def reset(self, frame, detections) -> None:
+        """Start from fresh detector output on ``frame``."""
+        gray = _gray(frame)
+        h, w = gray.shape
+        self._gray = gray
+        self._tracks = []
+        for det in detections:
+            x1, y1 = max(0, det.x1), max(0, det.y1)
+            x2, y2 = min(w, det.x2), min(h, det.y2)
+            points = None
+            if x2 - x1 >= 4 and y2 - y1 >= 4:
+                points = cv2.goodFeaturesToTrack(
+                    gray[y1:y2, x1:x2], self.max_points, 0.01, 3)
+            if points is None:
+                points = np.empty((0, 1, 2), np.float32)
+            else:
+                points = points.astype(np.float32) + np.float32([x1, y1])
+            self._tracks.append([det, points, 0.0, 0.0])
+
+    def step(self, frame) -> list:
+        """The last detections moved along with ``frame``."""
+        if self._gray is None:
+            return []
+        gray = _gray(frame)
+        sizes = [len(track[1]) for track in self._tracks]
+        if sum(sizes):
+            points = np.concatenate([track[1] for track in self._tracks if len(track[1])])
+            moved, status, _err = cv2.calcOpticalFlowPyrLK(
+                self._gray, gray, points, None, **_LK_PARAMS)
+            ok = status.ravel() == 1
+            start = 0
+            for track, n in zip(self._tracks, sizes):
+                if not n:
+                    continue
+                keep = ok[start:start + n]
+                if keep.any():
+                    shift = np.median((moved[start:start + n] - points[start:start + n])[keep],
+                                      axis=0).ravel()
+                    track[2] += float(shift[0])
+                    track[3] += float(shift[1])
+                track[1] = moved[start:start + n][keep]
+                start += n
+        self._gray = gray
+        h, w = gray.shape
+        return [_shifted(det, dx, dy, w, h) for det, _points, dx, dy in self._tracks]
+
+
+def _shifted(det, dx, dy, w, h):
+    dx = int(round(min(max(dx, -det.x1), w - det.x2)))
+    dy = int(round(min(max(dy, -det.y1), h - det.y2)))
+    return replace(det, x1=det.x1 + dx, y1=det.y1 + dy, x2=det.x2 + dx, y2=det.y2 + dy)
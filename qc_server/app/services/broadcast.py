@@ -0,0 +1,152 @@
+"""Fan-out of immutable payloads (encoded MJPEG parts) to many clients.
+
+Each client owns a one-slot ``Mailbox``: publishing replaces whatever the
+client has not picked up yet, so a slow client skips frames instead of
+buffering them or holding back the publisher and the other clients.
+
+Consumers on the event loop use ``Mailbox.aget``/``items``: they await an
+``asyncio.Event`` the publishing thread sets, so an open stream holds no
+worker thread while it waits for the next frame.
+"""
+
+import asyncio
+import threading
+
+
+class Mailbox:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self._full = False
+        self._closed = False
+        self._waiter = None  # (loop, asyncio.Event) of an awaiting consumer
+        self.delivered = 0
+        self.dropped = 0
+
+    def put(self, item) -> None:
+        with self._cond:
+            if self._full:
+                self.dropped += 1
+            self._item = item
+            self._full = True
+            self._cond.notify_all()
+            self._wake()
+
+    def _wake(self) -> None:
+        if self._waiter is not None:
+            loop, event = self._waiter
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:  # the consumer's loop has shut down
+                pass
+
+    def get(self, timeout=None):
+        """The newest item, or None on timeout or once closed and empty."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._full or self._closed, timeout)
+            if not self._full:
+                return None
+            item, self._item, self._full = self._item, None, False
+            self.delivered += 1
+            return item
+
+    async def aget(self, timeout=None):
+        """``get`` for a consumer on the event loop (one awaiting consumer)."""
+        event = asyncio.Event()
+        with self._cond:
+            waiting = not (self._full or self._closed)
+            if waiting:
+                self._waiter = (asyncio.get_running_loop(), event)
+        if waiting:
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._cond:
+                    self._waiter = None
+        return self.get(0)
+
+    async def items(self, timeout=1.0):
+        """Newest items as they arrive, until the mailbox is closed."""
+        while True:
+            item = await self.aget(timeout)
+            if item is None:
+                if self._closed:
+                    return
+                continue
+            yield item
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            self._wake()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+
+class Broadcaster:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._boxes: set[Mailbox] = set()
+        self._closed = False
+        self.published = 0
+
+    def subscribe(self) -> Mailbox:
+        box = Mailbox()
+        with self._lock:
+            if self._closed:
+                box.close()
+            else:
+                self._boxes.add(box)
+        return box
+
+    def unsubscribe(self, box) -> None:
+        with self._lock:
+            self._boxes.discard(box)
+        box.close()
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._boxes)
+
+    def publish(self, item) -> None:
+        with self._lock:
+            boxes = list(self._boxes)
+            self.published += 1
+        for box in boxes:
+            box.put(item)
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            boxes, self._boxes = list(self._boxes), set()
+        for box in boxes:
+            box.close()
+
+
+def pump(items, box, name="pump") -> threading.Thread:
+    """Feed ``items`` (a blocking iterator) into ``box`` from a daemon thread.
+
+    Stops when ``items`` is exhausted or the consumer closes ``box``, and
+    closes both, so a generator's ``finally`` runs on that thread.
+    """
+
+    def run():
+        try:
+            for item in items:
+                if box.closed:
+                    break
+                box.put(item)
+        finally:
+            box.close()
+            close = getattr(items, "close", None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=run, daemon=True, name=name)
+    thread.start()
+    return thread
@@ -0,0 +1,450 @@
+"""One capture and one detection loop per camera, shared by every viewer.
+
+Raw streams, detection streams and ``/capture`` all subscribe to the
+camera's ``CameraHub`` instead of opening their own ``VideoCapture``. The
+capture thread publishes each frame to a latest-value channel; the
+detection thread (running while at least one detection subscriber exists)
+detects on the newest frame and publishes a ``DetectionFrame``. Subscribers
+always get the newest value, so a slow viewer skips frames rather than
+queueing them. When the last subscriber leaves, the hub stays up for
+``stream_idle_grace_s`` (a page reload does not reopen the RTSP session)
+and then closes.
+
+MJPEG viewers read ``Subscription.jpeg()`` (or ``ajpeg()`` on the event
+loop): an encoder thread per stream kind (raw, annotated) draws and
+JPEG-encodes each frame once and broadcasts the same bytes to every
+viewer's one-slot mailbox.
+"""
+
+import threading
+import time
+from dataclasses import dataclass, replace
+
+from ..config import settings
+from .annotated_stream import FpsMeter, StreamDetector, annotate
+from .broadcast import Broadcaster
+from .crop_session import get_session
+from .presence_counter import PresenceCounter
+from .streaming import encode_part, open_capture
+
+
+@dataclass(frozen=True)
+class DetectConfig:
+    count_mode: str
+    conf_threshold: float
+    model_path: str
+    max_width: int = 960
+    max_fps: float = 15
+    detect_budget: float = 0.0  # detector seconds per second; 0 detects every frame
+    max_stride: int = 8
+    motion_threshold: float = 0.0  # see MotionGate; 0 detects static frames too
+
+
+@dataclass(frozen=True)
+class DetectionFrame:
+    # ``frame`` is shared by all subscribers: copy before drawing on it.
+    frame: object
+    detections: list
+    count: int
+    fps: float
+
+
+class Channel:
+    """Latest published value with a sequence number."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._value = None
+        self._closed = False
+
+    def publish(self, value) -> None:
+        with self._cond:
+            self._seq += 1
+            self._value = value
+            self._cond.notify_all()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def wait(self, after_seq, timeout=None):
+        """``(seq, value)`` newer than ``after_seq``; None on timeout or close."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > after_seq or self._closed, timeout)
+            if self._seq > after_seq:
+                return self._seq, self._value
+            return None
+
+
+class Subscription:
+    def __init__(self, hub, detect):
+        self.hub = hub
+        self.detect = detect
+        self._closed = False
+        self._mailbox = None
+
+    def frames(self, timeout=1.0):
+        """Newest raw frames until the source ends (frames are shared, read-only)."""
+        yield from self._follow(self.hub.frames, timeout)
+
+    def detections(self, timeout=1.0):
+        yield from self._follow(self.hub.detections, timeout)
+
+    def jpeg(self, timeout=1.0):
+        """Encoded MJPEG parts (annotated for detection subscriptions), shared
+        with every other viewer; frames this viewer is too slow for are skipped."""
+        box = self._open_mailbox()
+        while not self._closed:
+            part = box.get(timeout)
+            if part is None:
+                if box.closed:
+                    return
+                continue
+            yield part
+
+    async def ajpeg(self, timeout=1.0):
+        """``jpeg()`` for async endpoints: waits on the event loop, not a thread."""
+        async for part in self._open_mailbox().items(timeout):
+            if self._closed:
+                return
+            yield part
+
+    def _open_mailbox(self):
+        if self._mailbox is None:
+            self._mailbox = self.hub.open_mailbox(annotated=self.detect is not None)
+        return self._mailbox
+
+    def _follow(self, channel, timeout):
+        seq = 0
+        while not self._closed:
+            got = channel.wait(seq, timeout)
+            if got is None:
+                if channel.closed:
+                    return
+                continue
+            seq, value = got
+            yield value
+
+    def close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            if self._mailbox is not None:
+                self.hub.close_mailbox(self._mailbox, annotated=self.detect is not None)
+            self.hub.release(self.detect)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CameraHub:
+    def __init__(self, camera_id, source, grace_s=None, capture_factory=None, on_close=None):
+        self.camera_id = camera_id
+        self.source = source
+        self.grace_s = settings.stream_idle_grace_s if grace_s is None else grace_s
+        self.frames = Channel()
+        self.detections = Channel()
+        self.raw_jpeg = Broadcaster()
+        self.annotated_jpeg = Broadcaster()
+        self._encoders: dict[str, threading.Thread] = {}
+        # Counts objects passing the camera into its crop session; one per
+        # camera, however many viewers watch the detection stream.
+        self.presence = PresenceCounter(get_session(camera_id))
+        self._capture_factory = capture_factory or open_capture
+        self._on_close = on_close
+        self._lock = threading.Lock()
+        self._refs = 0
+        self._detect_refs = 0
+        self._detect_config = None
+        self._stop = threading.Event()
+        self._detect_stop = None
+        self._capture_thread = None
+        self._detect_thread = None
+        self._idle_timer = None
+        self.closed = False
+        self.error = None
+
+    # -- subscribers ------------------------------------------------------
+
+    def subscribe(self, detect: DetectConfig | None = None) -> Subscription:
+        with self._lock:
+            if self.closed:
+                raise RuntimeError("camera hub is closed")
+            self._refs += 1
+            self._cancel_idle_timer()
+            if self._capture_thread is None:
+                self._capture_thread = threading.Thread(
+                    target=self._capture_loop, daemon=True, name=f"capture-{self.camera_id}")
+                self._capture_thread.start()
+            if detect is not None:
+                self._detect_refs += 1
+                self._detect_config = detect
+                if self._detect_thread is None:
+                    self._detect_stop = threading.Event()
+                    self._detect_thread = threading.Thread(
+                        target=self._detect_loop, args=(self._detect_stop,), daemon=True,
+                        name=f"detect-{self.camera_id}")
+                    self._detect_thread.start()
+        return Subscription(self, detect)
+
+    def set_motion_threshold(self, value) -> None:
+        """Apply a camera's changed ``motion_threshold`` to the running loop."""
+        with self._lock:
+            if self._detect_config is not None:
+                self._detect_config = replace(self._detect_config, motion_threshold=value)
+
+    def release(self, detect=None) -> None:
+        with self._lock:
+            self._refs = max(0, self._refs - 1)
+            if detect is not None:
+                self._detect_refs = max(0, self._detect_refs - 1)
+            if self._refs == 0 or self._detect_refs == 0:
+                self._cancel_idle_timer()
+                self._idle_timer = threading.Timer(self.grace_s, self._idle_check)
+                self._idle_timer.daemon = True
+                self._idle_timer.start()
+
+    @property
+    def subscribers(self) -> int:
+        return self._refs
+
+    def open_mailbox(self, annotated=False):
+        name = "annotated" if annotated else "raw"
+        broadcaster = self.annotated_jpeg if annotated else self.raw_jpeg
+        with self._lock:
+            box = broadcaster.subscribe()
+            if name not in self._encoders:
+                channel, render = (
+                    (self.detections, _render_annotated) if annotated else (self.frames, None)
+                )
+                thread = threading.Thread(
+                    target=self._encode_loop, args=(name, channel, render, broadcaster),
+                    daemon=True, name=f"encode-{name}-{self.camera_id}")
+                self._encoders[name] = thread
+                thread.start()
+        return box
+
+    def close_mailbox(self, box, annotated=False) -> None:
+        (self.annotated_jpeg if annotated else self.raw_jpeg).unsubscribe(box)
+
+    def live(self) -> bool:
+        return self._capture_thread is not None and not self.frames.closed
+
+    def reset_count(self) -> None:
+        """Start counting from zero (a new crop session was started)."""
+        self.presence = PresenceCounter(get_session(self.camera_id))
+
+    # -- lifecycle --------------------------------------------------------
+
+    def _cancel_idle_timer(self) -> None:
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+
+    def _idle_check(self) -> None:
+        with self._lock:
+            self._idle_timer = None
+            if self._detect_refs == 0 and self._detect_thread is not None:
+                self._detect_stop.set()
+                self._detect_thread = None
+            # decided under the lock so a subscriber arriving now is not cut off
+            closing = self._refs == 0 and self._mark_closed()
+        if closing:
+            self._finish_close()
+
+    def close(self) -> None:
+        with self._lock:
+            closing = self._mark_closed()
+        if closing:
+            self._finish_close()
+
+    def _mark_closed(self) -> bool:
+        if self.closed:
+            return False
+        self.closed = True
+        self._cancel_idle_timer()
+        self._stop.set()
+        if self._detect_stop is not None:
+            self._detect_stop.set()
+        return True
+
+    def _finish_close(self) -> None:
+        self.frames.close()
+        self.detections.close()
+        with self._lock:
+            # a running encoder closes its broadcaster once it has drained
+            for name, broadcaster in (("raw", self.raw_jpeg), ("annotated", self.annotated_jpeg)):
+                if name not in self._encoders:
+                    broadcaster.close()
+        if self._on_close is not None:
+            self._on_close(self)
+
+    # -- worker threads ---------------------------------------------------
+
+    def _capture_loop(self) -> None:
+        cap = self._capture_factory(self.source)
+        try:
+            if not cap.isOpened():
+                return
+            while not self._stop.is_set():
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                self.frames.publish(frame)
+        finally:
+            cap.release()
+            self.close()
+
+    def _encode_loop(self, name, channel, render, broadcaster) -> None:
+        seq = 0
+        while True:
+            # checked under the lock open_mailbox registers under, so a viewer
+            # arriving now either finds this thread running or starts a new one
+            with self._lock:
+                if not broadcaster.subscribers:
+                    break
+            got = channel.wait(seq, timeout=0.5)
+            if got is None:
+                if channel.closed:
+                    break
+                continue
+            seq, value = got
+            part = encode_part(render(value) if render else value)
+            if part is not None:
+                broadcaster.publish(part)
+        with self._lock:
+            self._encoders.pop(name, None)
+            # the last frame of an ended source has been delivered by now
+            if self.closed:
+                broadcaster.close()
+
+    def _detect_loop(self, stop) -> None:
+        try:
+            self._run_detection(stop)
+        except Exception as exc:  # noqa: BLE001
+            # e.g. the model failed to load: end the streams like a dead
+            # source does; the next viewer starts a fresh hub.
+            self.error = str(exc)
+            self.close()
+
+    def _detector(self, config) -> StreamDetector:
+        return StreamDetector(
+            config.count_mode, config.conf_threshold, config.model_path, config.max_width,
+            counter=lambda frame, detections, scale: self.presence.update(frame, detections, scale),
+            detect_budget=config.detect_budget, max_stride=config.max_stride,
+            motion_threshold=config.motion_threshold,
+        )
+
+    def _run_detection(self, stop) -> None:
+        config = self._detect_config
+        detector = self._detector(config)
+        meter = FpsMeter()
+        min_interval = 1.0 / config.max_fps if config.max_fps else 0.0
+        seq = 0
+        while not stop.is_set():
+            got = self.frames.wait(seq, timeout=0.5)
+            if got is None:
+                if self.frames.closed:
+                    break
+                continue
+            seq, original = got
+            latest = self._detect_config
+            if latest != config:
+                # The newest viewer's (or PATCH's) settings win: a gate-only
+                # change keeps the detector, anything else rebuilds it.
+                if replace(latest, motion_threshold=config.motion_threshold) == config:
+                    detector.set_motion_threshold(latest.motion_threshold)
+                else:
+                    detector = self._detector(latest)
+                config = latest
+                min_interval = 1.0 / config.max_fps if config.max_fps else 0.0
+            started = time.monotonic()
+            frame, detections, count = detector.process(original)
+            fps = meter.tick()
+            _STATS[self.camera_id] = {
+                "count": count, "fps": fps, "detect_stride": detector.stride.stride,
+                "motion_skip_rate": detector.gate.skip_rate if detector.gate else 0.0,
+            }
+            self.detections.publish(DetectionFrame(frame, detections, count, fps))
+            if min_interval:
+                stop.wait(max(0.0, min_interval - (time.monotonic() - started)))
+
+
+def _render_annotated(result: DetectionFrame):
+    return annotate(result.frame.copy(), result.detections, result.count)
+
+
+_HUBS: dict[str, CameraHub] = {}
+_STATS: dict[str, dict] = {}  # last count/fps per camera, kept after the hub closes
+_LOCK = threading.Lock()
+
+
+def _forget(hub) -> None:
+    with _LOCK:
+        if _HUBS.get(hub.camera_id) is hub:
+            del _HUBS[hub.camera_id]
+
+
+def hub_for(camera_id, source) -> CameraHub:
+    """The camera's running hub, or a new one (also when its source changed)."""
+    with _LOCK:
+        hub = _HUBS.get(camera_id)
+        if hub is not None and not hub.closed and hub.source == source:
+            return hub
+        stale = hub
+        hub = _HUBS[camera_id] = CameraHub(camera_id, source, on_close=_forget)
+    if stale is not None:
+        stale.close()
+    return hub
+
+
+def subscribe(camera_id, source, detect: DetectConfig | None = None) -> Subscription:
+    while True:
+        hub = hub_for(camera_id, source)
+        try:
+            return hub.subscribe(detect)
+        except RuntimeError:  # closed by its idle timer in between; open a new one
+            continue
+
+
+def set_motion_threshold(camera_id, value) -> None:
+    hub = get(camera_id)
+    if hub is not None:
+        hub.set_motion_threshold(value)
+
+
+def snapshot(camera_id, source, timeout=5.0):
+    """The camera's newest frame, waiting for the first one if the hub just opened."""
+    with subscribe(camera_id, source) as sub:
+        got = sub.hub.frames.wait(0, timeout)
+        return got[1] if got else None
+
+
+def stats(camera_id) -> dict:
+    return _STATS.get(
+        camera_id, {"count": 0, "fps": 0, "detect_stride": 1, "motion_skip_rate": 0.0})
+
+
+def get(camera_id) -> CameraHub | None:
+    with _LOCK:
+        return _HUBS.get(camera_id)
+
+
+def is_live(camera_id) -> bool:
+    hub = get(camera_id)
+    return hub is not None and hub.live()
+
+
+def stop_all() -> None:
+    with _LOCK:
+        hubs = list(_HUBS.values())
+    for hub in hubs:
+        hub.close()
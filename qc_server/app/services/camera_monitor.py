@@ -1,12 +1,15 @@
 import threading
 
 from ..models import Camera
+from . import camera_hub
 from .streaming import probe
 
 
 def poll_once(db, probe_fn=probe) -> None:
     for cam in db.query(Camera).all():
-        status = "online" if probe_fn(cam.source) else "offline"
+        # A camera being streamed is online; probing would open a second capture.
+        live = camera_hub.is_live(cam.id) or probe_fn(cam.source)
+        status = "online" if live else "offline"
         if cam.status != status:
             cam.status = status
     db.commit()
@@ -2,9 +2,10 @@ from threading import Lock
 
 import cv2
 
-from . import job_queue
+from . import job_queue, scheduler
 from .annotated_stream import downscale
 from .crop_session import reset_session
+from .motion_gate import MotionGate
 from .object_detection import detect
 from .presence_counter import PresenceCounter
 
@@ -23,28 +24,62 @@ def status(video_id):
         return dict(_status.get(video_id, {"status": "idle", "count": 0}))
 
 
-def run_video_extract(video_id, path, conf_threshold, model_path, max_width, capture_factory=cv2.VideoCapture):
+def run_video_extract(video_id, path, conf_threshold, model_path, max_width,
+                      capture_factory=cv2.VideoCapture, cancel_check=None,
+                      motion_threshold=0.0):
     session = reset_session(video_id)
     counter = PresenceCounter(session)
+    # static stretches reuse the last detections, so the counter still sees
+    # an object on every frame it stays in view
+    gate = MotionGate(motion_threshold) if motion_threshold else None
+    detections = None
     cap = capture_factory(path)
     try:
         total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
         job_queue.set_total(video_id, total)
         while True:
+            if cancel_check is not None:
+                cancel_check()
             ok, frame = cap.read()
             if not ok:
                 break
             small = downscale(frame, max_width)
             scale = frame.shape[1] / small.shape[1] if small.shape[1] else 1.0
-            detections = detect(small, conf_threshold, model_path)
+            if gate is None or gate.moving(small) or detections is None:
+                detections = detect(small, conf_threshold, model_path)
             counter.update(frame, detections, scale)
             job_queue.increment(video_id)
         result = session.finalize()
         with _lock:
-            _status[video_id] = {"status": "done", "count": result["count"]}
+            _status[video_id] = {"status": "done", "count": result["count"],
+                                 "motion_skip_rate": gate.skip_rate if gate else 0.0}
+        job_queue.finish(video_id, "done")
+    except scheduler.JobCancelled:
+        with _lock:
+            _status[video_id] = {"status": "cancelled", "count": 0}
+        job_queue.finish(video_id, "cancelled")
+        raise
     except Exception as exc:  # noqa: BLE001
         with _lock:
             _status[video_id] = {"status": "failed", "count": 0, "error": str(exc)}
+        job_queue.finish(video_id, "failed")
         raise
     finally:
         cap.release()
+
+
+def _extract_job(ctx) -> None:
+    p = ctx.params
+    run_video_extract(ctx.target_id, p["path"], p["conf_threshold"], p["model_path"],
+                      p["max_width"], cancel_check=ctx.check_cancelled,
+                      motion_threshold=p.get("motion_threshold", 0.0))
+
+
+def _cancel_queued(db, job) -> None:
+    with _lock:
+        _status[job.target_id] = {"status": "cancelled", "count": 0}
+    job_queue.finish(job.target_id, "cancelled")
+
+
+scheduler.register("video_extract", _extract_job, on_cancel=_cancel_queued,
+                   lane=scheduler.INTERACTIVE)
@@ -0,0 +1,210 @@
+import logging
+import os
+import threading
+import time
+
+from .. import storage
+from ..config import settings as app_settings
+from ..models import Batch
+from . import batch_counters, job_queue, scheduler
+
+log = logging.getLogger(__name__)
+
+
+class FolderIndex:
+    """Incremental view of a watched folder.
+
+    The folder is listed again when its own mtime changes (a file was
+    created, renamed or removed), while that mtime is less than ``settle_s``
+    older than the last listing (coarse FAT/SMB timestamps can hide a file
+    created in the same tick), and every ``relist_every`` scans regardless
+    (NFS attribute caching); in between, only files still being written are
+    re-stat'ed. A file is reported once its (mtime, size) is unchanged
+    across two scans, so half-copied images are never ingested. Reported
+    files stay reported on every scan until ``mark_known`` (the caller
+    committed them), so a failed ingest is retried on the next tick.
+    """
+
+    def __init__(self, folder, known=(), relist_every=30, settle_s=2.0):
+        self.folder = folder
+        self.relist_every = relist_every
+        self.settle_ns = int(settle_s * 1e9)
+        self._known = set(known)
+        self._pending: dict[str, tuple[int, int]] = {}
+        self._dir_mtime = None
+        self._listed_at = 0
+        self._scans = 0
+
+    def _should_list(self, dir_mtime) -> bool:
+        return (
+            dir_mtime != self._dir_mtime
+            or self._listed_at - dir_mtime < self.settle_ns
+            or self._scans % max(1, self.relist_every) == 0
+        )
+
+    def scan(self) -> list[str]:
+        try:
+            dir_mtime = os.stat(self.folder).st_mtime_ns
+        except OSError:
+            return []
+        self._scans += 1
+        seen: dict[str, tuple[int, int]] = {}
+        if self._should_list(dir_mtime):
+            self._dir_mtime = dir_mtime
+            self._listed_at = time.time_ns()
+            with os.scandir(self.folder) as entries:
+                for e in entries:
+                    if e.name in self._known or not e.name.lower().endswith(storage.IMAGE_EXTENSIONS):
+                        continue
+                    try:
+                        if not e.is_file():
+                            continue
+                        st = e.stat()
+                    except OSError:
+                        continue
+                    seen[e.name] = (st.st_mtime_ns, st.st_size)
+        else:
+            for name in self._pending:
+                try:
+                    st = os.stat(os.path.join(self.folder, name))
+                except OSError:
+                    continue
+                seen[name] = (st.st_mtime_ns, st.st_size)
+        ready = sorted(n for n, sig in seen.items() if self._pending.get(n) == sig)
+        self._pending = seen
+        return ready
+
+    def mark_known(self, names) -> None:
+        self._known.update(names)
+        for name in names:
+            self._pending.pop(name, None)
+
+
+def watch_once(session_factory, batch_id, index) -> int:
+    """Ingest files that appeared since the last scan and queue a resume run
+    for them (run inline when the scheduler has no workers)."""
+    from .pipeline import BUSY_STATUSES, add_images
+
+    db = session_factory()
+    try:
+        batch = db.get(Batch, batch_id)
+        # A manual run in progress owns the batch; pick the files up next tick.
+        if batch is None or batch.status in BUSY_STATUSES:
+            return 0
+        new = index.scan()
+        if not new:
+            return 0
+        rejected = []
+
+        def skip(filename, exc):
+            log.warning("watch %s: skipping unreadable %s: %s", batch_id, filename, exc)
+            rejected.append(filename)
+
+        added = add_images(db, batch, new, on_error=skip)
+        batch_counters.recount(db, batch_id)
+        if added:
+            batch.status = "queued"
+        db.commit()
+        # only now: a rolled-back tick reports the same files again
+        index.mark_known(added + rejected)
+        if not added:
+            return 0
+        job_queue.set_total(batch_id, 0)
+        # resume infers only images without a checkpoint for this configuration;
+        # result.json is rewritten once when the watch stops, not every tick
+        scheduler.submit(db, "batch_run", batch_id, {"resume": True, "export": False},
+                         max_attempts=app_settings.job_max_attempts, unique=True)
+    finally:
+        db.close()
+    return len(added)
+
+
+class FolderWatcher:
+    def __init__(self, session_factory, batch_id, folder, interval, known=()):
+        self.batch_id = batch_id
+        self.folder = folder
+        self.interval = interval
+        self.index = FolderIndex(folder, known)
+        self.ingested = 0
+        self.last_scan = None
+        self.error = None
+        self._session_factory = session_factory
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._loop, daemon=True, name=f"watch-{batch_id}"
+        )
+
+    def start(self) -> "FolderWatcher":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=self.interval + 5)
+        if self.ingested:
+            self._export()
+
+    def _export(self) -> None:
+        db = self._session_factory()
+        try:
+            batch = db.get(Batch, self.batch_id)
+            if batch is not None:
+                storage.write_result_json(db, batch)
+        finally:
+            db.close()
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.ingested += watch_once(self._session_factory, self.batch_id, self.index)
+                self.error = None
+            except Exception as exc:  # noqa: BLE001
+                self.error = str(exc)
+            self.last_scan = time.time()
+            self._stop.wait(self.interval)
+
+    def status(self) -> dict:
+        return {
+            "watching": self._thread.is_alive() and not self._stop.is_set(),
+            "folder": self.folder,
+            "interval": self.interval,
+            "ingested": self.ingested,
+            "last_scan": self.last_scan,
+            "error": self.error,
+        }
+
+
+_WATCHERS: dict[str, FolderWatcher] = {}
+_LOCK = threading.Lock()
+
+
+def start(session_factory, batch, interval, known=()) -> FolderWatcher:
+    with _LOCK:
+        watcher = _WATCHERS.get(batch.id)
+        if watcher is None:
+            watcher = FolderWatcher(
+                session_factory, batch.id, batch.source_path, interval, known
+            ).start()
+            _WATCHERS[batch.id] = watcher
+        return watcher
+
+
+def stop(batch_id) -> bool:
+    with _LOCK:
+        watcher = _WATCHERS.pop(batch_id, None)
+    if watcher is None:
+        return False
+    watcher.stop()
+    return True
+
+
+def get(batch_id) -> FolderWatcher | None:
+    with _LOCK:
+        return _WATCHERS.get(batch_id)
+
+
+def stop_all() -> None:
+    with _LOCK:
+        ids = list(_WATCHERS)
+    for batch_id in ids:
+        stop(batch_id)
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Protocol, runtime_checkable
+from typing import Any, Protocol, runtime_checkable
 
 
 @dataclass
@@ -19,6 +19,22 @@ class DefectClassSpec:
     enabled: bool = True
 
 
+@dataclass
+class LoadedImage:
+    image_id: str
+    path: str
+    width: int
+    height: int
+    # Decoded BGR array, filled by the batch loader stage only for strategies
+    # that set ``wants_pixels = True``.
+    pixels: Any = None
+    digest: str | None = None  # sha1 of the file bytes, for content-keyed caches
+
+    @property
+    def source(self):
+        return self.pixels if self.pixels is not None else self.path
+
+
 @runtime_checkable
 class DefectStrategy(Protocol):
     name: str
@@ -28,6 +44,15 @@ class DefectStrategy(Protocol):
         ...
 
 
+@runtime_checkable
+class BatchDefectStrategy(DefectStrategy, Protocol):
+    """Optional batch entry point: one detection list per image, in order."""
+
+    def detect_many(self, images: list[LoadedImage], defect_classes: list[DefectClassSpec],
+                    params: dict) -> list[list[Detection]]:
+        ...
+
+
 STRATEGIES: dict[str, DefectStrategy] = {}
 
 
@@ -37,3 +62,13 @@ def register(strategy: DefectStrategy) -> None:
 
 def get_strategy(name: str) -> DefectStrategy:
     return STRATEGIES.get(name) or STRATEGIES["mock"]
+
+
+def detect_images(strategy: DefectStrategy, images: list[LoadedImage],
+                  defect_classes: list[DefectClassSpec], params: dict) -> list[list[Detection]]:
+    if isinstance(strategy, BatchDefectStrategy):
+        return strategy.detect_many(images, defect_classes, params)
+    return [
+        strategy.detect(im.source, im.width, im.height, defect_classes, params)
+        for im in images
+    ]
@@ -0,0 +1,242 @@
+import hashlib
+import os
+import pickle
+import sys
+import threading
+from collections import OrderedDict
+
+from ...config import settings
+
+
+def file_digest(path) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def source_digest(source, digest=None):
+    """Content hash for a predictor source; None when it cannot be keyed."""
+    if digest:
+        return digest
+    if isinstance(source, str):
+        try:
+            return file_digest(source)
+        except OSError:
+            return None
+    return None
+
+
+def cache_key(digest, model_path, kind) -> str:
+    # ``kind`` separates the semantic (batch) and interactive (click)
+    # predictors: both load the same weights but encode different features.
+    raw = f"{kind}\0{os.path.abspath(model_path)}\0{digest}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _is_tensor(obj) -> bool:
+    return hasattr(obj, "detach") and hasattr(obj, "to")
+
+
+def _map(fn, obj):
+    if isinstance(obj, dict):
+        return {k: _map(fn, v) for k, v in obj.items()}
+    if type(obj) in (list, tuple):
+        return type(obj)(_map(fn, v) for v in obj)
+    return fn(obj)
+
+
+def to_host(obj):
+    """``obj`` with every tensor detached and copied to CPU memory, so the
+    cache never pins GPU memory and the disk tier loads without CUDA."""
+    return _map(lambda v: v.detach().cpu() if _is_tensor(v) else v, obj)
+
+
+def to_device(obj, device):
+    """Cached features moved back to the predictor's ``device``."""
+    if device is None:
+        return obj
+    return _map(lambda v: v.to(device) if _is_tensor(v) else v, obj)
+
+
+def nbytes(obj) -> int | None:
+    """Bytes held by ``obj``; None when it contains something unmeasurable."""
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        return sys.getsizeof(obj)
+    if hasattr(obj, "element_size") and hasattr(obj, "nelement"):
+        return int(obj.element_size() * obj.nelement())
+    if hasattr(obj, "nbytes"):
+        return int(obj.nbytes)
+    if isinstance(obj, (dict, list, tuple)):
+        sizes = [nbytes(v) for v in (obj.values() if isinstance(obj, dict) else obj)]
+        return None if None in sizes else sum(sizes)
+    return None
+
+
+class EmbeddingCache:
+    """Two-tier LRU of image encoder outputs.
+
+    The memory tier holds the feature objects (moved to CPU by ``put``);
+    the optional disk tier pickles them under ``disk_dir``. Both tiers evict
+    least-recently-used entries once their byte budget is exceeded. Values
+    whose size cannot be measured are not cached.
+    """
+
+    def __init__(self, memory_bytes, disk_dir=None, disk_bytes=0):
+        self.memory_bytes = memory_bytes
+        self.disk_dir = disk_dir if disk_bytes > 0 else None
+        self.disk_bytes = disk_bytes
+        self._memory: OrderedDict[str, tuple[object, int]] = OrderedDict()
+        self._memory_used = 0
+        self._disk: OrderedDict[str, int] | None = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            value = self._disk_get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._memory_put(key, value, nbytes(value))
+            return value
+
+    def put(self, key, value) -> None:
+        if value is None:
+            return
+        value = to_host(value)
+        size = nbytes(value)
+        if size is None:
+            return
+        with self._lock:
+            self._memory_put(key, value, size)
+            self._disk_put(key, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._memory_used = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._memory),
+                "memory_bytes": self._memory_used,
+                "disk_entries": len(self._disk) if self._disk is not None else 0,
+                "disk_bytes": sum(self._disk.values()) if self._disk is not None else 0,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _memory_put(self, key, value, size) -> None:
+        if size is None or size > self.memory_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_used -= old[1]
+        self._memory[key] = (value, size)
+        self._memory_used += size
+        while self._memory_used > self.memory_bytes:
+            _, (_, evicted) = self._memory.popitem(last=False)
+            self._memory_used -= evicted
+
+    def _path(self, key) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.pkl")
+
+    def _disk_index(self) -> OrderedDict:
+        if self._disk is None:
+            found = []
+            if os.path.isdir(self.disk_dir):
+                for shard in os.scandir(self.disk_dir):
+                    if not shard.is_dir():
+                        continue
+                    for entry in os.scandir(shard.path):
+                        if entry.name.endswith(".pkl"):
+                            st = entry.stat()
+                            found.append((st.st_mtime, entry.name[:-4], st.st_size))
+            self._disk = OrderedDict((key, size) for _, key, size in sorted(found))
+        return self._disk
+
+    def _disk_get(self, key):
+        if self.disk_dir is None or key not in self._disk_index():
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as fh:
+                value = pickle.load(fh)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            self._disk.pop(key, None)
+            return None
+        os.utime(path)
+        self._disk.move_to_end(key)
+        return value
+
+    def _disk_put(self, key, value) -> None:
+        if self.disk_dir is None:
+            return
+        index = self._disk_index()
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as fh:
+            pickle.dump(value, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        index.pop(key, None)
+        index[key] = os.path.getsize(path)
+        used = sum(index.values())
+        while used > self.disk_bytes and index:
+            evicted, size = index.popitem(last=False)
+            used -= size
+            try:
+                os.remove(self._path(evicted))
+            except OSError:
+                pass
+
+
+_cache: EmbeddingCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> EmbeddingCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache(
+                settings.embedding_cache_mb * 1024 * 1024,
+                os.path.join(settings.data_dir, "embeddings"),
+                settings.embedding_disk_cache_mb * 1024 * 1024,
+            )
+        return _cache
+
+
+def set_image(predictor, source, model_path, kind, digest=None) -> None:
+    """``predictor.set_image(source)`` that reuses cached encoder features.
+
+    On a hit only the (cheap) source setup runs and the cached features are
+    installed, which is what Ultralytics' SAM predictors read on the next
+    prompt call. A predictor without those hooks is never cached.
+    """
+    digest = source_digest(source, digest) if settings.embedding_cache_mb > 0 else None
+    hooks = all(hasattr(predictor, name) for name in ("features", "setup_source"))
+    if digest is None or not hooks:
+        predictor.set_image(source)
+        return
+    cache = get_cache()
+    key = cache_key(digest, model_path, kind)
+    features = cache.get(key)
+    if features is None:
+        predictor.set_image(source)
+        cache.put(key, getattr(predictor, "features", None))
+        return
+    if predictor.model is None:
+        predictor.setup_model()
+    predictor.setup_source(source)
+    predictor.features = to_device(features, getattr(predictor, "device", None))
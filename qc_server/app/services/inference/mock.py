@@ -3,7 +3,7 @@ import math
 import os
 import random
 
-from .base import Detection, DefectClassSpec, register
+from .base import Detection, DefectClassSpec, LoadedImage, register
 
 
 class MockStrategy:
@@ -46,5 +46,12 @@ class MockStrategy:
             ))
         return detections
 
+    def detect_many(self, images: list[LoadedImage], defect_classes: list[DefectClassSpec],
+                    params: dict) -> list[list[Detection]]:
+        return [
+            self.detect(im.path, im.width, im.height, defect_classes, params)
+            for im in images
+        ]
+
 
 register(MockStrategy())
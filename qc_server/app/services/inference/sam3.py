@@ -3,7 +3,9 @@ from __future__ import annotations
 import math
 import os
 
-from .base import Detection, DefectClassSpec, register
+from .. import model_registry
+from . import embedding_cache
+from .base import Detection, DefectClassSpec, LoadedImage, register
 
 POLYGON_EPSILON = 2.0
 
@@ -47,65 +49,137 @@ def simplify_polygon(points, epsilon, width, height):
     return out
 
 
-_predictor = None
-_predictor_path = None
+def _load_predictor(model_path):
+    from ultralytics.models.sam import SAM3SemanticPredictor
+
+    predictor = SAM3SemanticPredictor(overrides=dict(
+        conf=0.01,
+        task="segment",
+        mode="predict",
+        model=model_path,
+        half=True,       # FP16 on GPU
+        save=False,       # don't write runs/segment/* annotated crops per image
+        verbose=False,    # quiet per-image logging during a batch
+    ))
+    predictor.setup_model()  # load weights now so the registry can size them
+    return predictor
+
+
+model_registry.register_loader("sam3_semantic", _load_predictor)
 
 
 def get_predictor(model_path):
-    global _predictor, _predictor_path
-    if _predictor is None or _predictor_path != model_path:
-        from ultralytics.models.sam import SAM3SemanticPredictor
-
-        _predictor = SAM3SemanticPredictor(overrides=dict(
-            conf=0.01,
-            task="segment",
-            mode="predict",
-            model=model_path,
-            half=True,       # FP16 on GPU
-            save=False,       # don't write runs/segment/* annotated crops per image
-            verbose=False,    # quiet per-image logging during a batch
-        ))
-        _predictor_path = model_path
-    return _predictor
+    return model_registry.get_registry().get("sam3_semantic", model_path)
 
 
 class Sam3Strategy:
     name = "sam3_prompt"
+    wants_pixels = True  # set_image() accepts the loader's decoded array
+    prompt_modes = ("single_pass", "per_class")
+    emits_candidates = True  # honours params["candidate_floor"]
+    cacheable = True  # output depends only on image content + params
 
     def detect(self, image_path, width, height, defect_classes, params):
+        if isinstance(image_path, str):
+            image = LoadedImage("", image_path, width, height)
+        else:
+            image = LoadedImage("", "", width, height, pixels=image_path)
+        return self.detect_many([image], defect_classes, params)[0]
+
+    def detect_many(self, images, defect_classes, params):
+        # SAM3SemanticPredictor encodes one image per set_image() call, so a
+        # chunk shares the predictor lookup and model check, not the encoder pass.
         model_path = params.get("qc_model_path")
         if not model_path or not os.path.exists(model_path):
             raise ValueError(
                 "No QC model selected (Settings -> QC / Segmentation Model)"
             )
-        threshold = params.get("confidence_threshold", 0.5)
-
+        from .. import inference_pool
+
+        if inference_pool.enabled():
+            # One image per worker process; the chunk runs in parallel.
+            pool = inference_pool.get_pool()
+            futures = [
+                pool.submit("app.services.inference.sam3:detect_in_worker", im.pixels,
+                            LoadedImage(im.image_id, im.path, im.width, im.height,
+                                        digest=im.digest),
+                            defect_classes, params)
+                for im in images
+            ]
+            return [f.result() for f in futures]
+        return self.detect_local(images, defect_classes, params)
+
+    def detect_local(self, images, defect_classes, params):
+        model_path = params["qc_model_path"]
         predictor = get_predictor(model_path)
-        predictor.set_image(image_path)
+        threshold = params.get("candidate_floor", params.get("confidence_threshold", 0.5))
+        mode = params.get("prompt_mode", "single_pass")
+        return [
+            self._detect_one(predictor, model_path, im, defect_classes, threshold, mode)
+            for im in images
+        ]
+
+    @staticmethod
+    def _detect_one(predictor, model_path, image, defect_classes, threshold, mode):
+        enabled = [spec for spec in defect_classes if spec.enabled]
+        if not enabled:
+            return []
+        embedding_cache.set_image(
+            predictor, image.source, model_path, "sam3_semantic", image.digest
+        )
+        width, height = image.width, image.height
+        candidates = []
+        if mode == "per_class":
+            for spec in enabled:
+                for result in predictor(text=[spec.name]):
+                    candidates.extend((spec, poly, conf) for poly, conf, _ in _rows(result))
+        else:
+            # One prompt/decoder pass for every class. boxes.cls is the index of
+            # the text prompt; a stable sort on it restores per-class order.
+            rows = []
+            for result in predictor(text=[spec.name for spec in enabled]):
+                rows.extend(_rows(result))
+            rows.sort(key=lambda row: row[2])
+            candidates = [(enabled[cls], poly, conf) for poly, conf, cls in rows]
 
         detections: list[Detection] = []
-        for spec in defect_classes:
-            if not spec.enabled:
+        for spec, poly, conf in candidates:
+            # rounded before the comparison: the stored (rounded) value is what
+            # the writer and a later re-filter compare against the threshold
+            score = round(float(conf), 2)
+            if score < threshold:
+                continue
+            polygon = simplify_polygon(poly, POLYGON_EPSILON, width, height)
+            if not polygon:
                 continue
-            for result in predictor(text=[spec.name]):
-                masks = getattr(result, "masks", None)
-                boxes = getattr(result, "boxes", None)
-                if masks is None or boxes is None:
-                    continue
-                for poly, conf in zip(masks.xy, boxes.conf):
-                    score = float(conf)
-                    if score < threshold:
-                        continue
-                    polygon = simplify_polygon(poly, POLYGON_EPSILON, width, height)
-                    if not polygon:
-                        continue
-                    detections.append(Detection(
-                        type=spec.name,
-                        category=spec.category,
-                        confidence=round(score, 2),
-                        polygon=polygon,
-                    ))
+            detections.append(Detection(
+                type=spec.name,
+                category=spec.category,
+                confidence=score,
+                polygon=polygon,
+            ))
         return detections
 
 
-register(Sam3Strategy())
+def detect_in_worker(pixels, image, defect_classes, params):
+    """Inference-pool task: ``pixels`` arrives through shared memory."""
+    image.pixels = pixels
+    return _strategy.detect_local([image], defect_classes, params)[0]
+
+
+def _rows(result):
+    masks = getattr(result, "masks", None)
+    boxes = getattr(result, "boxes", None)
+    if masks is None or boxes is None:
+        return []
+    classes = getattr(boxes, "cls", None)
+    if classes is None:
+        classes = [0] * len(boxes.conf)
+    return [
+        (poly, conf, int(cls))
+        for poly, conf, cls in zip(masks.xy, boxes.conf, classes)
+    ]
+
+
+_strategy = Sam3Strategy()
+register(_strategy)
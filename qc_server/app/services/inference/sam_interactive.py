@@ -1,19 +1,35 @@
 import os
 
+from .. import model_registry
+from . import embedding_cache
 from .sam3 import POLYGON_EPSILON, simplify_polygon
 
-_model = None
-_model_path = None
+
+def _load_sam(model_path):
+    from ultralytics import SAM
+
+    return SAM(model_path)
+
+
+model_registry.register_loader("sam_interactive", _load_sam)
 
 
 def get_model(model_path):
-    global _model, _model_path
-    if _model is None or _model_path != model_path:
-        from ultralytics import SAM
+    return model_registry.get_registry().get("sam_interactive", model_path)
 
-        _model = SAM(model_path)
-        _model_path = model_path
-    return _model
+
+def get_predictor(model_path):
+    # Same predictor SAM.predict() would build, kept on the model so
+    # set_image()/features survive between clicks.
+    model = get_model(model_path)
+    if model.predictor is None:
+        predictor_cls = model.task_map[model.task]["predictor"]
+        model.predictor = predictor_cls(overrides=dict(
+            conf=0.25, task="segment", mode="predict", imgsz=1024,
+            model=model_path, save=False, verbose=False,
+        ))
+        model.predictor.setup_model(model=model.model, verbose=False)
+    return model.predictor
 
 
 def _best_index(boxes):
@@ -30,13 +46,12 @@ def segment(image_path, width, height, point=None, box=None, model_path=""):
     if not model_path or not os.path.exists(model_path):
         raise ValueError("No QC model selected (Settings -> QC / Segmentation Model)")
 
-    model = get_model(model_path)
+    predictor = get_predictor(model_path)
+    embedding_cache.set_image(predictor, image_path, model_path, "sam_interactive")
     if point is not None:
-        results = model(image_path, points=[[point[0], point[1]]], labels=[1],
-                        verbose=False, save=False)
+        results = predictor(points=[[point[0], point[1]]], labels=[1])
     else:
-        results = model(image_path, bboxes=[[box[0], box[1], box[2], box[3]]],
-                        verbose=False, save=False)
+        results = predictor(bboxes=[[box[0], box[1], box[2], box[3]]])
 
     if not results:
         return []
@@ -0,0 +1,211 @@
+"""Optional out-of-process inference.
+
+Each worker is a spawned process that keeps whatever models its tasks load
+(``get_model`` / ``get_predictor`` module globals) for its whole life, so the
+API process only routes work. Frames travel through ``SharedMemory`` blocks
+instead of being pickled; arguments and results are small and pickled as
+usual. Tasks are named ``"module:function"`` and called as
+``fn(frame, *args, **kwargs)`` in the worker (``frame`` may be None);
+``broadcast`` tasks take no frame.
+"""
+
+import importlib
+import itertools
+import multiprocessing as mp
+import queue
+import threading
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from ..config import settings
+
+_NO_FRAME = "-"
+_TASKS: dict = {}  # resolved task functions, per worker process
+
+
+def _resolve(task):
+    fn = _TASKS.get(task)
+    if fn is None:
+        module, _, name = task.partition(":")
+        fn = _TASKS[task] = getattr(importlib.import_module(module), name)
+    return fn
+
+
+def _attach(spec):
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        # Copy out so the task may keep the frame (predictors hold on to
+        # their source) after the parent unlinks the block.
+        return np.array(np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf))
+    finally:
+        shm.close()
+
+
+def _worker_main(tasks, results):
+    while True:
+        item = tasks.get()
+        if item is None:
+            return
+        req_id, task, frame_spec, args, kwargs = item
+        try:
+            if frame_spec == _NO_FRAME:
+                call_args = args
+            else:
+                call_args = (None if frame_spec is None else _attach(frame_spec), *args)
+            results.put((req_id, True, _resolve(task)(*call_args, **kwargs)))
+        except BaseException as exc:  # noqa: BLE001
+            try:
+                results.put((req_id, False, exc))
+            except Exception:  # unpicklable exception
+                results.put((req_id, False, RuntimeError(repr(exc))))
+
+
+class InferencePool:
+    def __init__(self, processes):
+        self._ctx = mp.get_context("spawn")
+        self._results = self._ctx.Queue()
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._pending: dict[int, tuple[Future, object, int]] = {}
+        self._workers = [self._spawn() for _ in range(max(1, processes))]
+        self._inflight = [0] * len(self._workers)
+        self._closed = False
+        self._collector = threading.Thread(target=self._collect, daemon=True,
+                                           name="inference-pool")
+        self._collector.start()
+
+    def _spawn(self):
+        tasks = self._ctx.Queue()
+        proc = self._ctx.Process(target=_worker_main, args=(tasks, self._results),
+                                 daemon=True)
+        proc.start()
+        return proc, tasks
+
+    @property
+    def size(self) -> int:
+        return len(self._workers)
+
+    def submit(self, task, frame=None, *args, **kwargs) -> Future:
+        return self._submit(None, task, frame, args, kwargs, frameless=False)
+
+    def call(self, task, frame=None, *args, **kwargs):
+        return self.submit(task, frame, *args, **kwargs).result()
+
+    def broadcast(self, task, *args, **kwargs) -> list:
+        """Run a frame-less task once on every worker (e.g. to preload a model)."""
+        futures = [self._submit(i, task, None, args, kwargs, frameless=True)
+                   for i in range(self.size)]
+        return [f.result() for f in futures]
+
+    def _submit(self, worker, task, frame, args, kwargs, frameless) -> Future:
+        future: Future = Future()
+        shm = None
+        spec = _NO_FRAME if frameless else None
+        if frame is not None:
+            frame = np.ascontiguousarray(frame)
+            shm = shared_memory.SharedMemory(create=True, size=max(1, frame.nbytes))
+            np.ndarray(frame.shape, dtype=frame.dtype, buffer=shm.buf)[...] = frame
+            spec = (shm.name, frame.shape, frame.dtype.str)
+        with self._lock:
+            if self._closed:
+                self._release(shm)
+                raise RuntimeError("inference pool is closed")
+            if worker is None:
+                # least in-flight work first
+                worker = min(range(self.size), key=self._inflight.__getitem__)
+            req_id = next(self._ids)
+            self._pending[req_id] = (future, shm, worker)
+            self._inflight[worker] += 1
+            self._workers[worker][1].put((req_id, task, spec, args, kwargs))
+        return future
+
+    @staticmethod
+    def _release(shm) -> None:
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+    def _finish(self, req_id, ok, value) -> None:
+        with self._lock:
+            entry = self._pending.pop(req_id, None)
+            if entry is None:
+                return
+            future, shm, worker = entry
+            self._inflight[worker] -= 1
+        self._release(shm)
+        if ok:
+            future.set_result(value)
+        else:
+            future.set_exception(value)
+
+    def _collect(self) -> None:
+        while True:
+            try:
+                item = self._results.get(timeout=1.0)
+            except queue.Empty:
+                item = None
+            except (EOFError, OSError):
+                return
+            if item is not None:
+                self._finish(*item)
+            if self._closed and not self._pending:
+                return
+            self._reap()
+
+    def _reap(self) -> None:
+        # A crashed worker (e.g. CUDA abort) fails its in-flight requests
+        # and is replaced so the pool keeps its size.
+        for index, (proc, _) in enumerate(self._workers):
+            if self._closed or proc.is_alive():
+                continue
+            with self._lock:
+                lost = [rid for rid, (_, _, w) in self._pending.items() if w == index]
+                self._workers[index] = self._spawn()
+            for rid in lost:
+                self._finish(rid, False, RuntimeError(
+                    f"inference worker exited with code {proc.exitcode}"))
+
+    def close(self, timeout=5.0) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            workers = list(self._workers)
+        for _, tasks in workers:
+            tasks.put(None)
+        for proc, _ in workers:
+            proc.join(timeout)
+            if proc.is_alive():
+                proc.terminate()
+        with self._lock:
+            lost = list(self._pending)
+        for rid in lost:
+            self._finish(rid, False, RuntimeError("inference pool closed"))
+
+
+_pool: InferencePool | None = None
+_pool_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return settings.inference_processes > 0
+
+
+def get_pool() -> InferencePool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = InferencePool(settings.inference_processes)
+        return _pool
+
+
+def shutdown() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+
@@ -1,20 +1,60 @@
+import time
 from threading import Lock
 
 _PROGRESS: dict[str, dict] = {}
 _LOCK = Lock()
 
 
-def set_total(batch_id: str, total: int) -> None:
+def set_total(batch_id: str, total: int, done: int = 0) -> None:
+    """Start tracking a job; ``done`` items (e.g. skipped on resume) count as
+    complete but are left out of the throughput estimate."""
     with _LOCK:
-        _PROGRESS[batch_id] = {"done": 0, "total": total}
+        version = _PROGRESS.get(batch_id, {}).get("_version", 0) + 1
+        _PROGRESS[batch_id] = {"done": done, "total": total, "_base": done,
+                               "_started": time.monotonic(), "_state": "running",
+                               "_version": version}
 
 
-def increment(batch_id: str) -> None:
+def increment(batch_id: str, n: int = 1) -> None:
     with _LOCK:
         if batch_id in _PROGRESS:
-            _PROGRESS[batch_id]["done"] += 1
+            _PROGRESS[batch_id]["done"] += n
+            _PROGRESS[batch_id]["_version"] += 1
+
+
+def finish(batch_id: str, state: str) -> None:
+    """Record the terminal state (done / failed / cancelled / ...) for streams."""
+    with _LOCK:
+        entry = _PROGRESS.setdefault(batch_id, {
+            "done": 0, "total": 0, "_base": 0, "_started": time.monotonic(), "_version": 0,
+        })
+        entry["_state"] = state
+        entry["_version"] += 1
+
+
+def _public(entry) -> dict:
+    done, total = entry["done"], entry["total"]
+    elapsed = time.monotonic() - entry["_started"]
+    rate = (done - entry["_base"]) / elapsed if elapsed > 0 else 0.0
+    eta = None
+    if rate > 0:
+        eta = round(max(0, total - done) / rate, 1)
+    return {"done": done, "total": total,
+            "images_per_sec": round(rate, 2) if rate > 0 else None, "eta_s": eta}
 
 
 def get(batch_id: str) -> dict:
     with _LOCK:
-        return dict(_PROGRESS.get(batch_id, {"done": 0, "total": 0}))
+        entry = _PROGRESS.get(batch_id)
+        if entry is None:
+            return {"done": 0, "total": 0, "images_per_sec": None, "eta_s": None}
+        return _public(entry)
+
+
+def snapshot(batch_id: str) -> tuple[int, str | None, dict]:
+    """(version, state, progress); version changes on every update."""
+    with _LOCK:
+        entry = _PROGRESS.get(batch_id)
+        if entry is None:
+            return 0, None, {"done": 0, "total": 0, "images_per_sec": None, "eta_s": None}
+        return entry["_version"], entry["_state"], _public(entry)
@@ -0,0 +1,195 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from ..config import settings
+
+
+@dataclass
+class ResidentModel:
+    kind: str
+    path: str
+    model: object
+    size_bytes: int
+    load_seconds: float
+    loaded_at: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.time)
+    uses: int = 0
+    pinned: bool = False
+
+
+def model_bytes(model, path="") -> int:
+    """Parameter + buffer bytes of the torch module(s) behind ``model``,
+    falling back to the weight file size."""
+    seen, total = set(), 0
+    stack = [model]
+    for _ in range(3):
+        nxt = []
+        for obj in stack:
+            if obj is None or id(obj) in seen:
+                continue
+            seen.add(id(obj))
+            if hasattr(obj, "parameters") and hasattr(obj, "buffers"):
+                try:
+                    tensors = list(obj.parameters()) + list(obj.buffers())
+                    total += sum(int(t.element_size() * t.nelement()) for t in tensors)
+                    continue
+                except Exception:  # noqa: BLE001
+                    pass
+            nxt.append(getattr(obj, "model", None))
+        stack = nxt
+    if total == 0 and path and os.path.isfile(path):
+        total = os.path.getsize(path)
+    return total
+
+
+_LOADERS: dict = {}
+
+
+def register_loader(kind, loader) -> None:
+    """``loader(path)`` builds a ready-to-use model of ``kind``."""
+    _LOADERS[kind] = loader
+
+
+def kinds() -> list[str]:
+    return sorted(_LOADERS)
+
+
+class ModelRegistry:
+    """Resident models keyed by (kind, path) under a byte budget.
+
+    Least-recently-used, unpinned models are evicted once the budget is
+    exceeded; the model just loaded is never evicted by its own load.
+    Loads of the same key are serialized, different keys load concurrently.
+    """
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self._models: OrderedDict[tuple[str, str], ResidentModel] = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: dict[tuple[str, str], threading.Lock] = {}
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, kind, path, loader=None):
+        key = (kind, os.path.abspath(path))
+        with self._lock:
+            entry = self._touch(key)
+            if entry is not None:
+                return entry.model
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                entry = self._touch(key)
+                if entry is not None:
+                    return entry.model
+            load = loader or _LOADERS.get(kind)
+            if load is None:
+                raise KeyError(f"no loader registered for model kind {kind!r}")
+            started = time.perf_counter()
+            model = load(path)
+            entry = ResidentModel(kind, key[1], model, model_bytes(model, path),
+                                  time.perf_counter() - started, uses=1)
+            with self._lock:
+                self._models[key] = entry
+                self.loads += 1
+                self._evict(keep=key)
+            return model
+
+    def _touch(self, key):
+        entry = self._models.get(key)
+        if entry is not None:
+            self._models.move_to_end(key)
+            entry.last_used = time.time()
+            entry.uses += 1
+        return entry
+
+    def _evict(self, keep) -> None:
+        used = sum(e.size_bytes for e in self._models.values())
+        freed = False
+        for key in list(self._models):
+            if used <= self.budget_bytes:
+                break
+            entry = self._models[key]
+            if key == keep or entry.pinned:
+                continue
+            del self._models[key]
+            used -= entry.size_bytes
+            self.evictions += 1
+            freed = True
+        if freed:
+            _release_gpu_memory()
+
+    def pin(self, kind, path) -> ResidentModel:
+        self.get(kind, path)
+        with self._lock:
+            entry = self._models[(kind, os.path.abspath(path))]
+            entry.pinned = True
+            return entry
+
+    def unpin(self, kind, path) -> bool:
+        with self._lock:
+            entry = self._models.get((kind, os.path.abspath(path)))
+            if entry is None:
+                return False
+            entry.pinned = False
+            self._evict(keep=None)
+            return True
+
+    def evict(self, kind, path) -> bool:
+        with self._lock:
+            entry = self._models.pop((kind, os.path.abspath(path)), None)
+            if entry is not None:
+                self.evictions += 1
+        if entry is not None:
+            _release_gpu_memory()
+        return entry is not None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._models.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            resident = [
+                {
+                    "kind": e.kind,
+                    "path": e.path,
+                    "name": os.path.basename(e.path),
+                    "size_bytes": e.size_bytes,
+                    "load_seconds": round(e.load_seconds, 3),
+                    "loaded_at": e.loaded_at,
+                    "last_used": e.last_used,
+                    "uses": e.uses,
+                    "pinned": e.pinned,
+                }
+                for e in reversed(self._models.values())  # most recent first
+            ]
+            return {
+                "budget_bytes": self.budget_bytes,
+                "used_bytes": sum(e.size_bytes for e in self._models.values()),
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "models": resident,
+            }
+
+
+def _release_gpu_memory() -> None:
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+_registry: ModelRegistry | None = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ModelRegistry:
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry(settings.model_memory_mb * 1024 * 1024)
+        return _registry
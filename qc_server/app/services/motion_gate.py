@@ -0,0 +1,50 @@
+"""Skip detection while the scene is static.
+
+``MotionGate`` shrinks each frame to a small grayscale thumbnail and
+compares it with the thumbnail of the last frame that went through the
+detector. When fewer than ``threshold`` of its pixels changed by more than
+``pixel_delta`` grey levels, the frame is static and the caller reuses its
+last detections. The reference only moves on frames that pass the gate, so
+slow drift still adds up to a detection. After ``max_skip`` static frames in
+a row, one frame is let through anyway.
+"""
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    def __init__(self, threshold, width=64, pixel_delta=15, max_skip=30):
+        self.threshold = threshold  # fraction of thumbnail pixels that must change
+        self.width = width
+        self.pixel_delta = pixel_delta
+        self.max_skip = max_skip
+        self.checked = 0
+        self.skipped = 0
+        self._reference = None
+        self._run = 0
+
+    def _thumbnail(self, frame):
+        h, w = frame.shape[:2]
+        size = (self.width, max(1, round(h * self.width / w))) if w > self.width else (w, h)
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        return small if small.ndim == 2 else cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def moving(self, frame) -> bool:
+        """Whether ``frame`` needs a detector pass."""
+        thumb = self._thumbnail(frame)
+        self.checked += 1
+        ref = self._reference
+        if ref is not None and ref.shape == thumb.shape and self._run < self.max_skip:
+            changed = np.count_nonzero(cv2.absdiff(thumb, ref) > self.pixel_delta)
+            if changed < self.threshold * thumb.size:
+                self.skipped += 1
+                self._run += 1
+                return False
+        self._reference = thumb
+        self._run = 0
+        return True
+
+    @property
+    def skip_rate(self) -> float:
+        return round(self.skipped / self.checked, 3) if self.checked else 0.0
@@ -2,9 +2,7 @@ import os
 from dataclasses import dataclass
 
 from ..config import settings
-
-_model = None
-_model_path = None
+from . import model_registry
 
 
 @dataclass
@@ -38,17 +36,30 @@ def resolve_model_path(setting):
     return path if os.path.isfile(path) else None
 
 
-def get_model(model_path):
-    global _model, _model_path
-    if _model is None or _model_path != model_path:
-        from ultralytics import YOLO  # lazy, server-only
+def _load_yolo(model_path):
+    from ultralytics import YOLO  # lazy, server-only
+
+    return YOLO(model_path)
 
-        _model = YOLO(model_path)
-        _model_path = model_path
-    return _model
+
+model_registry.register_loader("yolo", _load_yolo)
+
+
+def get_model(model_path):
+    return model_registry.get_registry().get("yolo", model_path)
 
 
 def detect(frame, conf_threshold, model_path):
+    from . import inference_pool
+
+    if inference_pool.enabled():
+        return inference_pool.get_pool().call(
+            "app.services.object_detection:detect_local", frame, conf_threshold, model_path
+        )
+    return detect_local(frame, conf_threshold, model_path)
+
+
+def detect_local(frame, conf_threshold, model_path):
     # Smoke-verified on the GPU server. Unit tests avoid ML deps.
     model = get_model(model_path)
     results = model(frame, conf=conf_threshold, verbose=False)[0]
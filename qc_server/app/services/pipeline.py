@@ -1,43 +1,250 @@
+import hashlib
+import json
 import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from sqlalchemy import case, delete, exists, func, insert, or_, select, update
 
-from ..config import settings as app_settings
 from .. import storage
-from ..models import Batch, DefectClass, Defect, Image, Setting
+from ..config import settings as app_settings
+from ..models import Batch, Candidate, DefectClass, Defect, Image, Job, Setting
 from ..util import gen_id
-from . import job_queue
-from .inference.base import DefectClassSpec, get_strategy
+from . import batch_counters, job_queue, result_cache, scheduler
+from .batch_writer import ResultWriter
+from .inference.base import DefectClassSpec, LoadedImage, detect_images, get_strategy
 from .inference import mock  # noqa: F401  (registers "mock")
 from .inference import sam3  # noqa: F401  (registers "sam3_prompt")
 
+# Batch states owned by a job or watcher; /run and /reset refuse them.
+BUSY_STATUSES = ("queued", "processing", "ingesting")
+
 
-def prepare_images(db, batch) -> int:
-    """Create raw (un-segmented) image rows for a batch's source folder."""
+def prepare_images(db, batch, progress=False) -> int:
+    """Create raw (un-segmented) image rows for a batch's source folder.
+
+    Dimensions are read from file headers on a thread pool and rows are
+    bulk-inserted in one transaction. With ``progress`` the header reads are
+    reported through ``job_queue`` under the batch id.
+    """
     files = storage.list_images(batch.source_path)
-    for filename in files:
-        path = storage.image_path(batch, filename)
-        width, height = storage.image_size(path)
-        image_id = gen_id("img")
-        db.add(Image(
-            id=image_id,
-            batch_id=batch.id,
-            filename=filename,
-            url=f"/api/images/{image_id}/file",
-            width=width,
-            height=height,
-            status="pending",
-            reviewed=False,
-        ))
-    batch.image_count = len(files)
+    if progress:
+        job_queue.set_total(batch.id, len(files))
+    add_images(db, batch, files, progress)
+    batch_counters.recount(db, batch.id)
     db.commit()
     return len(files)
 
 
-def run_batch(batch_id: str, session_factory, confidence_override=None) -> None:
+def _image_size_or_error(path):
+    try:
+        return storage.image_size(path), None
+    except Exception as exc:  # noqa: BLE001
+        return None, exc
+
+
+def add_images(db, batch, files, progress=False, on_error=None) -> list[str]:
+    """Bulk-insert ``pending`` rows for ``files`` (no commit); returns the
+    filenames inserted. A file whose header cannot be read raises, or with
+    ``on_error(filename, exc)`` is reported and skipped."""
+    paths = [storage.image_path(batch, f) for f in files]
+    workers = max(1, app_settings.ingest_workers)
+    added = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest") as pool:
+        for chunk in chunked(zip(files, pool.map(_image_size_or_error, paths)),
+                             max(1, app_settings.ingest_chunk)):
+            rows = []
+            for filename, (size, error) in chunk:
+                if error is not None:
+                    if on_error is None:
+                        raise error
+                    on_error(filename, error)
+                    continue
+                width, height = size
+                image_id = gen_id("img")
+                rows.append({
+                    "id": image_id,
+                    "batch_id": batch.id,
+                    "filename": filename,
+                    "url": f"/api/images/{image_id}/file",
+                    "width": width,
+                    "height": height,
+                    "status": "pending",
+                    "reviewed": False,
+                })
+                added.append(filename)
+            if rows:
+                db.execute(insert(Image), rows)
+            if progress:
+                job_queue.increment(batch.id, len(chunk))
+    return added
+
+
+def ingest_batch(batch_id: str, session_factory) -> None:
+    """Background variant of ``prepare_images`` for large folders."""
+    db = session_factory()
+    try:
+        batch = db.get(Batch, batch_id)
+        if batch is None:
+            return
+        try:
+            prepare_images(db, batch, progress=True)
+        except Exception as exc:
+            db.rollback()
+            batch = db.get(Batch, batch_id)
+            batch.status = "failed"
+            batch.error = str(exc)
+            db.commit()
+            job_queue.finish(batch_id, "failed")
+            raise
+        batch.status = "pending"
+        db.commit()
+        job_queue.finish(batch_id, "pending")
+    finally:
+        db.close()
+
+
+def load_image(image_id, path, width, height, decode=False, digest=False) -> LoadedImage:
+    """Loader stage: read (and optionally decode and hash) one image off the
+    inference thread."""
+    pixels = None
+    sha1 = None
+    if decode or digest:
+        with open(path, "rb") as fh:
+            data = fh.read()
+        if decode:
+            pixels = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+            if pixels is None:
+                raise ValueError(f"cannot decode image {os.path.basename(path)}")
+        if digest:
+            sha1 = hashlib.sha1(data).hexdigest()
+    return LoadedImage(image_id, path, width, height, pixels, sha1)
+
+
+def prefetch(pool, fn, items, depth):
+    """Yield ``fn(item)`` in order while keeping up to ``depth`` loads in flight."""
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(fn, *item))
+        if len(pending) > depth:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def chunked(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_label(strategy, params) -> str:
+    mode = params.get("prompt_mode")
+    if mode in getattr(strategy, "prompt_modes", ()):
+        return f"{strategy.name}/{mode}"
+    return strategy.name
+
+
+def record_latency(model_info, label, ms_per_image) -> dict:
+    """Keep the latest per-image inference latency per strategy/prompt mode,
+    so switching modes leaves both numbers side by side in ``model_info``."""
+    info = dict(model_info or {})
+    latency = dict(info.get("ms_per_image") or {})
+    latency[label] = round(ms_per_image, 1)
+    info["ms_per_image"] = latency
+    return info
+
+
+def model_identity(path) -> str:
+    if not path:
+        return ""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return path
+    return f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def run_fingerprint(strategy, specs, params) -> str:
+    """Everything except the confidence threshold that decides what a
+    strategy emits; equal fingerprints mean stored candidates are reusable."""
+    enabled = sorted((s.name, s.category) for s in specs if s.enabled)
+    raw = json.dumps([
+        strategy.name,
+        model_identity(params.get("qc_model_path")),
+        params.get("prompt_mode"),
+        enabled,
+    ])
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def checkpoint_key(fingerprint, threshold, floor) -> str:
+    return hashlib.sha1(f"{fingerprint}\0{threshold!r}\0{floor!r}".encode()).hexdigest()
+
+
+def recover_interrupted(db) -> int:
+    """Batches left ``processing``/``ingesting`` by a restart, with no job
+    still queued for them, become ``failed`` so they can be resumed; completed
+    images keep their checkpoints."""
+    queued = select(Job.target_id).where(Job.status.in_(scheduler.ACTIVE))
+    stuck = db.query(Batch).filter(
+        Batch.status.in_(BUSY_STATUSES), Batch.id.not_in(queued)
+    ).all()
+    for batch in stuck:
+        batch.status = "failed"
+        batch.error = "interrupted by server restart"
+    db.commit()
+    return len(stuck)
+
+
+def refilter_batch(db, batch_id, threshold, checkpoint=None) -> int:
+    """Rebuild a batch's defects from its stored candidates, without inference."""
+    image_ids = select(Image.id).where(Image.batch_id == batch_id)
+    db.execute(delete(Defect).where(Defect.image_id.in_(image_ids)))
+    kept = db.execute(
+        select(Candidate.image_id, Candidate.type, Candidate.category,
+               Candidate.confidence, Candidate.polygon)
+        .where(Candidate.image_id.in_(image_ids), Candidate.confidence >= threshold)
+        .order_by(Candidate.id)
+    ).all()
+    if kept:
+        db.execute(insert(Defect), [
+            {"id": gen_id("d"), "image_id": r.image_id, "type": r.type,
+             "category": r.category, "confidence": r.confidence, "polygon": r.polygon}
+            for r in kept
+        ])
+    has_defect = exists().where(Defect.image_id == Image.id)
+    per_image = select(func.count(Defect.id)).where(Defect.image_id == Image.id)
+    db.execute(
+        update(Image)
+        .where(Image.batch_id == batch_id)
+        .values(status=case((has_defect, "defect"), else_="clean"), reviewed=False,
+                defect_count=per_image.scalar_subquery(), processed_fingerprint=checkpoint)
+    )
+    return len(kept)
+
+
+def run_batch(batch_id: str, session_factory, confidence_override=None,
+              resume=False, cancel_check=None, export=True, will_retry=False) -> None:
+    """Segment a batch. ``resume`` skips images already checkpointed under
+    this configuration; ``export=False`` leaves ``result.json`` alone (watch
+    mode writes it once when the watch stops). With ``will_retry`` a failure
+    leaves the batch ``queued`` for the scheduler's next attempt instead of
+    ``failed``, and progress listeners stay attached."""
     db = session_factory()
     try:
         batch = db.get(Batch, batch_id)
         if batch is None:
             return
+        batch.status = "processing"
         batch.reviewer = None
         batch.error = None
 
@@ -58,43 +265,172 @@ def run_batch(batch_id: str, session_factory, confidence_override=None) -> None:
         params = {
             "confidence_threshold": threshold,
             "qc_model_path": qc_model_path,
+            "prompt_mode": app_settings.sam3_prompt_mode,
         }
+        fingerprint = run_fingerprint(strategy, specs, params)
+        floor = threshold
+        # Only candidate-emitting strategies leave thresholding to the writer;
+        # the others apply it themselves (or ignore it, like mock).
+        emits_candidates = getattr(strategy, "emits_candidates", False)
+        defect_threshold = threshold if emits_candidates else None
+        if emits_candidates:
+            floor = min(app_settings.candidate_floor, threshold)
+        params["candidate_floor"] = floor
+        checkpoint = checkpoint_key(fingerprint, threshold, floor)
 
-        images = db.query(Image).filter(Image.batch_id == batch_id).all()
-        job_queue.set_total(batch_id, len(images))
-
-        total_defects = 0
-        for image in images:
-            path = storage.image_path(batch, image.filename)
-            detections = strategy.detect(path, image.width, image.height, specs, params)
-            image.defects.clear()
-            image.reviewed = False
-            for det in detections:
-                db.add(Defect(
-                    id=gen_id("d"),
-                    image_id=image.id,
-                    type=det.type,
-                    category=det.category,
-                    confidence=det.confidence,
-                    polygon=det.polygon,
-                ))
-            image.status = "defect" if detections else "clean"
-            total_defects += len(detections)
+        if (
+            emits_candidates
+            and batch.candidate_fingerprint == fingerprint
+            and batch.candidate_floor is not None
+            and threshold >= batch.candidate_floor
+            # images added since (watch mode) have no candidates yet
+            and not db.query(Image.id).filter(
+                Image.batch_id == batch_id, Image.processed_fingerprint.is_(None)
+            ).first()
+        ):
+            # Threshold-only re-run: same model and classes, so re-filter the
+            # stored candidates instead of running inference again.
+            image_count = db.query(Image).filter(Image.batch_id == batch_id).count()
+            job_queue.set_total(batch_id, image_count)
+            refilter_batch(db, batch_id, threshold, checkpoint)
+            batch = batch_counters.recount(db, batch_id)
+            batch.status = "done"
+            batch.model_info = {**(batch.model_info or {}), "last_run": "refilter"}
             db.commit()
-            job_queue.increment(batch_id)
+            job_queue.increment(batch_id, image_count)
+            if app_settings.result_jsonl:
+                # no writer streams this run, so the old threshold's lines would stay
+                storage.write_result_jsonl(db, batch)
+            if export:
+                storage.write_result_json(db, batch)
+            job_queue.finish(batch_id, "done")
+            return
 
-        batch.image_count = len(images)
-        batch.defect_count = total_defects
+        batch.candidate_fingerprint = None
+
+        decode = bool(getattr(strategy, "wants_pixels", False))
+        # Only strategies whose output depends on pixels alone may share
+        # results between files (mock keys off the filename).
+        cacheable = getattr(strategy, "cacheable", False)
+        use_cache = app_settings.result_cache_enabled and cacheable
+        # Content digests key the result cache and the SAM embedding cache;
+        # files are not hashed when neither is in use.
+        digest = use_cache or (cacheable and app_settings.embedding_cache_mb > 0)
+        image_count = db.query(func.count(Image.id)).filter(Image.batch_id == batch_id).scalar()
+        todo = db.query(Image.id, Image.filename, Image.width, Image.height).filter(
+            Image.batch_id == batch_id)
+        if resume:
+            # skip images already completed under this exact configuration
+            todo = todo.filter(or_(Image.processed_fingerprint.is_(None),
+                                   Image.processed_fingerprint != checkpoint))
+        rows = [
+            (image_id, storage.image_path(batch, filename), width, height, decode, digest)
+            for image_id, filename, width, height in todo
+        ]
+        db.commit()
+        if app_settings.result_jsonl and not resume:
+            storage.reset_result_jsonl(batch_id)
+        job_queue.set_total(batch_id, image_count, done=image_count - len(rows))
+
+        # Loader pool -> inference (this thread) -> writer thread, joined by
+        # bounded queues so only inference sits on the critical path.
+        writer = ResultWriter(
+            session_factory, batch_id, defect_threshold,
+            maxsize=app_settings.batch_write_queue,
+            flush_images=app_settings.batch_flush_images,
+            flush_ms=app_settings.batch_flush_ms,
+            checkpoint=checkpoint,
+            jsonl=app_settings.result_jsonl,
+        ).start()
+        pool = ThreadPoolExecutor(
+            max_workers=max(1, app_settings.batch_loader_workers),
+            thread_name_prefix=f"load-{batch_id}",
+        )
+        infer_seconds = 0.0
+        cache_hits = 0
+        try:
+            loaded = prefetch(pool, load_image, rows, app_settings.batch_prefetch)
+            for chunk in chunked(loaded, max(1, app_settings.inference_batch_size)):
+                if cancel_check is not None:
+                    cancel_check()
+                keys = [None] * len(chunk)
+                cached = {}
+                if use_cache:
+                    keys = [result_cache.cache_key(fingerprint, floor, im.digest)
+                            for im in chunk]
+                    cached = result_cache.lookup(db, keys)
+                    db.commit()
+                misses = [im for im, key in zip(chunk, keys) if key not in cached]
+                started = time.perf_counter()
+                fresh = iter(detect_images(strategy, misses, specs, params) if misses else [])
+                infer_seconds += time.perf_counter() - started
+                cache_hits += len(chunk) - len(misses)
+                for image, key in zip(chunk, keys):
+                    if key in cached:
+                        writer.put(image.image_id, cached[key])
+                    else:
+                        writer.put(image.image_id, next(fresh), key)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            writer.close()
+        writer.raise_error()
+
+        batch = batch_counters.recount(db, batch_id)
         batch.status = "done"
+        batch.candidate_fingerprint = fingerprint
+        batch.candidate_floor = floor
+        info = {**(batch.model_info or {}), "last_run": "full"}
+        if use_cache:
+            info["result_cache"] = {"hits": cache_hits, "misses": len(rows) - cache_hits}
+        inferred = len(rows) - cache_hits
+        if inferred:
+            info = record_latency(
+                info, run_label(strategy, params), infer_seconds * 1000 / inferred
+            )
+        batch.model_info = info
         db.commit()
-        storage.write_result_json(db, batch)
+        if export:
+            storage.write_result_json(db, batch)
+        job_queue.finish(batch_id, "done")
     except Exception as exc:  # noqa: BLE001
         db.rollback()
         failed = db.get(Batch, batch_id)
         if failed is not None:
-            failed.status = "failed"
-            failed.error = str(exc)
-            db.commit()
+            # images the writer completed before the failure are kept
+            batch_counters.recount(db, batch_id)
+            cancelled = isinstance(exc, scheduler.JobCancelled)
+            if will_retry and not cancelled:
+                failed.status = "queued"
+                failed.error = str(exc)
+                db.commit()
+            else:
+                failed.status = "cancelled" if cancelled else "failed"
+                failed.error = None if cancelled else str(exc)
+                db.commit()
+                job_queue.finish(batch_id, failed.status)
         raise
     finally:
         db.close()
+
+
+def _run_batch_job(ctx) -> None:
+    # A retry continues from the checkpoints of the failed attempt.
+    run_batch(ctx.target_id, ctx.session_factory, ctx.params.get("confidence_threshold"),
+              resume=ctx.params.get("resume", False) or ctx.attempt > 1,
+              cancel_check=ctx.check_cancelled, export=ctx.params.get("export", True),
+              will_retry=ctx.will_retry())
+
+
+def _ingest_batch_job(ctx) -> None:
+    ingest_batch(ctx.target_id, ctx.session_factory)
+
+
+def _reset_queued_batch(db, job) -> None:
+    batch = db.get(Batch, job.target_id)
+    if batch is not None and batch.status == "queued":
+        batch.status = "cancelled"
+        job_queue.finish(job.target_id, "cancelled")
+
+
+scheduler.register("batch_run", _run_batch_job, on_cancel=_reset_queued_batch)
+scheduler.register("batch_ingest", _ingest_batch_job)
@@ -0,0 +1,39 @@
+import asyncio
+import json
+
+from ..config import settings
+from . import job_queue
+
+RUNNING = "running"
+
+
+def _event(state, progress) -> str:
+    return f"event: progress\ndata: {json.dumps({'state': state, **progress})}\n\n"
+
+
+async def progress_events(key, fallback_state, max_hz=None, heartbeat_s=15.0):
+    """Server-sent events for ``job_queue`` progress under ``key``.
+
+    Reads only the in-memory progress table: updates are coalesced to at
+    most ``max_hz`` events per second, a comment line keeps idle connections
+    open, and the stream ends after the first non-running state.
+    ``fallback_state`` is reported when nothing is tracked for ``key`` (e.g.
+    a batch finished before the last restart).
+    """
+    interval = 1.0 / (max_hz or settings.progress_stream_hz)
+    sent_version = -1
+    idle = 0.0
+    while True:
+        version, state, progress = job_queue.snapshot(key)
+        state = state or fallback_state
+        if version != sent_version:
+            yield _event(state, progress)
+            sent_version = version
+            idle = 0.0
+            if state != RUNNING:
+                return
+        elif idle >= heartbeat_s:
+            yield ": keep-alive\n\n"
+            idle = 0.0
+        await asyncio.sleep(interval)
+        idle += interval
@@ -0,0 +1,53 @@
+import hashlib
+from dataclasses import asdict
+
+from sqlalchemy import delete, func, literal_column, select
+from sqlalchemy.dialects.sqlite import insert
+
+from ..config import settings
+from ..models import ResultCacheEntry
+from ..util import now_iso
+from .inference.base import Detection
+
+
+def cache_key(fingerprint: str, floor: float, digest: str) -> str:
+    # fingerprint covers strategy, model file identity and enabled classes;
+    # floor is the threshold the strategy actually ran at.
+    return hashlib.sha1(f"{fingerprint}\0{floor!r}\0{digest}".encode()).hexdigest()
+
+
+def lookup(db, keys) -> dict[str, list[Detection]]:
+    keys = list(set(keys))
+    if not keys:
+        return {}
+    rows = db.execute(
+        select(ResultCacheEntry.key, ResultCacheEntry.detections)
+        .where(ResultCacheEntry.key.in_(keys))
+    ).all()
+    return {key: [Detection(**d) for d in dets] for key, dets in rows}
+
+
+def store(db, entries) -> None:
+    rows = [
+        {"key": key, "detections": [asdict(d) for d in dets], "created_at": now_iso()}
+        for key, dets in entries
+    ]
+    if rows:
+        db.execute(insert(ResultCacheEntry).on_conflict_do_nothing(), rows)
+        prune(db, settings.result_cache_max_rows)
+
+
+# Entries are only ever inserted, never updated, so rowid order is age order.
+_ROWID = literal_column("rowid")
+
+
+def prune(db, max_rows) -> None:
+    """Drop the oldest entries beyond ``max_rows`` (no commit); two index
+    lookups, so it is cheap to run after every store."""
+    if max_rows <= 0:
+        return
+    newest = select(func.max(_ROWID)).select_from(ResultCacheEntry).scalar_subquery()
+    db.execute(
+        delete(ResultCacheEntry).where(_ROWID <= newest - max_rows),
+        execution_options={"synchronize_session": False},
+    )
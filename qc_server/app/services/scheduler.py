@@ -0,0 +1,255 @@
+import threading
+import time
+from dataclasses import dataclass, field
+
+from sqlalchemy import select, update
+
+from ..models import Job
+from ..util import gen_id, now_iso
+
+ACTIVE = ("queued", "running")
+INTERACTIVE = "interactive"  # lane for jobs a user is waiting on (video extraction)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+@dataclass
+class JobContext:
+    job_id: str
+    target_id: str
+    params: dict
+    attempt: int
+    session_factory: object
+    _cancel: threading.Event = field(default_factory=threading.Event)
+    max_attempts: int = 1
+
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def will_retry(self) -> bool:
+        """Whether a failure of this attempt is queued again rather than final."""
+        return self.attempt < self.max_attempts and not self.cancelled()
+
+    def check_cancelled(self) -> None:
+        if self._cancel.is_set():
+            raise JobCancelled("cancelled")
+
+
+_HANDLERS: dict = {}
+_ON_CANCEL: dict = {}
+_LANES: dict[str, str] = {}  # kind -> lane with reserved workers
+_CANCEL: dict[str, threading.Event] = {}
+_LOCK = threading.Lock()
+_WAKE = threading.Condition()
+
+
+class _State:
+    session_factory = None
+    workers: list[threading.Thread] = []
+    stop_event: threading.Event | None = None
+
+
+def register(kind, handler, on_cancel=None, lane=None) -> None:
+    """``handler(ctx: JobContext)`` runs one attempt of a ``kind`` job;
+    ``on_cancel(db, job)`` tidies the target when a queued job is cancelled.
+    Jobs in a ``lane`` can also run on that lane's reserved workers (see
+    ``start``), so they never wait behind the general queue."""
+    _HANDLERS[kind] = handler
+    if on_cancel is not None:
+        _ON_CANCEL[kind] = on_cancel
+    if lane is not None:
+        _LANES[kind] = lane
+
+
+def submit(db, kind, target_id, params=None, priority=0, max_attempts=1,
+           unique=False) -> Job:
+    """Queue a job. With ``unique`` an already queued ``kind`` job for the
+    same target is returned instead of adding another."""
+    if unique:
+        queued = db.scalars(
+            select(Job).where(Job.kind == kind, Job.target_id == target_id,
+                              Job.status == "queued")
+        ).first()
+        if queued is not None:
+            return queued
+    job = Job(
+        id=gen_id("job"),
+        kind=kind,
+        target_id=target_id,
+        params=params or {},
+        priority=priority,
+        status="queued",
+        attempts=0,
+        max_attempts=max(1, max_attempts),
+        enqueued_at=time.time(),
+        created_at=now_iso(),
+    )
+    db.add(job)
+    db.commit()
+    if _State.workers:
+        with _WAKE:
+            _WAKE.notify_all()  # a lane worker may not be able to take it
+    else:
+        # No worker threads (MQC_JOB_WORKERS=0): run in the caller, like the
+        # BackgroundTasks this replaced do under TestClient.
+        from ..database import SessionLocal
+
+        while run_next(_State.session_factory or SessionLocal, job.id):
+            pass
+        db.refresh(job)
+    return job
+
+
+def cancel(db, job_id) -> Job | None:
+    job = db.get(Job, job_id)
+    if job is None:
+        return None
+    if job.status == "queued":
+        job.status = "cancelled"
+        job.finished_at = now_iso()
+        if job.kind in _ON_CANCEL:
+            _ON_CANCEL[job.kind](db, job)
+    elif job.status == "running":
+        job.cancel_requested = True
+        with _LOCK:
+            event = _CANCEL.get(job_id)
+        if event is not None:
+            event.set()
+    db.commit()
+    return job
+
+
+def active_job(db, target_id) -> Job | None:
+    return db.scalars(
+        select(Job).where(Job.target_id == target_id, Job.status.in_(ACTIVE))
+        .order_by(Job.enqueued_at.desc())
+    ).first()
+
+
+def _claim(db, job_id=None, lane=None) -> Job | None:
+    with _LOCK:
+        # One job per target at a time (a batch is never run twice concurrently).
+        busy = select(Job.target_id).where(Job.status == "running")
+        stmt = select(Job.id).where(Job.status == "queued", Job.target_id.not_in(busy))
+        if job_id is not None:
+            stmt = stmt.where(Job.id == job_id)
+        if lane is not None:
+            stmt = stmt.where(Job.kind.in_([k for k, name in _LANES.items() if name == lane]))
+        candidate = db.scalars(
+            stmt.order_by(Job.priority.desc(), Job.enqueued_at).limit(1)
+        ).first()
+        if candidate is None:
+            return None
+        claimed = db.execute(
+            update(Job)
+            .where(Job.id == candidate, Job.status == "queued")
+            .values(status="running", attempts=Job.attempts + 1, started_at=now_iso())
+        ).rowcount
+        db.commit()
+        if not claimed:
+            return None
+        _CANCEL[candidate] = threading.Event()
+        return db.get(Job, candidate)
+
+
+def run_next(session_factory, job_id=None, lane=None) -> bool:
+    """Claim and run one queued job (of ``lane``'s kinds only, when given);
+    False when nothing was runnable."""
+    db = session_factory()
+    job = None
+    try:
+        job = _claim(db, job_id, lane)
+        if job is None:
+            return False
+        ctx = JobContext(job.id, job.target_id, dict(job.params or {}), job.attempts,
+                         session_factory, _CANCEL[job.id], job.max_attempts)
+        handler = _HANDLERS.get(job.kind)
+        error = None
+        try:
+            if handler is None:
+                raise ValueError(f"no handler for job kind {job.kind!r}")
+            handler(ctx)
+            status = "done"
+        except JobCancelled:
+            status = "cancelled"
+        except Exception as exc:  # noqa: BLE001
+            error = str(exc)
+            status = "queued" if job.attempts < job.max_attempts else "failed"
+        db.expire_all()
+        job = db.get(Job, ctx.job_id)
+        if job.cancel_requested and status == "queued":
+            status = "cancelled"
+            # the target was left waiting for a retry that will not come
+            if job.kind in _ON_CANCEL:
+                _ON_CANCEL[job.kind](db, job)
+        job.status = status
+        job.error = error
+        if status != "queued":
+            job.finished_at = now_iso()
+        db.commit()
+        return True
+    finally:
+        if job is not None:
+            with _LOCK:
+                _CANCEL.pop(job.id, None)
+        db.close()
+
+
+def recover(db) -> int:
+    """After a restart, re-queue jobs that were running (or fail them when out
+    of attempts). Queued jobs are simply picked up again by the workers."""
+    stuck = db.scalars(select(Job).where(Job.status == "running")).all()
+    for job in stuck:
+        if job.attempts < job.max_attempts and not job.cancel_requested:
+            job.status = "queued"
+        else:
+            job.status = "failed"
+            job.error = "interrupted by server restart"
+            job.finished_at = now_iso()
+    db.commit()
+    return len(stuck)
+
+
+def start(session_factory, workers, poll_interval=1.0, lanes=None) -> None:
+    """Start ``workers`` general workers, which run any kind, plus
+    ``lanes[name]`` workers that only run the kinds registered in that lane."""
+    _State.session_factory = session_factory
+    if workers <= 0 or _State.workers:
+        return
+    stop_event = threading.Event()
+
+    def loop(lane=None):
+        while not stop_event.is_set():
+            try:
+                ran = run_next(session_factory, lane=lane)
+            except Exception:  # noqa: BLE001
+                ran = False
+            if not ran:
+                with _WAKE:
+                    _WAKE.wait(poll_interval)
+
+    _State.stop_event = stop_event
+    _State.workers = [
+        threading.Thread(target=loop, daemon=True, name=f"job-worker-{i}")
+        for i in range(workers)
+    ] + [
+        threading.Thread(target=loop, args=(lane,), daemon=True, name=f"job-{lane}-{i}")
+        for lane, count in (lanes or {}).items()
+        for i in range(count)
+    ]
+    for thread in _State.workers:
+        thread.start()
+
+
+def stop(timeout=5.0) -> None:
+    if _State.stop_event is None:
+        return
+    _State.stop_event.set()
+    with _WAKE:
+        _WAKE.notify_all()
+    for thread in _State.workers:
+        thread.join(timeout)
+    _State.workers = []
+    _State.stop_event = None
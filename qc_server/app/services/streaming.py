@@ -20,38 +20,10 @@ def probe(source) -> bool:
         cap.release()
 
 
-def mjpeg_frames(source):
-    if not source:
-        return
-    cap = open_capture(source)
-    try:
-        if not cap.isOpened():
-            return
-        while True:
-            ok, frame = cap.read()
-            if not ok:
-                break
-            ok, buf = cv2.imencode(".jpg", frame)
-            if not ok:
-                continue
-            yield (
-                _BOUNDARY
-                + b"\r\nContent-Type: image/jpeg\r\n\r\n"
-                + buf.tobytes()
-                + b"\r\n"
-            )
-    finally:
-        cap.release()
+def mjpeg_part(jpeg: bytes) -> bytes:
+    return _BOUNDARY + b"\r\nContent-Type: image/jpeg\r\n\r\n" + jpeg + b"\r\n"
 
 
-def grab_one(source):
-    if not source:
-        return None
-    cap = open_capture(source)
-    try:
-        if not cap.isOpened():
-            return None
-        ok, frame = cap.read()
-        return frame if ok else None
-    finally:
-        cap.release()
+def encode_part(frame) -> bytes | None:
+    ok, buf = cv2.imencode(".jpg", frame)
+    return mjpeg_part(buf.tobytes()) if ok else None
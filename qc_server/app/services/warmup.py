@@ -0,0 +1,118 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+from ..config import settings
+
+_state = {"status": "idle", "models": {}, "error": None, "seconds": None}
+_lock = threading.Lock()
+
+
+def status() -> dict:
+    with _lock:
+        return {**_state, "models": dict(_state["models"])}
+
+
+def warming() -> bool:
+    with _lock:
+        return _state["status"] == "warming"
+
+
+def _set(**fields) -> None:
+    with _lock:
+        _state.update(fields)
+
+
+def configured_models(db) -> tuple[str, str]:
+    """(detection model path, QC model path) from settings; "" when unset."""
+    from ..models import Setting
+    from .object_detection import resolve_model_path
+
+    setting = db.get(Setting, 1)
+    if setting is None:
+        return "", ""
+    detection = resolve_model_path(setting) or ""
+    qc = ""
+    if setting.qc_model and setting.defect_strategy == "sam3_prompt":
+        path = os.path.join(settings.models_dir, setting.qc_model)
+        qc = path if os.path.isfile(path) else ""
+    return detection, qc
+
+
+def stream_frame_shape() -> tuple[int, int, int]:
+    width = settings.stream_max_width
+    return (width * 9 // 16, width, 3)
+
+
+def warm_local(detection_path, qc_path, infer=True) -> dict:
+    """Load (and with ``infer``, run once) the given models in this process.
+
+    Returns seconds spent per model. Also used as an inference-pool task so
+    every worker process warms its own copies.
+    """
+    from .inference.base import DefectClassSpec, LoadedImage
+    from .inference.sam3 import _strategy as sam3_strategy, get_predictor
+    from .object_detection import detect_local, get_model
+
+    timings = {}
+    frame = np.zeros(stream_frame_shape(), dtype=np.uint8)
+    if detection_path:
+        started = time.perf_counter()
+        get_model(detection_path)
+        if infer:
+            detect_local(frame, 0.5, detection_path)
+        timings["detection"] = round(time.perf_counter() - started, 3)
+    if qc_path:
+        started = time.perf_counter()
+        get_predictor(qc_path)
+        if infer:
+            sam3_strategy.detect_local(
+                [LoadedImage("warmup", "", frame.shape[1], frame.shape[0], pixels=frame)],
+                [DefectClassSpec("defect", "warmup", True)],
+                {"qc_model_path": qc_path, "candidate_floor": 1.0},
+            )
+        timings["qc"] = round(time.perf_counter() - started, 3)
+    return timings
+
+
+def _running_status(infer) -> str:
+    # Only a real warm-up keeps /health at 503; preloading the models into
+    # the worker processes without ``warmup_enabled`` does not.
+    return "warming" if infer else "preloading"
+
+
+def run(session_factory, infer=True) -> None:
+    """Background warm-up; with ``infer``, ``/health`` reports 503 until it finishes."""
+    from . import inference_pool
+
+    _set(status=_running_status(infer), error=None, models={}, seconds=None)
+    started = time.perf_counter()
+    try:
+        db = session_factory()
+        try:
+            detection, qc = configured_models(db)
+        finally:
+            db.close()
+        if inference_pool.enabled():
+            timings = inference_pool.get_pool().broadcast(
+                "app.services.warmup:warm_local", detection, qc, infer
+            )
+            models = {k: max(t[k] for t in timings) for k in timings[0]} if timings else {}
+        else:
+            models = warm_local(detection, qc, infer)
+        _set(status="ready", models=models)
+    except Exception as exc:  # noqa: BLE001
+        # Serve anyway: models will load lazily on first use.
+        _set(status="failed", error=str(exc))
+    finally:
+        _set(seconds=round(time.perf_counter() - started, 3))
+
+
+def start(session_factory, infer=True) -> threading.Thread:
+    _set(status=_running_status(infer))
+    thread = threading.Thread(target=run, args=(session_factory, infer), daemon=True,
+                              name="model-warmup")
+    thread.start()
+    return thread
@@ -11,13 +11,17 @@ IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
 def list_images(folder: str) -> list[str]:
     if not os.path.isdir(folder):
         return []
-    return sorted(
-        f for f in os.listdir(folder)
-        if f.lower().endswith(IMAGE_EXTENSIONS)
-    )
+    # scandir reuses the directory entry's type info, avoiding a stat per file
+    # on network shares.
+    with os.scandir(folder) as entries:
+        return sorted(
+            e.name for e in entries
+            if e.name.lower().endswith(IMAGE_EXTENSIONS) and e.is_file()
+        )
 
 
 def image_size(path: str) -> tuple[int, int]:
+    # PIL.Image.open only parses the header; pixel data is never decoded here.
     with PILImage.open(path) as im:
         return im.width, im.height
 
@@ -26,38 +30,108 @@ def image_path(batch, filename: str) -> str:
     return os.path.join(batch.source_path, filename)
 
 
-def write_result_json(db, batch) -> str:
-    from .models import Image
+def result_dir(batch_id: str) -> str:
+    return os.path.join(settings.data_dir, "batches", batch_id)
+
 
-    images = db.query(Image).filter(Image.batch_id == batch.id).all()
-    payload = {
-        "batch_name": batch.name,
-        "source_path": batch.source_path,
-        "images": [
+def image_record(im, defects) -> dict:
+    return {
+        "id": im.id,
+        "filename": im.filename,
+        "url": im.url,
+        "width": im.width,
+        "height": im.height,
+        "status": im.status,
+        "defects": [
             {
-                "id": im.id,
-                "filename": im.filename,
-                "url": im.url,
-                "width": im.width,
-                "height": im.height,
-                "status": im.status,
-                "defects": [
-                    {
-                        "id": d.id,
-                        "type": d.type,
-                        "category": d.category,
-                        "confidence": d.confidence,
-                        "polygon": d.polygon,
-                    }
-                    for d in im.defects
-                ],
+                "id": d.id,
+                "type": d.type,
+                "category": d.category,
+                "confidence": d.confidence,
+                "polygon": d.polygon,
             }
-            for im in images
+            for d in defects
         ],
     }
-    out_dir = os.path.join(settings.data_dir, "batches", batch.id)
+
+
+def _image_records(db, batch_id, chunk):
+    """The batch's image records, read ``chunk`` images at a time with their
+    defects eager-loaded in one extra query per chunk."""
+    from sqlalchemy import select
+    from sqlalchemy.orm import selectinload
+
+    from .models import Image
+
+    stmt = (
+        select(Image)
+        .where(Image.batch_id == batch_id)
+        .options(selectinload(Image.defects))
+        .order_by(Image.filename, Image.id)
+        .execution_options(yield_per=chunk)
+    )
+    for im in db.scalars(stmt):
+        yield image_record(im, im.defects)
+
+
+def write_result_json(db, batch, chunk: int = 500) -> str:
+    """Stream the batch result to ``result.json``.
+
+    Records are written as compact JSON as they arrive; the file is swapped
+    in atomically once complete.
+    """
+    out_dir = result_dir(batch.id)
     os.makedirs(out_dir, exist_ok=True)
     out_path = os.path.join(out_dir, "result.json")
-    with open(out_path, "w", encoding="utf-8") as fh:
-        json.dump(payload, fh, indent=2)
+    tmp_path = f"{out_path}.tmp"
+    head = json.dumps({"batch_name": batch.name, "source_path": batch.source_path},
+                      separators=(",", ":"))
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        fh.write(head[:-1] + ',"images":[')
+        first = True
+        for record in _image_records(db, batch.id, chunk):
+            if not first:
+                fh.write(",")
+            json.dump(record, fh, separators=(",", ":"))
+            first = False
+        fh.write("]}")
+    os.replace(tmp_path, out_path)
     return out_path
+
+
+def append_result_jsonl(batch_id: str, records) -> str:
+    """Append one JSON line per processed image to ``result.jsonl``.
+
+    Lines are written as images are flushed during a run; a later line for
+    the same image id supersedes earlier ones.
+    """
+    out_dir = result_dir(batch_id)
+    os.makedirs(out_dir, exist_ok=True)
+    out_path = os.path.join(out_dir, "result.jsonl")
+    with open(out_path, "a", encoding="utf-8") as fh:
+        for record in records:
+            fh.write(json.dumps(record, separators=(",", ":")))
+            fh.write("\n")
+    return out_path
+
+
+def write_result_jsonl(db, batch, chunk: int = 500) -> str:
+    """Rewrite ``result.jsonl`` with one line per image from the database,
+    for runs that change every image at once without streaming them."""
+    out_dir = result_dir(batch.id)
+    os.makedirs(out_dir, exist_ok=True)
+    out_path = os.path.join(out_dir, "result.jsonl")
+    tmp_path = f"{out_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        for record in _image_records(db, batch.id, chunk):
+            fh.write(json.dumps(record, separators=(",", ":")))
+            fh.write("\n")
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def reset_result_jsonl(batch_id: str) -> None:
+    try:
+        os.remove(os.path.join(result_dir(batch_id), "result.jsonl"))
+    except FileNotFoundError:
+        pass
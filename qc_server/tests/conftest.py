@@ -5,6 +5,7 @@ _TMP = tempfile.mkdtemp()
 os.environ.setdefault("MQC_DATABASE_URL", f"sqlite:///{_TMP}/test.db")
 os.environ.setdefault("MQC_DATA_DIR", _TMP)
 os.environ.setdefault("MQC_CAMERA_MONITOR_ENABLED", "false")
+os.environ.setdefault("MQC_JOB_WORKERS", "0")
 
 import pytest
 from fastapi.testclient import TestClient
@@ -119,3 +119,55 @@ def test_annotated_mjpeg_counter_drives_count_and_skips_crop_sink(monkeypatch):
     assert counter_calls == [1]
     assert sink_calls == []
     assert stats and stats[0] == 42
+
+
+def _square(x, size=(120, 160)):
+    frame = np.zeros((*size, 3), dtype=np.uint8)
+    frame[40:80, x:x + 40] = 255
+    frame[50:60, x + 10:x + 20] = 0  # texture for the tracker
+    return frame
+
+
+def test_box_propagator_follows_motion():
+    from app.services.box_propagation import BoxPropagator
+
+    prop = BoxPropagator()
+    prop.reset(_square(20), [Detection(20, 40, 60, 80, "x", 0.9, track_id=7)])
+    for x in (24, 28, 32):
+        (moved,) = prop.step(_square(x))
+    assert abs(moved.x1 - 32) <= 1 and abs(moved.y1 - 40) <= 1
+    assert (moved.label, moved.confidence, moved.track_id) == ("x", 0.9, 7)
+
+
+def test_stride_grows_to_hold_the_detect_budget(monkeypatch):
+    import time
+
+    calls = []
+
+    def slow_detect(frame, conf, model_path):
+        calls.append(1)
+        time.sleep(0.01)
+        return [Detection(20, 40, 60, 80, "x", 0.9)]
+
+    monkeypatch.setattr(ann, "detect", slow_detect)
+    counted = []
+    detector = ann.StreamDetector(
+        "single", 0.5, "m.pt", counter=lambda f, dets, s: counted.append(len(dets)) or 0,
+        detect_budget=0.005, max_stride=4)
+    for i in range(40):
+        _frame, detections, _count = detector.process(_square(20 + i % 8))
+        assert len(detections) == 1
+        time.sleep(0.002)
+    assert detector.stride.stride == 4
+    assert len(calls) < 20
+    # every frame is counted, detected or propagated
+    assert counted == [1] * 40
+
+
+def test_no_budget_detects_every_frame(monkeypatch):
+    calls = []
+    monkeypatch.setattr(ann, "detect", lambda frame, conf, model_path: calls.append(1) or [])
+    detector = ann.StreamDetector("single", 0.5, "m.pt")
+    for _ in range(5):
+        detector.process(_square(20))
+    assert len(calls) == 5 and detector.stride.stride == 1
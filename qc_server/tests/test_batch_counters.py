@@ -0,0 +1,122 @@
+import os
+
+from PIL import Image as PILImage
+from sqlalchemy import event
+
+from app.database import SessionLocal, engine
+from app.models import Batch, Image
+from app.services import batch_counters
+
+
+def _run_batch(client, tmp_path):
+    folder = str(tmp_path / "crops")
+    os.makedirs(folder)
+    for name in ["weld_0001.jpg", "weld_0002.jpg", "clean_0003.jpg"]:
+        PILImage.new("RGB", (64, 64)).save(os.path.join(folder, name))
+    batch_id = client.post("/api/batches", json={"batch_name": "C",
+                                                 "source_path": folder}).json()["batch_id"]
+    client.post(f"/api/batches/{batch_id}/run", json={})
+    images = client.get(f"/api/batches/{batch_id}").json()["images"]
+    return batch_id, {im["filename"]: im for im in images}
+
+
+def _summary(client, batch_id):
+    return next(b for b in client.get("/api/batches").json() if b["id"] == batch_id)
+
+
+def _expected(images):
+    statuses = [im["status"] for im in images.values()]
+    return {
+        "image_count": len(images),
+        "defect_count": sum(len(im["defects"]) for im in images.values()),
+        "reviewed_count": sum(im["reviewed"] for im in images.values()),
+        "status_counts": {s: statuses.count(s) for s in ("pending", "clean", "defect")},
+    }
+
+
+def _counters(summary):
+    return {key: summary[key] for key in
+            ("image_count", "defect_count", "reviewed_count", "status_counts")}
+
+
+def test_counters_follow_runs_and_edits(client, tmp_path):
+    batch_id, images = _run_batch(client, tmp_path)
+    assert _counters(_summary(client, batch_id)) == _expected(images)
+
+    clean = images["clean_0003.jpg"]
+    statements = []
+
+    def capture(conn, cursor, statement, *args):
+        statements.append(statement.lower())
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        created = client.post(
+            f"/api/batches/{batch_id}/images/{clean['id']}/defects",
+            json={"type": "crack", "category": "welding", "polygon": [[0, 0], [1, 0], [1, 1]]},
+        ).json()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    # O(1): no recount over the batch's defects or images
+    assert not [s for s in statements if "count(" in s]
+
+    client.patch(f"/api/batches/{batch_id}/images/{clean['id']}", json={"reviewed": True})
+    client.patch(f"/api/batches/{batch_id}/images/{clean['id']}", json={"reviewed": True})
+    after_add = {im["filename"]: im for im in client.get(f"/api/batches/{batch_id}").json()["images"]}
+    assert after_add["clean_0003.jpg"]["status"] == "defect"
+    assert _counters(_summary(client, batch_id)) == _expected(after_add)
+
+    client.delete(f"/api/batches/{batch_id}/images/{clean['id']}/defects/{created['id']}")
+    client.delete(f"/api/batches/{batch_id}/images/{images['weld_0001.jpg']['id']}")
+    remaining = {im["filename"]: im for im in client.get(f"/api/batches/{batch_id}").json()["images"]}
+    assert remaining["clean_0003.jpg"]["status"] == "clean"
+    assert _counters(_summary(client, batch_id)) == _expected(remaining)
+
+    client.post(f"/api/batches/{batch_id}/reset", json={})
+    assert _summary(client, batch_id)["status_counts"] == {"pending": 2, "clean": 0, "defect": 0}
+    assert _summary(client, batch_id)["defect_count"] == 0
+
+
+def test_recount_job_repairs_drifted_counters(client, tmp_path):
+    batch_id, images = _run_batch(client, tmp_path)
+    db = SessionLocal()
+    try:
+        batch = db.get(Batch, batch_id)
+        batch.defect_count, batch.clean_count, batch.image_count = 99, 0, 7
+        db.commit()
+    finally:
+        db.close()
+
+    job = client.post(f"/api/batches/{batch_id}/recount").json()
+    assert (job["kind"], job["status"]) == ("batch_recount", "done")
+    assert _counters(_summary(client, batch_id)) == _expected(images)
+
+    assert client.post("/api/batches/recount").json()["status"] == "done"
+    assert client.post("/api/batches/missing/recount").status_code == 404
+
+
+def test_concurrent_defect_edits_do_not_lose_updates(client, tmp_path):
+    batch_id, images = _run_batch(client, tmp_path)
+    image_id = images["clean_0003.jpg"]["id"]
+    first, second = SessionLocal(), SessionLocal()
+    try:
+        # both sessions read the image before either writes
+        stale = [db.get(Image, image_id) for db in (first, second)]
+        assert [im.defect_count for im in stale] == [0, 0]
+        for db, image in zip((first, second), stale):
+            batch_counters.defects_changed(db, image, 1)
+            db.commit()
+    finally:
+        first.close()
+        second.close()
+
+    db = SessionLocal()
+    try:
+        assert db.get(Image, image_id).defect_count == 2
+    finally:
+        db.close()
+    expected = _expected(images)
+    expected["defect_count"] += 2
+    expected["status_counts"]["clean"] -= 1
+    expected["status_counts"]["defect"] += 1
+    assert _counters(_summary(client, batch_id)) == expected
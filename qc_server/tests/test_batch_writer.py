@@ -0,0 +1,94 @@
+import time
+
+import pytest
+
+from app.database import SessionLocal
+from app.models import Batch, Defect, Image
+from app.services import batch_writer, job_queue
+from app.services.inference.base import Detection
+from app.util import now_iso
+
+_POLY = [[1, 1], [9, 1], [9, 9]]
+
+
+def _seed(n):
+    db = SessionLocal()
+    try:
+        db.add(Batch(id="bw", name="W", source_path="/x", created_at=now_iso()))
+        for i in range(n):
+            db.add(Image(id=f"img-{i}", batch_id="bw", filename=f"{i}.jpg", url="",
+                         width=10, height=10, status="pending"))
+        db.commit()
+    finally:
+        db.close()
+    job_queue.set_total("bw", n)
+
+
+def _statuses():
+    db = SessionLocal()
+    try:
+        return {i.id: i.status for i in db.query(Image).filter(Image.batch_id == "bw")}
+    finally:
+        db.close()
+
+
+def test_writer_flushes_in_chunks_and_reports_progress():
+    _seed(5)
+    writer = batch_writer.ResultWriter(SessionLocal, "bw", 0.5, flush_images=2,
+                                       flush_ms=60_000).start()
+    for i in range(5):
+        dets = [Detection("p", "welding", 0.9, _POLY), Detection("p", "welding", 0.2, _POLY)]
+        writer.put(f"img-{i}", dets if i % 2 == 0 else [])
+    writer.close()
+    writer.raise_error()
+
+    assert writer.flushes == 3
+    assert writer.defect_count == 3
+    progress = job_queue.get("bw")
+    assert (progress["done"], progress["total"]) == (5, 5)
+    assert _statuses() == {"img-0": "defect", "img-1": "clean", "img-2": "defect",
+                           "img-3": "clean", "img-4": "defect"}
+    db = SessionLocal()
+    try:
+        assert db.query(Defect).count() == 3
+    finally:
+        db.close()
+
+
+def test_writer_flushes_on_time_budget():
+    _seed(1)
+    writer = batch_writer.ResultWriter(SessionLocal, "bw", 0.5, flush_images=100,
+                                       flush_ms=10).start()
+    writer.put("img-0", [])
+    for _ in range(200):
+        if writer.flushes:
+            break
+        time.sleep(0.01)
+    assert writer.flushes == 1
+    assert _statuses() == {"img-0": "clean"}
+    writer.close()
+
+
+def test_writer_failure_keeps_flushed_chunks(monkeypatch):
+    _seed(4)
+    real_store = batch_writer.result_cache.store
+    calls = {"n": 0}
+
+    def flaky_store(db, entries):
+        calls["n"] += 1
+        if calls["n"] == 2:
+            raise RuntimeError("disk full")
+        real_store(db, entries)
+
+    monkeypatch.setattr(batch_writer.result_cache, "store", flaky_store)
+    writer = batch_writer.ResultWriter(SessionLocal, "bw", 0.5, flush_images=2,
+                                       flush_ms=60_000).start()
+    with pytest.raises(RuntimeError):
+        for i in range(4):
+            writer.put(f"img-{i}", [Detection("p", "welding", 0.9, _POLY)])
+        writer.close()
+        writer.raise_error()
+
+    assert _statuses() == {"img-0": "defect", "img-1": "defect",
+                           "img-2": "pending", "img-3": "pending"}
+    assert job_queue.get("bw")["done"] == 2
@@ -248,3 +248,90 @@ def test_delete_batch_removes_it(client, tmp_path):
 
 def test_delete_missing_batch_404(client):
     assert client.delete("/api/batches/nope").status_code == 404
+
+
+def test_run_accepts_resume_flag(client, tmp_path):
+    folder = _make_crops(str(tmp_path / "crops"))
+    batch_id = _submit_and_run(client, folder, "Resume")
+    resumed = client.post(f"/api/batches/{batch_id}/run", json={"resume": True})
+    assert resumed.status_code == 200
+    status = client.get(f"/api/batches/{batch_id}/status").json()
+    assert status["status"] == "done"
+    assert status["progress"]["done"] == status["progress"]["total"] == 3
+
+
+def test_reset_then_resume_runs_every_image_again(client, tmp_path, monkeypatch):
+    from app.services import pipeline
+
+    folder = _make_crops(str(tmp_path / "crops"))
+    batch_id = _submit(client, folder, "Reset")
+
+    def defects():
+        images = client.get(f"/api/batches/{batch_id}").json()["images"]
+        return {im["filename"]: (im["status"], len(im["defects"])) for im in images}
+
+    # every image is checkpointed, then the run fails while finishing up
+    def finish_fails(*args):
+        raise RuntimeError("database is locked")
+
+    with monkeypatch.context() as m:
+        m.setattr(pipeline.app_settings, "job_max_attempts", 1)
+        m.setattr(pipeline, "record_latency", finish_fails)
+        client.post(f"/api/batches/{batch_id}/run", json={})
+    assert client.get(f"/api/batches/{batch_id}/status").json()["status"] == "failed"
+    before = defects()
+    assert any(n for _, n in before.values())
+
+    assert client.post(f"/api/batches/{batch_id}/reset").status_code == 200
+    assert set(defects().values()) == {("pending", 0)}
+
+    client.post(f"/api/batches/{batch_id}/run", json={"resume": True})
+    assert client.get(f"/api/batches/{batch_id}/status").json()["status"] == "done"
+    assert defects() == before
+
+
+def test_background_ingest_reports_progress_then_pending(client, tmp_path):
+    folder = _make_crops(str(tmp_path / "crops"))
+    resp = client.post("/api/batches", json={"batch_name": "Async", "source_path": folder,
+                                             "background_ingest": True})
+    assert resp.status_code == 201
+    batch_id = resp.json()["batch_id"]
+
+    status = client.get(f"/api/batches/{batch_id}/status").json()
+    assert status["status"] == "pending"
+    assert (status["progress"]["done"], status["progress"]["total"]) == (3, 3)
+    assert len(client.get(f"/api/batches/{batch_id}").json()["images"]) == 3
+
+
+def test_images_endpoint_pages_filters_and_projects(client, tmp_path):
+    folder = _make_crops(str(tmp_path / "crops"))
+    batch_id = _submit_and_run(client, folder, "Paged")
+    images = {im["filename"]: im for im in client.get(f"/api/batches/{batch_id}").json()["images"]}
+    for image in images.values():
+        for d in image["defects"]:
+            client.delete(f"/api/batches/{batch_id}/images/{image['id']}/defects/{d['id']}")
+    weld = images["weld_0002.jpg"]["id"]
+    client.post(f"/api/batches/{batch_id}/images/{weld}/defects",
+                json={"type": "crack", "category": "welding", "polygon": [[0, 0], [4, 0], [4, 4]]})
+    client.patch(f"/api/batches/{batch_id}/images/{weld}", json={"reviewed": True})
+    url = f"/api/batches/{batch_id}/images"
+
+    first = client.get(url, params={"limit": 2}).json()
+    assert [im["filename"] for im in first["items"]] == ["clean_0003.jpg", "weld_0001.jpg"]
+    second = client.get(url, params={"limit": 2, "cursor": first["next_cursor"]}).json()
+    assert [im["filename"] for im in second["items"]] == ["weld_0002.jpg"]
+    assert second["next_cursor"] is None
+    assert second["items"][0]["defects"][0]["type"] == "crack"
+    assert "polygon" not in second["items"][0]["defects"][0]
+
+    full = client.get(url, params={"defect_type": "crack", "fields": "full"}).json()["items"]
+    assert [im["id"] for im in full] == [weld]
+    assert full[0]["defects"][0]["polygon"] == [[0, 0], [4, 0], [4, 4]]
+    assert [im["id"] for im in client.get(url, params={"reviewed": True}).json()["items"]] == [weld]
+    assert [im["id"] for im in client.get(url, params={"status": "defect"}).json()["items"]] == [weld]
+    assert client.get(url, params={"defect_type": "dent"}).json() == {"items": [], "next_cursor": None}
+
+    one = client.get(f"{url}/{weld}").json()
+    assert one["defects"][0]["polygon"] == [[0, 0], [4, 0], [4, 4]]
+    assert client.get(url, params={"cursor": "!!"}).status_code == 400
+    assert client.get("/api/batches/missing/images").status_code == 404
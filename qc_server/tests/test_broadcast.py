@@ -0,0 +1,146 @@
+import asyncio
+import threading
+import time
+
+import numpy as np
+
+from app.services import camera_hub
+from app.services.broadcast import Broadcaster, Mailbox, pump
+
+
+class LiveCapture:
+    def __init__(self, source):
+        pass
+
+    def isOpened(self):
+        return True
+
+    def read(self):
+        time.sleep(0.01)
+        return True, np.zeros((16, 16, 3), dtype=np.uint8)
+
+    def release(self):
+        pass
+
+
+def test_mailbox_keeps_only_the_newest_item():
+    box = Mailbox()
+    for item in (b"1", b"2", b"3"):
+        box.put(item)
+    assert box.get(0) == b"3"
+    assert box.get(0) is None
+    assert (box.delivered, box.dropped) == (1, 2)
+
+
+def test_slow_client_does_not_hold_back_the_others():
+    broadcaster = Broadcaster()
+    slow, fast = broadcaster.subscribe(), broadcaster.subscribe()
+    received = []
+
+    def read_fast():
+        while (item := fast.get(1.0)) is not None:
+            received.append(item)
+
+    reader = threading.Thread(target=read_fast)
+    reader.start()
+    for i in range(50):
+        broadcaster.publish(i)
+        time.sleep(0.001)
+    broadcaster.close()
+    reader.join(2)
+
+    assert received[-1] == 49 and len(received) > 10
+    assert slow.get(0) == 49 and slow.dropped == 49
+    assert broadcaster.subscribe().closed
+
+
+def test_viewers_share_one_encode_per_frame(monkeypatch):
+    encoded = []
+
+    def encode_part(frame):
+        part = b"--frame\r\n" + bytes([len(encoded) % 256])
+        encoded.append(part)
+        return part
+
+    monkeypatch.setattr(camera_hub, "encode_part", encode_part)
+    hub = camera_hub.CameraHub("cam-bc", "rtsp://x", grace_s=0.05, capture_factory=LiveCapture)
+    try:
+        subs = [hub.subscribe() for _ in range(4)]
+        streams = [sub.jpeg() for sub in subs]
+        parts = [next(stream) for stream in streams]
+        assert len(hub._encoders) == 1
+        assert all(part in encoded for part in parts)
+        # every viewer received an object the single encoder produced, not a copy
+        assert all(any(part is e for e in encoded) for part in parts)
+
+        time.sleep(0.2)
+        frames = hub.frames.wait(0)[0]
+        assert len(encoded) <= frames
+        for sub in subs:
+            sub.close()
+        assert hub.raw_jpeg.subscribers == 0
+    finally:
+        hub.close()
+
+
+def test_async_consumers_wait_without_threads():
+    broadcaster = Broadcaster()
+    boxes = [broadcaster.subscribe() for _ in range(50)]
+
+    async def consume(box):
+        return [part async for part in box.items(timeout=0.5)]
+
+    async def main():
+        tasks = [asyncio.create_task(consume(box)) for box in boxes]
+        await asyncio.sleep(0.05)
+        threads = threading.active_count()
+
+        def publish():
+            for i in range(5):
+                broadcaster.publish(i)
+                time.sleep(0.01)
+            broadcaster.close()
+
+        publisher = threading.Thread(target=publish)
+        publisher.start()
+        results = await asyncio.gather(*tasks)
+        publisher.join()
+        return threads, results
+
+    before = threading.active_count()
+    threads, results = asyncio.run(main())
+    # fifty open consumers, no thread per consumer
+    assert threads - before < 5
+    assert all(result and result[-1] == 4 for result in results)
+
+
+def test_aget_times_out_and_is_woken_by_close():
+    box = Mailbox()
+
+    async def main():
+        assert await box.aget(0.01) is None
+        threading.Timer(0.02, box.close).start()
+        return await box.aget(2.0)
+
+    started = time.monotonic()
+    assert asyncio.run(main()) is None
+    assert box.closed and time.monotonic() - started < 1.0
+
+
+def test_pump_stops_the_producer_when_the_consumer_leaves():
+    finished = threading.Event()
+
+    def produce():
+        try:
+            while True:
+                yield b"part"
+                time.sleep(0.005)
+        finally:
+            finished.set()
+
+    box = Mailbox()
+    thread = pump(produce(), box)
+    assert box.get(1.0) == b"part"
+    box.close()
+    thread.join(1.0)
+    assert finished.is_set()
@@ -0,0 +1,157 @@
+import threading
+import time
+
+import numpy as np
+
+from app.services import annotated_stream, camera_hub
+from app.services.object_detection import Detection
+
+
+class LiveCapture:
+    """Endless source: a new frame every few ms until released."""
+
+    opened = 0
+
+    def __init__(self, source):
+        type(self).opened += 1
+        self.released = threading.Event()
+
+    def isOpened(self):
+        return True
+
+    def read(self):
+        time.sleep(0.005)
+        return True, np.zeros((20, 20, 3), dtype=np.uint8)
+
+    def release(self):
+        self.released.set()
+
+
+def _wait(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_viewers_share_one_capture_and_one_detection_loop(monkeypatch):
+    LiveCapture.opened = 0
+    calls = []
+    monkeypatch.setattr(annotated_stream, "detect",
+                        lambda frame, conf, model_path: calls.append(1) or [])
+    hub = camera_hub.CameraHub("cam-h", "rtsp://x", grace_s=0.05, capture_factory=LiveCapture)
+    config = camera_hub.DetectConfig("single", 0.5, "m.pt", max_fps=50)
+    try:
+        subs = [hub.subscribe(config) for _ in range(3)] + [hub.subscribe()]
+        results = [next(subs[i].detections()) for i in range(3)]
+        frame = next(subs[3].frames())
+        assert LiveCapture.opened == 1
+        assert all(isinstance(r, camera_hub.DetectionFrame) for r in results)
+        assert frame.shape == (20, 20, 3)
+
+        # one loop paced at max_fps, not one per viewer
+        calls.clear()
+        time.sleep(0.3)
+        assert 0 < len(calls) <= 50 * 0.3 + 3
+    finally:
+        hub.close()
+
+
+def test_motion_threshold_change_reaches_the_running_loop(monkeypatch):
+    calls = []
+    monkeypatch.setattr(annotated_stream, "detect",
+                        lambda frame, conf, model_path: calls.append(1) or [])
+    hub = camera_hub.CameraHub("cam-gate", "rtsp://x", grace_s=0.05, capture_factory=LiveCapture)
+    monkeypatch.setitem(camera_hub._HUBS, "cam-gate", hub)
+    try:
+        sub = hub.subscribe(camera_hub.DetectConfig("single", 0.5, "m.pt", max_fps=100))
+        next(sub.detections())
+        assert camera_hub.stats("cam-gate")["motion_skip_rate"] == 0.0
+        camera_hub.set_motion_threshold("cam-gate", 0.01)
+        # the source is static, so the gate now skips the detector
+        assert _wait(lambda: camera_hub.stats("cam-gate")["motion_skip_rate"] > 0.5)
+        camera_hub.set_motion_threshold("cam-gate", 0.0)
+        assert _wait(lambda: camera_hub.stats("cam-gate")["motion_skip_rate"] == 0.0)
+        sub.close()
+    finally:
+        hub.close()
+
+
+def test_a_later_viewer_with_new_settings_rebuilds_the_detector(monkeypatch):
+    models = []
+    monkeypatch.setattr(annotated_stream, "detect",
+                        lambda frame, conf, model_path: models.append((model_path, conf)) or [])
+    hub = camera_hub.CameraHub("cam-cfg", "rtsp://x", grace_s=0.05, capture_factory=LiveCapture)
+    try:
+        first = hub.subscribe(camera_hub.DetectConfig("single", 0.5, "old.pt", max_fps=100))
+        next(first.detections())
+        # the dashboard keeps watching while the active model changes
+        second = hub.subscribe(camera_hub.DetectConfig("single", 0.3, "new.pt", max_fps=100))
+        assert _wait(lambda: models and models[-1] == ("new.pt", 0.3))
+        first.close()
+        second.close()
+    finally:
+        hub.close()
+
+
+def test_hub_closes_after_idle_grace_and_reopens_on_demand(monkeypatch):
+    LiveCapture.opened = 0
+    monkeypatch.setattr(camera_hub, "open_capture", LiveCapture)
+    monkeypatch.setattr(camera_hub.settings, "stream_idle_grace_s", 0.1)
+    try:
+        sub = camera_hub.subscribe("cam-idle", "rtsp://x")
+        hub = sub.hub
+        next(sub.frames())
+        sub.close()
+        again = camera_hub.subscribe("cam-idle", "rtsp://x")  # within grace: same hub
+        assert again.hub is hub and LiveCapture.opened == 1
+        again.close()
+
+        assert _wait(lambda: hub.closed)
+        assert camera_hub.get("cam-idle") is None
+        assert camera_hub.snapshot("cam-idle", "rtsp://x").shape == (20, 20, 3)
+        assert LiveCapture.opened == 2
+    finally:
+        camera_hub.stop_all()
+
+
+def test_source_change_replaces_the_hub(monkeypatch):
+    monkeypatch.setattr(camera_hub, "open_capture", LiveCapture)
+    try:
+        first = camera_hub.subscribe("cam-src", "rtsp://a")
+        second = camera_hub.subscribe("cam-src", "rtsp://b")
+        assert second.hub is not first.hub
+        assert first.hub.closed
+        assert first.hub.frames.closed
+    finally:
+        camera_hub.stop_all()
+
+
+def test_presence_count_is_shared_and_reported(monkeypatch, tmp_path):
+    from app.services import crop_session
+
+    monkeypatch.setattr(crop_session.settings, "data_dir", str(tmp_path))
+    monkeypatch.setattr(annotated_stream, "detect",
+                        lambda frame, conf, model_path: [Detection(0, 0, 20, 20, "o", 0.9)])
+    hub = camera_hub.CameraHub("cam-count", "rtsp://x", grace_s=0.05,
+                               capture_factory=LiveCapture)
+    try:
+        sub = hub.subscribe(camera_hub.DetectConfig("single", 0.5, "m.pt", max_fps=0))
+        counts = sub.detections()
+        assert _wait(lambda: next(counts).count == 1)
+        assert camera_hub.stats("cam-count")["count"] == 1
+    finally:
+        hub.close()
+
+
+def test_detection_failure_ends_the_streams(monkeypatch):
+    def broken(frame, conf, model_path):
+        raise RuntimeError("model missing")
+
+    monkeypatch.setattr(annotated_stream, "detect", broken)
+    hub = camera_hub.CameraHub("cam-err", "rtsp://x", grace_s=0.05, capture_factory=LiveCapture)
+    sub = hub.subscribe(camera_hub.DetectConfig("single", 0.5, "m.pt"))
+    assert list(sub.detections()) == []
+    assert hub.closed and hub.error == "model missing"
@@ -1,4 +1,24 @@
-import app.routers.cameras as cameras_router
+import time
+
+import numpy as np
+
+from app.services import camera_hub
+
+
+class FakeCapture:
+    def __init__(self, frames):
+        self._frames = list(frames)
+
+    def isOpened(self):
+        return True
+
+    def read(self):
+        if self._frames:
+            return True, self._frames.pop(0)
+        return False, None
+
+    def release(self):
+        pass
 
 
 def _make_camera(client):
@@ -12,7 +32,8 @@ def _make_camera(client):
 
 def test_stream_returns_multipart(client, monkeypatch):
     _make_camera(client)
-    monkeypatch.setattr(cameras_router, "mjpeg_frames", lambda source: iter([b"--frame\r\nX"]))
+    frame = np.zeros((8, 8, 3), dtype=np.uint8)
+    monkeypatch.setattr(camera_hub, "open_capture", lambda source: FakeCapture([frame]))
     resp = client.get("/api/cameras/cam-stream/stream")
     assert resp.status_code == 200
     assert resp.headers["content-type"].startswith("multipart/x-mixed-replace")
@@ -21,3 +42,23 @@ def test_stream_returns_multipart(client, monkeypatch):
 
 def test_stream_unknown_camera_404(client):
     assert client.get("/api/cameras/nope/stream").status_code == 404
+
+
+class ClosedCapture(FakeCapture):
+    def isOpened(self):
+        return False
+
+
+def test_capture_returns_503_when_the_camera_does_not_open(client, monkeypatch):
+    from app.routers import cameras
+
+    _make_camera(client)
+    monkeypatch.setattr(cameras, "resolve_model_path", lambda setting: "m.pt")
+    monkeypatch.setattr(camera_hub, "open_capture", lambda source: ClosedCapture([]))
+    started = time.monotonic()
+    resp = client.post("/api/cameras/cam-stream/capture")
+    assert resp.status_code == 503
+    assert resp.json()["detail"] == "camera frame unavailable"
+    # the hub's failed open ends the wait instead of running out the timeout
+    assert time.monotonic() - started < 2.0
+    camera_hub.stop_all()
@@ -24,6 +24,16 @@ def test_patch_camera(client):
     assert resp.json()["location"] == "Line A"
 
 
+def test_motion_threshold_must_be_a_fraction(client):
+    assert client.post("/api/cameras", json={**_new_camera(), "motion_threshold": 1.5}).status_code == 422
+    client.post("/api/cameras", json=_new_camera())
+    for value in (-0.1, 2, "x"):
+        resp = client.patch("/api/cameras/cam-99", json={"motion_threshold": value})
+        assert resp.status_code == 422
+    resp = client.patch("/api/cameras/cam-99", json={"motion_threshold": 0.02})
+    assert resp.json()["motion_threshold"] == 0.02
+
+
 def test_delete_camera(client):
     client.post("/api/cameras", json=_new_camera())
     assert client.delete("/api/cameras/cam-99").status_code == 200
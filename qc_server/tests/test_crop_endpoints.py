@@ -50,7 +50,8 @@ def test_capture_appends_crops(client, tmp_path, monkeypatch):
     _camera(client)
     monkeypatch.setattr(cs.settings, "data_dir", str(tmp_path))
     monkeypatch.setattr(cameras_router, "resolve_model_path", lambda setting: "m.pt")
-    monkeypatch.setattr(cameras_router, "grab_one", lambda source: np.zeros((100, 100, 3), dtype=np.uint8))
+    monkeypatch.setattr(cameras_router.camera_hub, "snapshot",
+                        lambda camera_id, source: np.zeros((100, 100, 3), dtype=np.uint8))
     monkeypatch.setattr(cameras_router, "detect",
                         lambda frame, conf, model_path: [Detection(10, 10, 40, 40, "o", 0.9)])
     client.post("/api/cameras/cam-cr/crop-session/start")
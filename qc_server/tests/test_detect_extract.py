@@ -51,3 +51,26 @@ def test_run_video_extract_counts_one_object(tmp_path, monkeypatch):
     st = dx.status("vid-1")
     assert st["status"] == "done"
     assert st["count"] == 1
+
+
+def test_run_video_extract_motion_gate_reuses_detections(tmp_path, monkeypatch):
+    import app.services.crop_session as cs
+
+    monkeypatch.setattr(cs.settings, "data_dir", str(tmp_path))
+    lit = _frame()
+    lit[10:60, 10:60] = 255
+    frames = [lit.copy() for _ in range(4)] + [_frame() for _ in range(6)]
+    calls = []
+
+    def fake_detect(frame, conf, model_path):
+        calls.append(1)
+        return [Detection(10, 10, 60, 60, "o", 0.9)] if frame.any() else []
+
+    monkeypatch.setattr(dx, "detect", fake_detect)
+    dx.start("vid-2")
+    dx.run_video_extract("vid-2", "x.mp4", 0.5, "m.pt", 960,
+                         capture_factory=lambda p: FakeCap(frames), motion_threshold=0.01)
+    st = dx.status("vid-2")
+    assert st["count"] == 1
+    assert len(calls) == 2
+    assert st["motion_skip_rate"] == 0.8
@@ -68,6 +68,36 @@ def test_video_upload_then_stream(client, monkeypatch):
     assert resp.headers["content-type"].startswith("multipart/x-mixed-replace")
 
 
+def test_video_stream_passes_the_motion_threshold(client, monkeypatch):
+    vid = client.post("/api/detect/video",
+                      files={"file": ("v.mp4", b"data", "video/mp4")}).json()["video_id"]
+    detect_router = _detect_router()
+    monkeypatch.setattr(detect_router, "resolve_model_path", lambda s: "m.pt")
+
+    class _Stub:
+        def __init__(self, source):
+            pass
+
+        def start(self):
+            return self
+
+        def stop(self):
+            pass
+
+    seen = {}
+
+    def fake_mjpeg(*args, **kwargs):
+        seen.update(kwargs)
+        return iter([b"--frame\r\nX"])
+
+    monkeypatch.setattr(detect_router, "FrameGrabber", _Stub)
+    monkeypatch.setattr(detect_router, "annotated_mjpeg", fake_mjpeg)
+    resp = client.get(f"/api/detect/video/{vid}/stream?motion_threshold=0.02")
+    assert resp.status_code == 200
+    assert seen["motion_threshold"] == 0.02
+    assert client.get(f"/api/detect/video/{vid}/stream?motion_threshold=1.5").status_code == 422
+
+
 def test_image_process_returns_crops(client, tmp_path, monkeypatch):
     import io
     import app.services.crop_session as cs
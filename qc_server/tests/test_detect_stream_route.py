@@ -1,4 +1,24 @@
+import numpy as np
+
 import app.routers.cameras as cameras_router
+from app.services import annotated_stream, camera_hub
+from app.services.object_detection import Detection
+
+
+class FakeCapture:
+    def __init__(self, frames):
+        self._frames = list(frames)
+
+    def isOpened(self):
+        return True
+
+    def read(self):
+        if self._frames:
+            return True, self._frames.pop(0)
+        return False, None
+
+    def release(self):
+        pass
 
 
 def _camera(client):
@@ -10,26 +30,12 @@ def _camera(client):
 
 def test_detect_stream_returns_multipart(client, monkeypatch):
     _camera(client)
-
-    class StubGrabber:
-        def __init__(self, source):
-            pass
-
-        def start(self):
-            return self
-
-        def stop(self):
-            pass
-
+    frame = np.zeros((20, 20, 3), dtype=np.uint8)
     monkeypatch.setattr(cameras_router, "resolve_model_path", lambda setting: "m.pt")
-    monkeypatch.setattr(cameras_router, "FrameGrabber", StubGrabber)
-    monkeypatch.setattr(
-        cameras_router,
-        "annotated_mjpeg",
-        lambda grabber, count_mode, conf, model_path, on_stats, max_width, max_fps, crop_sink=None, counter=None: iter(
-            [b"--frame\r\nX"]
-        ),
-    )
+    monkeypatch.setattr(camera_hub, "open_capture", lambda source: FakeCapture([frame]))
+    monkeypatch.setattr(annotated_stream, "detect",
+                        lambda frame, conf, model_path: [Detection(0, 0, 5, 5, "x", 0.9)])
+    monkeypatch.setattr(camera_hub.settings, "stream_max_fps", 0)
     resp = client.get("/api/cameras/cam-ds/detect-stream")
     assert resp.status_code == 200
     assert resp.headers["content-type"].startswith("multipart/x-mixed-replace")
@@ -43,4 +49,5 @@ def test_detect_stream_no_model_409(client, monkeypatch):
 
 def test_count_defaults_zero(client):
     _camera(client)
-    assert client.get("/api/cameras/cam-ds/count").json() == {"count": 0, "fps": 0}
+    assert client.get("/api/cameras/cam-ds/count").json() == {
+        "count": 0, "fps": 0, "detect_stride": 1, "motion_skip_rate": 0.0}
@@ -0,0 +1,128 @@
+import numpy as np
+
+from app.services.inference import embedding_cache as ec
+
+
+class _FakePredictor:
+    def __init__(self):
+        self.model = object()
+        self.features = None
+        self.encoded = []
+        self.sources = []
+
+    def set_image(self, source):
+        self.encoded.append(source)
+        self.sources.append(source)
+        self.features = np.full(4, len(self.encoded), dtype=np.float32)
+
+    def setup_source(self, source):
+        self.sources.append(source)
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = ec.EmbeddingCache(memory_bytes=32)
+    a, b, c = (np.zeros(2, dtype=np.float64) for _ in range(3))  # 16 bytes each
+    cache.put("a", a)
+    cache.put("b", b)
+    assert cache.get("a") is a  # touch a so b becomes LRU
+    cache.put("c", c)
+    assert cache.get("b") is None
+    assert cache.get("a") is a and cache.get("c") is c
+    assert cache.stats()["memory_bytes"] == 32
+
+
+def test_disk_tier_survives_new_instance_and_evicts_by_size(tmp_path):
+    first = ec.EmbeddingCache(memory_bytes=1024, disk_dir=str(tmp_path), disk_bytes=10_000)
+    first.put("k1", np.arange(4))
+    second = ec.EmbeddingCache(memory_bytes=1024, disk_dir=str(tmp_path), disk_bytes=10_000)
+    assert np.array_equal(second.get("k1"), np.arange(4))
+
+    tiny = ec.EmbeddingCache(memory_bytes=0, disk_dir=str(tmp_path), disk_bytes=1)
+    tiny.put("k2", np.arange(4))
+    assert tiny.stats()["disk_entries"] == 0
+    assert list(tmp_path.rglob("*.pkl")) == []
+
+
+def test_set_image_reuses_features_for_same_content(tmp_path, monkeypatch):
+    monkeypatch.setattr(ec, "_cache", ec.EmbeddingCache(memory_bytes=1 << 20))
+    one = tmp_path / "one.jpg"
+    copy = tmp_path / "copy.jpg"
+    one.write_bytes(b"same-bytes")
+    copy.write_bytes(b"same-bytes")
+    predictor = _FakePredictor()
+
+    ec.set_image(predictor, str(one), "m.pt", "sam3_semantic")
+    first = predictor.features
+    predictor.features = None
+    ec.set_image(predictor, str(copy), "m.pt", "sam3_semantic")
+
+    assert predictor.encoded == [str(one)]
+    assert predictor.sources == [str(one), str(copy)]
+    assert predictor.features is first
+
+    ec.set_image(predictor, str(copy), "other.pt", "sam3_semantic")
+    ec.set_image(predictor, str(copy), "m.pt", "sam_interactive")
+    assert len(predictor.encoded) == 3
+
+
+def test_set_image_uncached_for_unreadable_source(monkeypatch):
+    monkeypatch.setattr(ec, "_cache", ec.EmbeddingCache(memory_bytes=1 << 20))
+    predictor = _FakePredictor()
+    ec.set_image(predictor, "missing.jpg", "m.pt", "sam3_semantic")
+    ec.set_image(predictor, "missing.jpg", "m.pt", "sam3_semantic")
+    assert predictor.encoded == ["missing.jpg", "missing.jpg"]
+
+
+class _FakeTensor:
+    """Stands in for a torch tensor on ``device``."""
+
+    def __init__(self, values, device="cuda:0"):
+        self.values = np.asarray(values, dtype=np.float32)
+        self.device = device
+
+    def detach(self):
+        return self
+
+    def cpu(self):
+        return self.to("cpu")
+
+    def to(self, device):
+        return _FakeTensor(self.values, device)
+
+    def element_size(self):
+        return self.values.itemsize
+
+    def nelement(self):
+        return self.values.size
+
+
+def test_features_are_cached_on_the_cpu_and_sized_from_their_tensors(monkeypatch):
+    cache = ec.EmbeddingCache(memory_bytes=1 << 20)
+    monkeypatch.setattr(ec, "_cache", cache)
+
+    class _GpuPredictor(_FakePredictor):
+        device = "cuda:0"
+
+        def set_image(self, source):
+            super().set_image(source)
+            self.features = {"image_embed": _FakeTensor(np.zeros(64)),
+                             "high_res": [_FakeTensor(np.zeros(16)), None]}
+
+    predictor = _GpuPredictor()
+    ec.set_image(predictor, "x", "m.pt", "sam3_semantic", digest="d1")
+    cached = cache.get(ec.cache_key("d1", "m.pt", "sam3_semantic"))
+    assert cached["image_embed"].device == "cpu"
+    assert cached["high_res"][0].device == "cpu"
+    assert cache.stats()["memory_bytes"] == 64 * 4 + 16 * 4 + ec.nbytes(None)
+
+    predictor.features = None
+    ec.set_image(predictor, "x", "m.pt", "sam3_semantic", digest="d1")
+    assert len(predictor.encoded) == 1
+    assert predictor.features["image_embed"].device == "cuda:0"
+
+
+def test_unmeasurable_features_are_not_cached():
+    cache = ec.EmbeddingCache(memory_bytes=1 << 20)
+    cache.put("k", {"opaque": object()})
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,197 @@
+import os
+import time
+
+import pytest
+from PIL import Image as PILImage
+
+from app.database import SessionLocal
+from app.models import Batch, DefectClass, Image, Job, Setting
+from app.services import folder_watch, pipeline
+from app.services.folder_watch import FolderIndex, watch_once
+from app.util import now_iso
+
+
+def _save(folder, name):
+    PILImage.new("RGB", (320, 240), (40, 40, 40)).save(os.path.join(folder, name))
+
+
+def test_index_reports_files_once_they_are_stable(tmp_path):
+    folder = str(tmp_path)
+    _save(folder, "weld_0001.jpg")
+    (tmp_path / "notes.txt").write_text("x")
+    index = FolderIndex(folder)
+
+    assert index.scan() == []  # first sighting: may still be copying
+    assert index.scan() == ["weld_0001.jpg"]
+    assert index.scan() == ["weld_0001.jpg"]  # until the caller has committed it
+    index.mark_known(["weld_0001.jpg"])
+    assert index.scan() == []
+
+    with open(os.path.join(folder, "weld_0002.jpg"), "wb") as fh:
+        fh.write(b"partial")
+    assert index.scan() == []
+    _save(folder, "weld_0002.jpg")  # grew while being written
+    assert index.scan() == []
+    assert index.scan() == ["weld_0002.jpg"]
+
+
+def _age_folder(folder, seconds=100):
+    old = time.time() - seconds
+    os.utime(folder, (old, old))
+    return old
+
+
+def test_index_relists_a_folder_whose_mtime_did_not_move(tmp_path):
+    folder = str(tmp_path)
+    _save(folder, "a.jpg")
+    old = _age_folder(folder)
+    index = FolderIndex(folder, relist_every=4)
+    index.scan()
+    assert index.scan() == ["a.jpg"]
+    index.mark_known(["a.jpg"])
+
+    # a coarse-timestamp share: b.jpg lands without moving the folder's mtime
+    _save(folder, "b.jpg")
+    os.utime(folder, (old, old))
+    found = [index.scan() for _ in range(4)]
+    assert ["b.jpg"] in found
+
+
+def test_index_keeps_listing_while_the_folder_mtime_is_recent(tmp_path, monkeypatch):
+    folder = str(tmp_path)
+    index = FolderIndex(folder, relist_every=1000)
+    index.scan()
+    mtime = os.stat(folder).st_mtime_ns
+    _save(folder, "b.jpg")
+    os.utime(folder, ns=(mtime, mtime))  # same tick as the last listing
+    assert index.scan() == []
+    assert index.scan() == ["b.jpg"]
+
+    _age_folder(folder)
+    index.scan()  # lists once more, then relies on the mtime again
+    listed = []
+    real_scandir = os.scandir
+    monkeypatch.setattr(folder_watch.os, "scandir",
+                        lambda path: listed.append(path) or real_scandir(path))
+    index.scan()
+    assert listed == []
+
+
+def test_index_skips_known_files(tmp_path):
+    folder = str(tmp_path)
+    _save(folder, "weld_0001.jpg")
+    index = FolderIndex(folder, known=["weld_0001.jpg"])
+    index.scan()
+    assert index.scan() == []
+
+
+def test_watch_once_ingests_and_segments_new_files(tmp_path):
+    folder = str(tmp_path / "line")
+    os.makedirs(folder)
+    _save(folder, "clean_0001.jpg")
+    db = SessionLocal()
+    try:
+        db.add(Setting(id=1, defect_strategy="mock"))
+        db.add(DefectClass(id="dc-1", name="porosity", category="welding"))
+        db.add(Batch(id="batch-watch", name="Line", source_path=folder,
+                     created_at=now_iso(), status="processing"))
+        db.commit()
+        pipeline.prepare_images(db, db.get(Batch, "batch-watch"))
+    finally:
+        db.close()
+    pipeline.run_batch("batch-watch", SessionLocal)
+
+    index = FolderIndex(folder, known=["clean_0001.jpg"])
+    _save(folder, "weld_0002.jpg")
+    assert watch_once(SessionLocal, "batch-watch", index) == 0
+    assert watch_once(SessionLocal, "batch-watch", index) == 1
+
+    db = SessionLocal()
+    try:
+        batch = db.get(Batch, "batch-watch")
+        assert batch.status == "done"
+        assert batch.image_count == 2
+        statuses = {i.filename: i.status for i in db.query(Image).filter(Image.batch_id == "batch-watch")}
+        assert statuses["clean_0001.jpg"] == "clean"
+        assert statuses["weld_0002.jpg"] != "pending"
+        # the run went through the scheduler like POST /run
+        job = db.query(Job).filter(Job.target_id == "batch-watch").one()
+        assert (job.kind, job.status, job.params) == (
+            "batch_run", "done", {"resume": True, "export": False})
+    finally:
+        db.close()
+
+
+def test_watch_once_skips_an_unreadable_file_and_ingests_the_rest(tmp_path, caplog):
+    folder = str(tmp_path / "line")
+    os.makedirs(folder)
+    db = SessionLocal()
+    try:
+        db.add(Setting(id=1, defect_strategy="mock"))
+        db.add(Batch(id="batch-bad", name="Line", source_path=folder,
+                     created_at=now_iso(), status="done"))
+        db.commit()
+    finally:
+        db.close()
+
+    index = FolderIndex(folder)
+    _save(folder, "weld_0001.jpg")
+    with open(os.path.join(folder, "broken.jpg"), "wb") as fh:
+        fh.write(b"not an image")
+    assert watch_once(SessionLocal, "batch-bad", index) == 0
+    assert watch_once(SessionLocal, "batch-bad", index) == 1
+    assert "broken.jpg" in caplog.text
+
+    _save(folder, "weld_0002.jpg")
+    index.scan()
+    assert watch_once(SessionLocal, "batch-bad", index) == 1
+    db = SessionLocal()
+    try:
+        names = {i.filename for i in db.query(Image).filter(Image.batch_id == "batch-bad")}
+        assert names == {"weld_0001.jpg", "weld_0002.jpg"}
+    finally:
+        db.close()
+
+
+def test_failed_ingest_is_retried_on_the_next_tick(tmp_path, monkeypatch):
+    folder = str(tmp_path / "line")
+    os.makedirs(folder)
+    db = SessionLocal()
+    try:
+        db.add(Setting(id=1, defect_strategy="mock"))
+        db.add(Batch(id="batch-retry", name="Line", source_path=folder,
+                     created_at=now_iso(), status="done"))
+        db.commit()
+    finally:
+        db.close()
+    index = FolderIndex(folder)
+    _save(folder, "weld_0001.jpg")
+    index.scan()
+
+    def fail(db, batch_id):
+        raise RuntimeError("database is locked")
+
+    with monkeypatch.context() as m:
+        m.setattr(folder_watch.batch_counters, "recount", fail)
+        with pytest.raises(RuntimeError):
+            watch_once(SessionLocal, "batch-retry", index)
+    assert watch_once(SessionLocal, "batch-retry", index) == 1
+
+
+def test_watch_endpoints_start_report_and_stop(client, tmp_path):
+    folder = str(tmp_path / "line")
+    os.makedirs(folder)
+    _save(folder, "clean_0001.jpg")
+    batch_id = client.post("/api/batches", json={"batch_name": "Line",
+                                                 "source_path": folder}).json()["batch_id"]
+    try:
+        started = client.post(f"/api/batches/{batch_id}/watch", json={"interval": 60})
+        assert started.status_code == 200
+        assert started.json()["watching"] is True
+        assert client.get(f"/api/batches/{batch_id}/watch").json()["interval"] == 60
+    finally:
+        stopped = client.delete(f"/api/batches/{batch_id}/watch")
+    assert stopped.status_code == 200
+    assert stopped.json()["watching"] is False
+    assert folder_watch.get(batch_id) is None
+    assert client.delete(f"/api/batches/{batch_id}/watch").status_code == 404
@@ -0,0 +1,48 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.services import inference_pool, object_detection
+from app.services.inference_pool import InferencePool
+
+
+@pytest.fixture(scope="module")
+def pool():
+    p = InferencePool(2)
+    yield p
+    p.close()
+
+
+def test_frames_cross_shared_memory_to_worker_processes(pool):
+    frame = np.arange(480 * 640 * 3, dtype=np.uint8).reshape(480, 640, 3)
+    assert pool.call("numpy:sum", frame) == int(frame.sum())
+    shape = pool.call("numpy:shape", frame[:, ::2])  # non-contiguous views are copied in
+    assert tuple(shape) == (480, 320, 3)
+
+
+def test_workers_are_separate_processes(pool):
+    pids = pool.broadcast("os:getpid")
+    assert len(set(pids)) == 2
+    assert os.getpid() not in pids
+
+
+def test_worker_errors_propagate_to_the_caller(pool):
+    with pytest.raises(ValueError):
+        pool.call("numpy:reshape", np.zeros(6), (4, 4))
+    assert pool.call("numpy:sum", np.ones(3)) == 3.0
+
+
+def test_detect_routes_through_pool_when_enabled(monkeypatch):
+    calls = []
+
+    class _FakePool:
+        def call(self, task, frame, *args):
+            calls.append((task, frame.shape, args))
+            return ["det"]
+
+    monkeypatch.setattr(inference_pool.settings, "inference_processes", 2)
+    monkeypatch.setattr(inference_pool, "get_pool", lambda: _FakePool())
+    out = object_detection.detect(np.zeros((4, 4, 3), np.uint8), 0.5, "m.pt")
+    assert out == ["det"]
+    assert calls == [("app.services.object_detection:detect_local", (4, 4, 3), (0.5, "m.pt"))]
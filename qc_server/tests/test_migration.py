@@ -1,6 +1,7 @@
 from sqlalchemy import create_engine, inspect, text
 
-from app.database import ensure_active_model_column
+from app import migrations
+from app.database import Base, apply_sqlite_profile, ensure_active_model_column
 
 
 def test_ensure_active_model_column_adds_then_idempotent(tmp_path):
@@ -13,3 +14,101 @@ def test_ensure_active_model_column_adds_then_idempotent(tmp_path):
     assert "active_model" in cols
 
     ensure_active_model_column(eng)
+
+
+def test_performance_profile_sets_pragmas_on_every_connection(tmp_path):
+    eng = create_engine(f"sqlite:///{tmp_path}/p.db")
+    apply_sqlite_profile(eng, "performance")
+    with eng.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+
+    plain = create_engine(f"sqlite:///{tmp_path}/d.db")
+    apply_sqlite_profile(plain, "default")
+    with plain.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "delete"
+
+
+def _old_database(tmp_path):
+    # A database created before versioning: no jobs table, no later columns.
+    eng = create_engine(f"sqlite:///{tmp_path}/old.db")
+    with eng.begin() as conn:
+        conn.execute(text("CREATE TABLE settings (id INTEGER PRIMARY KEY, "
+                          "confidence_threshold FLOAT)"))
+        conn.execute(text("INSERT INTO settings (id, confidence_threshold) VALUES (1, 0.7)"))
+        conn.execute(text("CREATE TABLE images (id VARCHAR PRIMARY KEY, batch_id VARCHAR, "
+                          "filename VARCHAR, reviewed BOOLEAN)"))
+    return eng
+
+
+def test_migrate_upgrades_an_unversioned_database_once(tmp_path):
+    eng = _old_database(tmp_path)
+
+    assert migrations.migrate(eng) == [v for v, _, _ in migrations.MIGRATIONS]
+    assert migrations.current_version(eng) == migrations.latest_version()
+    insp = inspect(eng)
+    assert "jobs" in insp.get_table_names()
+    assert {"active_model", "qc_model"} <= {c["name"] for c in insp.get_columns("settings")}
+    assert "motion_threshold" in {c["name"] for c in insp.get_columns("cameras")}
+    assert {i["name"] for i in insp.get_indexes("images")} == {
+        "ix_images_batch_filename", "ix_images_batch_reviewed",
+    }
+    # an upgraded database ends up with every index a new one is created with
+    for table in Base.metadata.sorted_tables:
+        assert {i.name for i in table.indexes} <= {
+            i["name"] for i in insp.get_indexes(table.name)
+        }, table.name
+    with eng.connect() as conn:
+        assert conn.execute(text("SELECT confidence_threshold FROM settings")).scalar() == 0.7
+
+    assert migrations.migrate(eng) == []
+
+
+def test_migrate_stamps_a_new_database_without_running_migrations(tmp_path, monkeypatch):
+    eng = create_engine(f"sqlite:///{tmp_path}/new.db")
+    ran = []
+    monkeypatch.setattr(migrations, "MIGRATIONS", [
+        *migrations.MIGRATIONS, (99, "probe", ran.append),
+    ])
+
+    assert migrations.migrate(eng) == []
+    assert ran == []
+    assert migrations.current_version(eng) == 99
+    assert "ix_jobs_status_priority" in {i["name"] for i in inspect(eng).get_indexes("jobs")}
+
+
+def test_migrate_applies_only_newer_migrations(tmp_path, monkeypatch):
+    eng = create_engine(f"sqlite:///{tmp_path}/cur.db")
+    migrations.migrate(eng)
+    ran = []
+    monkeypatch.setattr(migrations, "MIGRATIONS", [
+        *migrations.MIGRATIONS, (99, "probe", ran.append),
+    ])
+
+    assert migrations.migrate(eng) == [99]
+    assert ran == [eng]
+    assert migrations.migrate(eng) == []
+
+
+def test_batch_counter_migration_backfills_with_plain_sql(tmp_path):
+    eng = create_engine(f"sqlite:///{tmp_path}/counters.db")
+    with eng.begin() as conn:
+        conn.execute(text("CREATE TABLE batches (id VARCHAR PRIMARY KEY, name VARCHAR, "
+                          "created_at VARCHAR, image_count INTEGER, defect_count INTEGER)"))
+        conn.execute(text("CREATE TABLE images (id VARCHAR PRIMARY KEY, batch_id VARCHAR, "
+                          "filename VARCHAR, status VARCHAR, reviewed BOOLEAN)"))
+        conn.execute(text("CREATE TABLE defects (id VARCHAR PRIMARY KEY, image_id VARCHAR)"))
+        conn.execute(text("INSERT INTO batches VALUES ('b1', 'b', '', 0, 0)"))
+        conn.execute(text("INSERT INTO images VALUES ('i1', 'b1', 'a.jpg', 'defect', 1), "
+                          "('i2', 'b1', 'b.jpg', 'clean', 0), ('i3', 'b1', 'c.jpg', 'pending', 0)"))
+        conn.execute(text("INSERT INTO defects VALUES ('d1', 'i1'), ('d2', 'i1')"))
+
+    migrations.migrate(eng)
+
+    with eng.connect() as conn:
+        row = conn.execute(text(
+            "SELECT image_count, defect_count, reviewed_count, pending_count, clean_count, "
+            "defect_image_count FROM batches")).one()
+        assert tuple(row) == (3, 2, 1, 1, 1, 1)
+        assert conn.execute(text("SELECT defect_count FROM images WHERE id = 'i1'")).scalar() == 2
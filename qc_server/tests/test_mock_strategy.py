@@ -29,3 +29,14 @@ def test_mock_defect_shape_within_bounds():
 
 def test_unknown_strategy_falls_back_to_mock():
     assert get_strategy("does-not-exist").name == "mock"
+
+
+def test_mock_detect_many_matches_per_image_detect():
+    from app.services.inference.base import LoadedImage, detect_images
+
+    s = get_strategy("mock")
+    images = [LoadedImage(f"img-{i}", f"/x/weld_000{i}.jpg", 1280, 960) for i in range(4)]
+    batched = detect_images(s, images, SPECS, {})
+    single = [s.detect(im.path, 1280, 960, SPECS, {}) for im in images]
+    assert [[d.__dict__ for d in dets] for dets in batched] == \
+        [[d.__dict__ for d in dets] for dets in single]
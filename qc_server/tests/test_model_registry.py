@@ -0,0 +1,105 @@
+from app.services import model_registry
+from app.services.model_registry import ModelRegistry
+
+
+class _Tensor:
+    def __init__(self, n):
+        self.n = n
+
+    def element_size(self):
+        return 1
+
+    def nelement(self):
+        return self.n
+
+
+class _Module:
+    def __init__(self, n):
+        self._params = [_Tensor(n)]
+
+    def parameters(self):
+        return iter(self._params)
+
+    def buffers(self):
+        return iter([])
+
+
+class _Wrapper:
+    """Ultralytics-style: the torch module lives at ``.model``."""
+
+    def __init__(self, n):
+        self.model = _Module(n)
+
+
+def _loader(loads):
+    def load(path):
+        loads.append(path)
+        return _Wrapper(int(path.rsplit("-", 1)[1].split(".")[0]))
+    return load
+
+
+def test_models_stay_resident_until_budget_then_lru_evicts():
+    loads = []
+    reg = ModelRegistry(budget_bytes=250)
+    load = _loader(loads)
+    a = reg.get("yolo", "/m/a-100.pt", load)
+    reg.get("sam3_semantic", "/m/b-100.pt", load)
+    assert reg.get("yolo", "/m/a-100.pt", load) is a  # hit, and now most recent
+    reg.get("yolo", "/m/c-100.pt", load)  # over budget: b is least recent
+
+    stats = reg.stats()
+    assert [m["name"] for m in stats["models"]] == ["c-100.pt", "a-100.pt"]
+    assert stats["used_bytes"] == 200
+    assert stats["evictions"] == 1
+    assert loads == ["/m/a-100.pt", "/m/b-100.pt", "/m/c-100.pt"]
+    assert all(m["size_bytes"] == 100 and m["load_seconds"] >= 0 for m in stats["models"])
+
+
+def test_same_path_different_kind_is_a_different_model():
+    loads = []
+    reg = ModelRegistry(budget_bytes=10_000)
+    reg.get("sam3_semantic", "/m/sam-1.pt", _loader(loads))
+    reg.get("sam_interactive", "/m/sam-1.pt", _loader(loads))
+    assert len(loads) == 2
+
+
+def test_pinned_models_survive_eviction_until_unpinned(monkeypatch):
+    loads = []
+    monkeypatch.setitem(model_registry._LOADERS, "fake", _loader(loads))
+    reg = ModelRegistry(budget_bytes=150)
+    reg.pin("fake", "/m/a-100.pt")
+    reg.get("fake", "/m/b-100.pt")
+    reg.get("fake", "/m/c-100.pt")
+    names = [m["name"] for m in reg.stats()["models"]]
+    assert "a-100.pt" in names
+    assert reg.stats()["models"][-1]["pinned"] is True
+
+    assert reg.unpin("fake", "/m/a-100.pt") is True
+    assert [m["name"] for m in reg.stats()["models"]] == ["c-100.pt"]
+    assert reg.unpin("fake", "/m/missing-1.pt") is False
+
+
+def test_resident_endpoints_pin_report_and_evict(client, tmp_path, monkeypatch):
+    import app.routers.models as models_router
+
+    loads = []
+    (tmp_path / "weld-64.pt").write_bytes(b"x" * 64)
+    monkeypatch.setattr(models_router.app_settings, "models_dir", str(tmp_path))
+    monkeypatch.setitem(model_registry._LOADERS, "yolo", _loader(loads))
+    monkeypatch.setattr(model_registry, "_registry", ModelRegistry(10_000))
+
+    pinned = client.post("/api/models/resident/pin", json={"kind": "yolo", "name": "weld-64.pt"})
+    assert pinned.status_code == 200
+    [entry] = pinned.json()["models"]
+    assert (entry["kind"], entry["name"], entry["pinned"], entry["size_bytes"]) == (
+        "yolo", "weld-64.pt", True, 64)
+    assert "sam3_semantic" in pinned.json()["kinds"]
+
+    assert client.post("/api/models/resident/pin",
+                       json={"kind": "nope", "name": "weld-64.pt"}).status_code == 400
+    assert client.post("/api/models/resident/pin",
+                       json={"kind": "yolo", "name": "missing.pt"}).status_code == 404
+    evicted = client.post("/api/models/resident/evict", json={"kind": "yolo", "name": "weld-64.pt"})
+    assert evicted.json()["models"] == []
+    assert client.post("/api/models/resident/unpin",
+                       json={"kind": "yolo", "name": "weld-64.pt"}).status_code == 404
@@ -0,0 +1,66 @@
+import numpy as np
+
+import app.services.annotated_stream as ann
+from app.services.motion_gate import MotionGate
+from app.services.object_detection import Detection
+from app.services.presence_counter import PresenceCounter
+
+
+def _frame(x=None):
+    frame = np.zeros((120, 160, 3), dtype=np.uint8)
+    if x is not None:
+        frame[30:90, x:x + 60] = 255
+    return frame
+
+
+def test_gate_skips_static_frames_and_passes_motion():
+    gate = MotionGate(0.01)
+    assert gate.moving(_frame(10))
+    assert not gate.moving(_frame(10))
+    assert not gate.moving(_frame(10))
+    assert gate.moving(_frame(40))
+    assert gate.skip_rate == 0.5
+
+
+def test_gate_lets_a_frame_through_after_max_skip():
+    gate = MotionGate(0.01, max_skip=2)
+    results = [gate.moving(_frame()) for _ in range(7)]
+    assert results == [True, False, False, True, False, False, True]
+
+
+def test_slow_drift_accumulates_against_the_last_detected_frame():
+    gate = MotionGate(0.05)
+    assert gate.moving(_frame(10))
+    # each step changes too little on its own, the sum does not
+    assert [gate.moving(_frame(10 + step)) for step in range(1, 9)] == [False] * 7 + [True]
+
+
+class FakeSession:
+    def __init__(self):
+        self.captured = []
+
+    def add_captured(self, frame, detections, scale):
+        self.captured.append(detections)
+
+
+def test_skipped_frames_keep_presence_counting(monkeypatch):
+    calls = []
+
+    def fake_detect(frame, conf, model_path):
+        calls.append(1)
+        return [Detection(10, 30, 70, 90, "o", 0.9)] if frame.any() else []
+
+    monkeypatch.setattr(ann, "detect", fake_detect)
+    frames = [_frame(10)] * 4 + [_frame()] * 6 + [_frame(60)] * 4
+    counts = {}
+    for threshold in (0.0, 0.01):
+        counter = PresenceCounter(FakeSession())
+        detector = ann.StreamDetector(
+            "single", 0.5, "m.pt", counter=counter.update, motion_threshold=threshold)
+        calls.clear()
+        for frame in frames:
+            detector.process(frame)
+        counts[threshold] = (counter._count, len(calls))
+    assert counts[0.0] == (2, 14)
+    # same count with three detector passes instead of fourteen
+    assert counts[0.01] == (2, 3)
@@ -1,6 +1,8 @@
+import json
 import os
 
 from PIL import Image as PILImage
+from sqlalchemy import select
 
 from app.database import SessionLocal
 from app.models import Batch, DefectClass, Image, Setting
@@ -64,3 +66,508 @@ def test_run_batch_writes_result_json(tmp_path):
     from app.config import settings
     result_path = os.path.join(settings.data_dir, "batches", "batch-2", "result.json")
     assert os.path.exists(result_path)
+
+
+def _seed_batch(folder, batch_id, strategy="mock"):
+    db = SessionLocal()
+    try:
+        db.add(Setting(id=1, defect_strategy=strategy))
+        db.add(DefectClass(id="dc-1", name="porosity", category="welding"))
+        db.add(Batch(id=batch_id, name="Staged", source_path=folder,
+                     created_at=now_iso(), status="processing"))
+        db.commit()
+        pipeline.prepare_images(db, db.get(Batch, batch_id))
+    finally:
+        db.close()
+
+
+def test_run_batch_decodes_ahead_for_pixel_strategies(tmp_path):
+    import threading
+
+    from app.services.inference.base import register
+
+    folder = str(tmp_path / "crops3")
+    _make_images(folder)
+    seen = []
+
+    class _PixelStrategy:
+        name = "pixels"
+        wants_pixels = True
+
+        def detect(self, image, width, height, defect_classes, params):
+            seen.append((image.shape, threading.current_thread().name))
+            return []
+
+    register(_PixelStrategy())
+    _seed_batch(folder, "batch-3", strategy="pixels")
+
+    pipeline.run_batch("batch-3", SessionLocal)
+
+    assert [shape for shape, _ in seen] == [(960, 1280, 3)] * 3
+    assert all(name == threading.current_thread().name for _, name in seen)
+    db = SessionLocal()
+    try:
+        assert db.get(Batch, "batch-3").status == "done"
+        statuses = {i.status for i in db.query(Image).filter(Image.batch_id == "batch-3")}
+        assert statuses == {"clean"}
+    finally:
+        db.close()
+
+
+def test_run_batch_failure_keeps_written_images(tmp_path, monkeypatch):
+    import pytest
+
+    from app.config import settings
+    from app.services.inference.base import register
+
+    monkeypatch.setattr(settings, "inference_batch_size", 1)
+    folder = str(tmp_path / "crops4")
+    _make_images(folder)
+
+    class _FailOnLast:
+        name = "fail-on-last"
+
+        def detect(self, image_path, width, height, defect_classes, params):
+            if os.path.basename(image_path) == "weld_0002.jpg":
+                raise RuntimeError("boom")
+            return []
+
+    register(_FailOnLast())
+    _seed_batch(folder, "batch-4", strategy="fail-on-last")
+
+    with pytest.raises(RuntimeError):
+        pipeline.run_batch("batch-4", SessionLocal)
+
+    db = SessionLocal()
+    try:
+        batch = db.get(Batch, "batch-4")
+        assert batch.status == "failed"
+        assert batch.error == "boom"
+        statuses = {i.filename: i.status for i in db.query(Image).filter(Image.batch_id == "batch-4")}
+        assert statuses == {"clean_0003.jpg": "clean", "weld_0001.jpg": "clean",
+                            "weld_0002.jpg": "pending"}
+    finally:
+        db.close()
+
+
+def test_resume_skips_images_completed_under_same_configuration(tmp_path, monkeypatch):
+    import pytest
+
+    from app.config import settings
+    from app.services.inference.base import Detection, register
+
+    monkeypatch.setattr(settings, "inference_batch_size", 1)
+    folder = str(tmp_path / "crops-resume")
+    _make_images(folder)
+    calls = []
+
+    class _FlakyOnce:
+        name = "flaky-once"
+        failed = False
+
+        def detect(self, image_path, width, height, defect_classes, params):
+            name = os.path.basename(image_path)
+            if name == "weld_0002.jpg" and not self.failed:
+                self.failed = True
+                raise RuntimeError("interrupted")
+            calls.append(name)
+            return [Detection("porosity", "welding", 0.9, [[0, 0], [5, 0], [5, 5]])]
+
+    register(_FlakyOnce())
+    _seed_batch(folder, "batch-resume", strategy="flaky-once")
+
+    with pytest.raises(RuntimeError):
+        pipeline.run_batch("batch-resume", SessionLocal)
+    assert calls == ["clean_0003.jpg", "weld_0001.jpg"]
+
+    calls.clear()
+    pipeline.run_batch("batch-resume", SessionLocal, resume=True)
+    assert calls == ["weld_0002.jpg"]
+
+    db = SessionLocal()
+    try:
+        batch = db.get(Batch, "batch-resume")
+        assert batch.status == "done"
+        assert batch.image_count == 3
+        assert batch.defect_count == 3
+        assert {i.status for i in db.query(Image).filter(Image.batch_id == "batch-resume")} == {"defect"}
+    finally:
+        db.close()
+
+
+def test_recover_interrupted_marks_processing_batches_failed():
+    db = SessionLocal()
+    try:
+        db.add(Batch(id="batch-stuck", name="Stuck", source_path="/nowhere",
+                     created_at=now_iso(), status="processing"))
+        db.commit()
+        assert pipeline.recover_interrupted(db) == 1
+        batch = db.get(Batch, "batch-stuck")
+        assert batch.status == "failed"
+        assert batch.error
+    finally:
+        db.close()
+
+
+def test_run_batch_feeds_batch_strategies_in_configured_chunks(tmp_path, monkeypatch):
+    from app.config import settings
+    from app.services.inference.base import register
+
+    folder = str(tmp_path / "crops5")
+    _make_images(folder)
+    chunks = []
+
+    class _BatchStrategy:
+        name = "batched"
+
+        def detect(self, image_path, width, height, defect_classes, params):
+            raise AssertionError("detect_many should be used")
+
+        def detect_many(self, images, defect_classes, params):
+            chunks.append([im.image_id for im in images])
+            return [[] for _ in images]
+
+    register(_BatchStrategy())
+    monkeypatch.setattr(settings, "inference_batch_size", 2)
+    _seed_batch(folder, "batch-5", strategy="batched")
+
+    pipeline.run_batch("batch-5", SessionLocal)
+
+    assert [len(c) for c in chunks] == [2, 1]
+    db = SessionLocal()
+    try:
+        assert db.get(Batch, "batch-5").status == "done"
+    finally:
+        db.close()
+
+
+def test_run_batch_records_per_image_latency_by_prompt_mode(tmp_path):
+    folder = str(tmp_path / "crops6")
+    _make_images(folder)
+    _seed_batch(folder, "batch-6")
+    pipeline.run_batch("batch-6", SessionLocal)
+
+    db = SessionLocal()
+    try:
+        latency = db.get(Batch, "batch-6").model_info["ms_per_image"]
+        assert set(latency) == {"mock"}
+        assert latency["mock"] >= 0
+    finally:
+        db.close()
+
+    sam3 = pipeline.get_strategy("sam3_prompt")
+    assert pipeline.run_label(sam3, {"prompt_mode": "per_class"}) == "sam3_prompt/per_class"
+    info = pipeline.record_latency({"ms_per_image": {"sam3_prompt/per_class": 400.0}},
+                                   "sam3_prompt/single_pass", 91.26)
+    assert info["ms_per_image"] == {"sam3_prompt/per_class": 400.0,
+                                    "sam3_prompt/single_pass": 91.3}
+
+
+def test_threshold_only_rerun_refilters_stored_candidates(tmp_path):
+    from app.services.inference.base import register
+
+    folder = str(tmp_path / "crops7")
+    _make_images(folder)
+    calls = []
+
+    class _Scored:
+        name = "scored"
+        emits_candidates = True
+
+        def detect(self, image_path, width, height, defect_classes, params):
+            from app.services.inference.base import Detection
+
+            calls.append(params["candidate_floor"])
+            square = [[1, 1], [9, 1], [9, 9], [1, 9]]
+            return [Detection("porosity", "welding", c, square) for c in (0.2, 0.6, 0.9)]
+
+    register(_Scored())
+    _seed_batch(folder, "batch-7", strategy="scored")
+
+    pipeline.run_batch("batch-7", SessionLocal, confidence_override=0.5)
+    assert calls == [0.01] * 3
+
+    def defect_confidences():
+        db = SessionLocal()
+        try:
+            return sorted(
+                d.confidence
+                for im in db.query(Image).filter(Image.batch_id == "batch-7")
+                for d in im.defects
+            )
+        finally:
+            db.close()
+
+    assert defect_confidences() == sorted([0.6, 0.9] * 3)
+
+    pipeline.run_batch("batch-7", SessionLocal, confidence_override=0.85)
+    assert len(calls) == 3, "threshold-only re-run must not call the strategy"
+    assert defect_confidences() == [0.9] * 3
+    db = SessionLocal()
+    try:
+        batch = db.get(Batch, "batch-7")
+        assert batch.defect_count == 3
+        assert batch.model_info["last_run"] == "refilter"
+    finally:
+        db.close()
+
+    pipeline.run_batch("batch-7", SessionLocal, confidence_override=0.1)
+    assert len(calls) == 3
+    assert defect_confidences() == sorted([0.2, 0.6, 0.9] * 3)
+
+    db = SessionLocal()
+    try:
+        db.add(DefectClass(id="dc-2", name="crack", category="welding"))
+        db.commit()
+    finally:
+        db.close()
+    pipeline.run_batch("batch-7", SessionLocal, confidence_override=0.1)
+    assert len(calls) == 6, "class changes must trigger full inference"
+
+
+def test_result_cache_skips_inference_for_known_content(tmp_path):
+    from app.services.inference.base import Detection, register
+
+    folder = str(tmp_path / "crops8")
+    _make_images(folder)  # three files with identical pixels
+    calls = []
+
+    class _PixelsOnly:
+        name = "pixels-only"
+        cacheable = True
+
+        def detect(self, image_path, width, height, defect_classes, params):
+            calls.append(os.path.basename(image_path))
+            return [Detection("porosity", "welding", 0.8, [[1, 1], [9, 1], [9, 9]])]
+
+    register(_PixelsOnly())
+    _seed_batch(folder, "batch-8", strategy="pixels-only")
+    db = SessionLocal()
+    try:
+        db.add(Batch(id="batch-9", name="Copy", source_path=folder,
+                     created_at=now_iso(), status="processing"))
+        db.commit()
+        pipeline.prepare_images(db, db.get(Batch, "batch-9"))
+    finally:
+        db.close()
+
+    pipeline.run_batch("batch-8", SessionLocal)
+    first = len(calls)
+    pipeline.run_batch("batch-9", SessionLocal)
+
+    assert len(calls) == first, "second batch should be served from the cache"
+    db = SessionLocal()
+    try:
+        copy = db.get(Batch, "batch-9")
+        assert copy.model_info["result_cache"] == {"hits": 3, "misses": 0}
+        assert copy.defect_count == 3
+        assert db.get(Batch, "batch-8").model_info["result_cache"]["misses"] == first
+    finally:
+        db.close()
+
+
+def test_prepare_images_reads_headers_and_skips_non_files(tmp_path, monkeypatch):
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "ingest_chunk", 2)
+    folder = str(tmp_path / "crops-ingest")
+    _make_images(folder)
+    os.makedirs(os.path.join(folder, "nested.jpg"))
+    PILImage.new("RGB", (64, 32)).save(os.path.join(folder, "small.png"))
+
+    _seed_batch(folder, "batch-ingest")
+
+    db = SessionLocal()
+    try:
+        images = db.query(Image).filter(Image.batch_id == "batch-ingest").order_by(Image.filename).all()
+        assert [i.filename for i in images] == ["clean_0003.jpg", "small.png",
+                                                "weld_0001.jpg", "weld_0002.jpg"]
+        assert (images[1].width, images[1].height) == (64, 32)
+        assert all(i.url == f"/api/images/{i.id}/file" for i in images)
+        assert db.get(Batch, "batch-ingest").image_count == 4
+    finally:
+        db.close()
+
+
+def test_result_json_is_streamed_compact_and_ordered(tmp_path, monkeypatch):
+    from sqlalchemy import event
+
+    from app import storage
+    from app.config import settings
+    from app.database import engine
+
+    monkeypatch.setattr(settings, "result_jsonl", True)
+    monkeypatch.setattr(settings, "batch_flush_images", 2)
+    folder = str(tmp_path / "crops-export")
+    _make_images(folder)
+    _seed_batch(folder, "batch-export")
+    pipeline.run_batch("batch-export", SessionLocal)
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    event.listen(engine, "before_cursor_execute", listener)
+    db = SessionLocal()
+    try:
+        path = storage.write_result_json(db, db.get(Batch, "batch-export"), chunk=2)
+    finally:
+        db.close()
+        event.remove(engine, "before_cursor_execute", listener)
+    # three images in chunks of two: one eager defect query per chunk
+    assert len([s for s in statements if "FROM defects" in s]) == 2
+
+    raw = open(path, encoding="utf-8").read()
+    assert "\n" not in raw
+    payload = json.loads(raw)
+    assert payload["batch_name"] == "Staged"
+    assert [im["filename"] for im in payload["images"]] == ["clean_0003.jpg", "weld_0001.jpg",
+                                                            "weld_0002.jpg"]
+    assert any(im["defects"] for im in payload["images"])
+
+    lines = open(os.path.join(os.path.dirname(path), "result.jsonl"), encoding="utf-8").readlines()
+    streamed = {rec["id"]: rec for rec in map(json.loads, lines)}
+    assert streamed == {im["id"]: im for im in payload["images"]}
+
+
+def test_refilter_rewrites_the_streamed_jsonl(tmp_path, monkeypatch):
+    from app import storage
+    from app.config import settings
+    from app.services.inference.base import Detection, register
+
+    class _Scored:
+        name = "scored-jsonl"
+        emits_candidates = True
+
+        def detect(self, image_path, width, height, defect_classes, params):
+            square = [[1, 1], [9, 1], [9, 9], [1, 9]]
+            return [Detection("porosity", "welding", c, square) for c in (0.2, 0.6)]
+
+    monkeypatch.setattr(settings, "result_jsonl", True)
+    register(_Scored())
+    folder = str(tmp_path / "crops-refilter-jsonl")
+    _make_images(folder)
+    _seed_batch(folder, "batch-refilter-jsonl", strategy="scored-jsonl")
+    pipeline.run_batch("batch-refilter-jsonl", SessionLocal, confidence_override=0.5)
+    pipeline.run_batch("batch-refilter-jsonl", SessionLocal, confidence_override=0.1)
+
+    out_dir = storage.result_dir("batch-refilter-jsonl")
+    with open(os.path.join(out_dir, "result.json"), encoding="utf-8") as fh:
+        exported = {im["id"]: im for im in json.load(fh)["images"]}
+    latest = {}
+    with open(os.path.join(out_dir, "result.jsonl"), encoding="utf-8") as fh:
+        for line in fh:
+            record = json.loads(line)
+            latest[record["id"]] = record
+    assert all(len(im["defects"]) == 2 for im in exported.values())
+    assert latest == exported
+
+
+def test_mock_ignores_the_confidence_threshold(tmp_path):
+    folder = str(tmp_path / "crops-mock-threshold")
+    _make_images(folder)
+    _seed_batch(folder, "batch-mock-threshold")
+
+    def defects():
+        db = SessionLocal()
+        try:
+            return db.get(Batch, "batch-mock-threshold").defect_count
+        finally:
+            db.close()
+
+    pipeline.run_batch("batch-mock-threshold", SessionLocal)
+    baseline = defects()
+    assert baseline > 0
+    # mock confidences are 0.6-0.98; a threshold above them changes nothing
+    pipeline.run_batch("batch-mock-threshold", SessionLocal, confidence_override=0.99)
+    assert defects() == baseline
+
+
+def test_retryable_failure_is_not_reported_as_failed(tmp_path, monkeypatch):
+    from app.config import settings
+    from app.models import Job
+    from app.services import job_queue, scheduler
+    from app.services.inference.base import register
+
+    monkeypatch.setattr(settings, "inference_batch_size", 1)
+    folder = str(tmp_path / "crops-retry")
+    _make_images(folder)
+    failures = {"left": 1}
+
+    class _Transient:
+        name = "transient"
+
+        def detect(self, image_path, width, height, defect_classes, params):
+            if failures["left"]:
+                failures["left"] -= 1
+                raise RuntimeError("transient")
+            return []
+
+    register(_Transient())
+    finished = []
+    monkeypatch.setattr(job_queue, "finish", lambda key, state: finished.append(state))
+
+    _seed_batch(folder, "batch-retry", strategy="transient")
+    db = SessionLocal()
+    try:
+        job = scheduler.submit(db, "batch_run", "batch-retry", max_attempts=2)
+        assert (db.get(Job, job.id).status, db.get(Job, job.id).attempts) == ("done", 2)
+        assert db.get(Batch, "batch-retry").status == "done"
+    finally:
+        db.close()
+    # no terminal "failed" event for SSE clients before the retry
+    assert finished == ["done"]
+
+    # the last attempt's failure is final
+    failures["left"] = 2
+    finished.clear()
+    other = str(tmp_path / "crops-retry-2")
+    _make_images(other)
+    db = SessionLocal()
+    try:
+        db.add(Batch(id="batch-retry-2", name="Staged", source_path=other,
+                     created_at=now_iso(), status="processing"))
+        db.commit()
+        pipeline.prepare_images(db, db.get(Batch, "batch-retry-2"))
+        scheduler.submit(db, "batch_run", "batch-retry-2", max_attempts=2)
+        assert db.get(Batch, "batch-retry-2").status == "failed"
+    finally:
+        db.close()
+    assert finished == ["failed"]
+
+
+def test_files_are_hashed_only_for_a_cache(tmp_path, monkeypatch):
+    from app.config import settings
+
+    folder = str(tmp_path / "crops-nohash")
+    _make_images(folder)
+    _seed_batch(folder, "batch-nohash")
+    digests = []
+    real_load = pipeline.load_image
+
+    def recording_load(*args):
+        image = real_load(*args)
+        digests.append(image.digest)
+        return image
+
+    monkeypatch.setattr(pipeline, "load_image", recording_load)
+    monkeypatch.setattr(settings, "result_cache_enabled", True)
+    pipeline.run_batch("batch-nohash", SessionLocal)
+    # the mock strategy is not cacheable, so no file is hashed
+    assert digests == [None] * 3
+
+
+def test_result_cache_keeps_the_newest_rows(monkeypatch):
+    from app.config import settings
+    from app.models import ResultCacheEntry
+    from app.services import result_cache
+    from app.services.inference.base import Detection
+
+    monkeypatch.setattr(settings, "result_cache_max_rows", 3)
+    db = SessionLocal()
+    try:
+        det = Detection("porosity", "welding", 0.8, [[1, 1], [9, 1], [9, 9]])
+        for i in range(5):
+            result_cache.store(db, [(f"k{i}", [det])])
+        db.commit()
+        assert sorted(db.scalars(select(ResultCacheEntry.key))) == ["k2", "k3", "k4"]
+    finally:
+        db.close()
@@ -0,0 +1,84 @@
+import asyncio
+import json
+import os
+import threading
+import time
+
+from PIL import Image as PILImage
+
+from app.services import job_queue
+from app.services.progress_stream import progress_events
+
+
+def _events(lines):
+    return [json.loads(line[len("data: "):]) for line in lines if line.startswith("data: ")]
+
+
+async def _collect(gen):
+    return [chunk async for chunk in gen]
+
+
+def test_events_are_coalesced_and_end_on_terminal_state():
+    job_queue.set_total("ps-1", 100)
+
+    def work():
+        for _ in range(100):
+            job_queue.increment("ps-1")
+            time.sleep(0.001)
+        job_queue.finish("ps-1", "done")
+
+    worker = threading.Thread(target=work)
+    worker.start()
+    chunks = asyncio.run(_collect(progress_events("ps-1", "running", max_hz=20)))
+    worker.join()
+
+    events = _events("".join(chunks).splitlines())
+    assert events[-1]["state"] == "done"
+    assert events[-1]["done"] == events[-1]["total"] == 100
+    assert {"images_per_sec", "eta_s"} <= set(events[-1])
+    assert len(events) < 101  # coalesced, not one event per increment
+    assert [e["done"] for e in events] == sorted(e["done"] for e in events)
+
+
+def test_untracked_key_reports_fallback_once():
+    chunks = asyncio.run(_collect(progress_events("ps-none", "done")))
+    assert _events("".join(chunks).splitlines()) == [
+        {"state": "done", "done": 0, "total": 0, "images_per_sec": None, "eta_s": None}
+    ]
+
+
+def test_heartbeat_keeps_idle_stream_open():
+    job_queue.set_total("ps-idle", 5)
+
+    async def first_chunks():
+        gen = progress_events("ps-idle", "running", max_hz=50, heartbeat_s=0.05)
+        out = [await gen.__anext__(), await gen.__anext__()]
+        await gen.aclose()
+        return out
+
+    first, second = asyncio.run(first_chunks())
+    assert first.startswith("event: progress")
+    assert second == ": keep-alive\n\n"
+
+
+def test_batch_progress_stream_endpoint(client, tmp_path):
+    folder = str(tmp_path / "crops")
+    os.makedirs(folder)
+    PILImage.new("RGB", (64, 64)).save(os.path.join(folder, "weld_0001.jpg"))
+    batch_id = client.post("/api/batches", json={"batch_name": "S",
+                                                 "source_path": folder}).json()["batch_id"]
+    client.post(f"/api/batches/{batch_id}/run", json={})
+
+    with client.stream("GET", f"/api/batches/{batch_id}/progress/stream") as resp:
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("text/event-stream")
+        events = _events(list(resp.iter_lines()))
+    assert events == [{"state": "done", "done": 1, "total": 1,
+                       "images_per_sec": events[0]["images_per_sec"], "eta_s": 0.0}]
+    assert client.get("/api/batches/missing/progress/stream").status_code == 404
+
+
+def test_extract_progress_stream_for_unknown_video(client):
+    with client.stream("GET", "/api/detect/video/vid-x/extract/stream") as resp:
+        events = _events(list(resp.iter_lines()))
+    assert [e["state"] for e in events] == ["idle"]
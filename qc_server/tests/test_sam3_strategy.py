@@ -27,26 +27,38 @@ class _FakeMasks:
 
 
 class _FakeBoxes:
-    def __init__(self, conf):
+    def __init__(self, conf, cls=None):
         self.conf = conf
+        self.cls = cls if cls is not None else [0] * len(conf)
 
 
 class _FakeResult:
-    def __init__(self, xy, conf):
+    def __init__(self, xy, conf, cls=None):
         self.masks = _FakeMasks(xy)
-        self.boxes = _FakeBoxes(conf)
+        self.boxes = _FakeBoxes(conf, cls)
 
 
 class _FakePredictor:
     def __init__(self, mapping):
         self.mapping = mapping
         self.image = None
+        self.calls = []
 
     def set_image(self, path):
         self.image = path
 
     def __call__(self, text):
-        return self.mapping.get(text[0], [])
+        self.calls.append(list(text))
+        if len(text) == 1:
+            return self.mapping.get(text[0], [])
+        # Multi-prompt call: one merged result, cls = prompt index (SAM3 semantics).
+        xy, conf, cls = [], [], []
+        for index, name in reversed(list(enumerate(text))):
+            for result in self.mapping.get(name, []):
+                xy.extend(result.masks.xy)
+                conf.extend(result.boxes.conf)
+                cls.extend([index] * len(result.boxes.conf))
+        return [_FakeResult(xy, conf, cls)]
 
 
 def test_detect_maps_filters_and_simplifies(monkeypatch, tmp_path):
@@ -78,6 +90,21 @@ def test_detect_maps_filters_and_simplifies(monkeypatch, tmp_path):
     assert dets[0].polygon == [[10, 10], [40, 10], [40, 40], [10, 40]]
 
 
+def test_threshold_compares_the_stored_rounded_score(monkeypatch, tmp_path):
+    square = [[10, 10], [40, 10], [40, 40], [10, 40]]
+    fake = _FakePredictor({"scratch": [_FakeResult([square, square], [0.4951, 0.4949])]})
+    monkeypatch.setattr(sam3, "get_predictor", lambda _: fake)
+    model_path = tmp_path / "sam3.pt"
+    model_path.write_text("fake")
+
+    dets = sam3.Sam3Strategy().detect(
+        "img.jpg", 100, 100, [DefectClassSpec("scratch", "coating", True)],
+        {"qc_model_path": str(model_path), "confidence_threshold": 0.5},
+    )
+    # 0.4951 is stored as 0.5 and kept, as a later re-filter at 0.5 would keep it
+    assert [d.confidence for d in dets] == [0.5]
+
+
 def test_detect_requires_qc_model_path():
     with pytest.raises(ValueError):
         sam3.Sam3Strategy().detect("img.jpg", 10, 10, [], {"confidence_threshold": 0.5})
@@ -89,3 +116,90 @@ def test_detect_requires_existing_qc_model_path(tmp_path):
             "img.jpg", 10, 10, [],
             {"qc_model_path": str(tmp_path / "missing.pt"), "confidence_threshold": 0.5},
         )
+
+
+def test_detect_many_returns_one_list_per_image(monkeypatch, tmp_path):
+    from app.services.inference.base import LoadedImage
+
+    square = [[10, 10], [40, 10], [40, 40], [10, 40]]
+    fake = _FakePredictor({"scratch": [_FakeResult([square], [0.8])]})
+    set_images = []
+    fake.set_image = set_images.append
+    monkeypatch.setattr(sam3, "get_predictor", lambda _: fake)
+    model_path = tmp_path / "sam3.pt"
+    model_path.write_text("fake")
+
+    images = [LoadedImage("a", "a.jpg", 100, 100), LoadedImage("b", "b.jpg", 100, 100)]
+    out = sam3.Sam3Strategy().detect_many(
+        images, [DefectClassSpec("scratch", "coating", True)],
+        {"qc_model_path": str(model_path), "confidence_threshold": 0.5},
+    )
+
+    assert set_images == ["a.jpg", "b.jpg"]
+    assert [len(dets) for dets in out] == [1, 1]
+    assert out[1][0].type == "scratch"
+
+
+def test_single_pass_matches_per_class_loop(monkeypatch, tmp_path):
+    tri = [[5, 5], [30, 5], [30, 30]]
+    square = [[10, 10], [40, 10], [40, 40], [10, 40]]
+    mapping = {
+        "scratch": [_FakeResult([square, tri], [0.91, 0.7])],
+        "dent": [_FakeResult([tri], [0.3])],
+        "chip": [_FakeResult([square], [0.66])],
+    }
+    fake = _FakePredictor(mapping)
+    monkeypatch.setattr(sam3, "get_predictor", lambda _: fake)
+    model_path = tmp_path / "sam3.pt"
+    model_path.write_text("fake")
+    specs = [
+        DefectClassSpec("scratch", "coating", True),
+        DefectClassSpec("dent", "welding", True),
+        DefectClassSpec("off", "coating", False),
+        DefectClassSpec("chip", "coating", True),
+    ]
+    params = {"qc_model_path": str(model_path), "confidence_threshold": 0.5}
+
+    per_class = sam3.Sam3Strategy().detect(
+        "img.jpg", 100, 100, specs, {**params, "prompt_mode": "per_class"})
+    assert len(fake.calls) == 3
+    fake.calls.clear()
+    single = sam3.Sam3Strategy().detect(
+        "img.jpg", 100, 100, specs, {**params, "prompt_mode": "single_pass"})
+
+    assert fake.calls == [["scratch", "dent", "chip"]]
+    assert [d.__dict__ for d in single] == [d.__dict__ for d in per_class]
+    assert [d.type for d in single] == ["scratch", "scratch", "chip"]
+
+
+def test_detect_many_fans_out_to_inference_pool(monkeypatch, tmp_path):
+    from concurrent.futures import Future
+
+    import numpy as np
+
+    from app.services import inference_pool
+    from app.services.inference.base import LoadedImage
+
+    submitted = []
+
+    class _FakePool:
+        def submit(self, task, frame, image, specs, params):
+            submitted.append((task, frame.shape, image.pixels, image.digest))
+            future = Future()
+            future.set_result([image.image_id])
+            return future
+
+    monkeypatch.setattr(inference_pool.settings, "inference_processes", 2)
+    monkeypatch.setattr(inference_pool, "get_pool", lambda: _FakePool())
+    model_path = tmp_path / "sam3.pt"
+    model_path.write_text("fake")
+    images = [LoadedImage(f"img-{i}", f"/x/{i}.jpg", 8, 8, np.zeros((8, 8, 3), np.uint8), f"d{i}")
+              for i in range(2)]
+
+    out = sam3.Sam3Strategy().detect_many(
+        images, [DefectClassSpec("scratch", "coating", True)], {"qc_model_path": str(model_path)}
+    )
+    assert out == [["img-0"], ["img-1"]]
+    # pixels go through shared memory, not inside the pickled LoadedImage
+    assert submitted == [("app.services.inference.sam3:detect_in_worker", (8, 8, 3), None, "d0"),
+                         ("app.services.inference.sam3:detect_in_worker", (8, 8, 3), None, "d1")]
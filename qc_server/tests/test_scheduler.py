@@ -0,0 +1,214 @@
+import threading
+import time
+
+from app.database import SessionLocal
+from app.models import Job
+from app.services import job_queue, scheduler
+
+
+def _queue(job_id, kind, priority=0, enqueued_at=None, target="t", max_attempts=1):
+    db = SessionLocal()
+    try:
+        db.add(Job(id=job_id, kind=kind, target_id=target, params={}, priority=priority,
+                   status="queued", attempts=0, max_attempts=max_attempts,
+                   enqueued_at=enqueued_at or time.time(), created_at="now"))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _job(job_id):
+    db = SessionLocal()
+    try:
+        return db.get(Job, job_id)
+    finally:
+        db.close()
+
+
+def test_run_next_takes_highest_priority_then_oldest():
+    ran = []
+    scheduler.register("t-order", lambda ctx: ran.append(ctx.job_id))
+    _queue("j-old", "t-order", enqueued_at=1.0, target="a")
+    _queue("j-new", "t-order", enqueued_at=2.0, target="b")
+    _queue("j-urgent", "t-order", priority=5, enqueued_at=3.0, target="c")
+
+    while scheduler.run_next(SessionLocal):
+        pass
+
+    assert ran == ["j-urgent", "j-old", "j-new"]
+    assert _job("j-old").status == "done"
+
+
+def test_unique_submit_reuses_the_queued_job(monkeypatch):
+    _queue("j-waiting", "t-unique", target="u")
+    # a worker pool is running: submit only queues
+    monkeypatch.setattr(scheduler._State, "workers", [object()])
+    db = SessionLocal()
+    try:
+        assert scheduler.submit(db, "t-unique", "u", unique=True).id == "j-waiting"
+        assert scheduler.submit(db, "t-unique", "u").id != "j-waiting"
+        assert db.query(Job).filter(Job.kind == "t-unique").count() == 2
+    finally:
+        db.close()
+
+
+def test_failed_attempts_are_retried_up_to_max_attempts():
+    attempts = []
+
+    def flaky(ctx):
+        attempts.append(ctx.attempt)
+        if ctx.attempt == 1:
+            raise RuntimeError("transient")
+
+    scheduler.register("t-flaky", flaky)
+    db = SessionLocal()
+    try:
+        job = scheduler.submit(db, "t-flaky", "x", max_attempts=2)
+    finally:
+        db.close()
+    assert attempts == [1, 2]
+    assert _job(job.id).status == "done"
+    assert _job(job.id).error is None
+
+    def broken(ctx):
+        raise RuntimeError("boom")
+
+    scheduler.register("t-broken", broken)
+    db = SessionLocal()
+    try:
+        job = scheduler.submit(db, "t-broken", "y", max_attempts=2)
+    finally:
+        db.close()
+    stored = _job(job.id)
+    assert (stored.status, stored.attempts, stored.error) == ("failed", 2, "boom")
+
+
+def test_cancel_queued_and_running_jobs():
+    cancelled_targets = []
+    scheduler.register("t-cancel", lambda ctx: None,
+                       on_cancel=lambda db, job: cancelled_targets.append(job.target_id))
+    _queue("j-queued", "t-cancel", target="q")
+    db = SessionLocal()
+    try:
+        assert scheduler.cancel(db, "j-queued").status == "cancelled"
+    finally:
+        db.close()
+    assert cancelled_targets == ["q"]
+    assert scheduler.run_next(SessionLocal) is False
+
+    def cancels_itself(ctx):
+        inner = SessionLocal()
+        try:
+            scheduler.cancel(inner, ctx.job_id)
+        finally:
+            inner.close()
+        ctx.check_cancelled()
+        raise AssertionError("should have been cancelled")
+
+    scheduler.register("t-self-cancel", cancels_itself)
+    _queue("j-running", "t-self-cancel", max_attempts=3)
+    assert scheduler.run_next(SessionLocal) is True
+    stored = _job("j-running")
+    assert stored.status == "cancelled"
+    assert stored.attempts == 1
+
+
+def test_recover_requeues_interrupted_jobs():
+    _queue("j-a", "t-recover", max_attempts=2)
+    _queue("j-b", "t-recover", max_attempts=1)
+    db = SessionLocal()
+    try:
+        for job in db.query(Job).all():
+            job.status, job.attempts = "running", 1
+        db.commit()
+        assert scheduler.recover(db) == 2
+    finally:
+        db.close()
+    assert _job("j-a").status == "queued"
+    assert _job("j-b").status == "failed"
+
+
+def test_worker_threads_drain_the_queue():
+    ran = []
+    scheduler.register("t-worker", lambda ctx: ran.append(ctx.target_id))
+    scheduler.start(SessionLocal, 2, poll_interval=0.05)
+    try:
+        db = SessionLocal()
+        try:
+            ids = [scheduler.submit(db, "t-worker", f"w{i}").id for i in range(4)]
+        finally:
+            db.close()
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and len(ran) < 4:
+            time.sleep(0.02)
+    finally:
+        scheduler.stop()
+        scheduler._State.session_factory = None
+    assert sorted(ran) == ["w0", "w1", "w2", "w3"]
+    assert {_job(i).status for i in ids} == {"done"}
+
+
+def test_lane_worker_runs_interactive_jobs_behind_a_long_run():
+    release = threading.Event()
+    ran = []
+    scheduler.register("t-long", lambda ctx: release.wait(5) and ran.append("long"))
+    scheduler.register("t-extract", lambda ctx: ran.append("extract"), lane="t-lane")
+    scheduler.start(SessionLocal, 1, poll_interval=0.05, lanes={"t-lane": 1})
+    try:
+        db = SessionLocal()
+        try:
+            scheduler.submit(db, "t-long", "batch-long")
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline and _count_running() == 0:
+                time.sleep(0.02)
+            scheduler.submit(db, "t-extract", "video-1")
+            # the general worker is busy; the reserved one takes the extract
+            while time.monotonic() < deadline and "extract" not in ran:
+                time.sleep(0.02)
+            assert ran == ["extract"]
+        finally:
+            db.close()
+    finally:
+        release.set()
+        scheduler.stop()
+        scheduler._State.session_factory = None
+        scheduler._LANES.pop("t-extract", None)
+    assert ran == ["extract", "long"]
+
+
+def _count_running():
+    db = SessionLocal()
+    try:
+        return db.query(Job).filter(Job.status == "running").count()
+    finally:
+        db.close()
+
+
+def test_progress_reports_rate_and_eta_excluding_skipped_items(monkeypatch):
+    clock = iter([100.0, 102.0])
+    monkeypatch.setattr(job_queue.time, "monotonic", lambda: next(clock))
+    job_queue.set_total("jq", 10, done=4)
+    job_queue.increment("jq", 2)
+    progress = job_queue.get("jq")
+    assert progress == {"done": 6, "total": 10, "images_per_sec": 1.0, "eta_s": 4.0}
+
+
+def test_jobs_endpoints_list_and_cancel(client, tmp_path):
+    import os
+
+    from PIL import Image as PILImage
+
+    folder = str(tmp_path / "crops")
+    os.makedirs(folder)
+    PILImage.new("RGB", (64, 64)).save(os.path.join(folder, "weld_0001.jpg"))
+    batch_id = client.post("/api/batches", json={"batch_name": "J",
+                                                 "source_path": folder}).json()["batch_id"]
+    run = client.post(f"/api/batches/{batch_id}/run", json={"priority": 3}).json()
+    assert run["status"] == "done"
+
+    jobs = client.get("/api/jobs").json()
+    assert [(j["id"], j["kind"], j["target_id"], j["priority"], j["status"]) for j in jobs] == [
+        (run["job_id"], "batch_run", batch_id, 3, "done")
+    ]
+    assert client.post(f"/api/jobs/{run['job_id']}/cancel").json()["status"] == "done"
+    assert client.post("/api/jobs/missing/cancel").status_code == 404
@@ -19,7 +19,8 @@ def _batch_with_image(client, tmp_path):
     return batch_id, image
 
 
-def _set_qc_model(name="sam3.pt"):
+def _set_qc_model(tmp_path, monkeypatch, name="sam3.pt"):
+    monkeypatch.setattr(app_settings, "models_dir", str(tmp_path / "models"))
     os.makedirs(app_settings.models_dir, exist_ok=True)
     open(os.path.join(app_settings.models_dir, name), "wb").close()
     db = SessionLocal()
@@ -33,7 +34,7 @@ def test_segment_point_returns_polygon(client, tmp_path, monkeypatch):
     from app.services.inference import sam_interactive
 
     batch_id, image = _batch_with_image(client, tmp_path)
-    _set_qc_model()
+    _set_qc_model(tmp_path, monkeypatch)
     monkeypatch.setattr(
         sam_interactive,
         "segment",
@@ -53,7 +54,7 @@ def test_segment_box_returns_polygon(client, tmp_path, monkeypatch):
     from app.services.inference import sam_interactive
 
     batch_id, image = _batch_with_image(client, tmp_path)
-    _set_qc_model()
+    _set_qc_model(tmp_path, monkeypatch)
     monkeypatch.setattr(
         sam_interactive,
         "segment",
@@ -69,9 +70,9 @@ def test_segment_box_returns_polygon(client, tmp_path, monkeypatch):
     assert resp.json()["polygon"] == [[3, 4], [12, 4], [12, 11]]
 
 
-def test_segment_requires_exactly_one_prompt(client, tmp_path):
+def test_segment_requires_exactly_one_prompt(client, tmp_path, monkeypatch):
     batch_id, image = _batch_with_image(client, tmp_path)
-    _set_qc_model()
+    _set_qc_model(tmp_path, monkeypatch)
     url = f"/api/batches/{batch_id}/images/{image['id']}/segment"
 
     assert client.post(url, json={}).status_code == 400
@@ -89,9 +90,9 @@ def test_segment_requires_qc_model(client, tmp_path):
     assert resp.status_code == 409
 
 
-def test_segment_reuses_image_ownership_404(client, tmp_path):
+def test_segment_reuses_image_ownership_404(client, tmp_path, monkeypatch):
     batch_id, image = _batch_with_image(client, tmp_path)
-    _set_qc_model()
+    _set_qc_model(tmp_path, monkeypatch)
 
     assert client.post(
         f"/api/batches/nope/images/{image['id']}/segment",
@@ -101,3 +102,50 @@ def test_segment_reuses_image_ownership_404(client, tmp_path):
         f"/api/batches/{batch_id}/images/nope/segment",
         json={"point": [5, 6]},
     ).status_code == 404
+
+
+def test_segment_reuses_image_embedding_between_clicks(tmp_path, monkeypatch):
+    import numpy as np
+
+    from app.services.inference import embedding_cache, sam_interactive
+
+    monkeypatch.setattr(embedding_cache, "_cache",
+                        embedding_cache.EmbeddingCache(memory_bytes=1 << 20))
+    image = tmp_path / "part.jpg"
+    PILImage.new("RGB", (100, 80), (50, 50, 50)).save(image)
+    model = tmp_path / "sam3.pt"
+    model.write_bytes(b"w")
+
+    class _Masks:
+        xy = [[[10, 10], [40, 10], [40, 40], [10, 40]]]
+
+    class _Result:
+        masks = _Masks()
+        boxes = None
+
+    class _Predictor:
+        model = object()
+
+        def __init__(self):
+            self.encodes = 0
+            self.features = None
+
+        def set_image(self, source):
+            self.encodes += 1
+            self.features = np.zeros(8)
+
+        def setup_source(self, source):
+            pass
+
+        def __call__(self, **prompts):
+            return [_Result()]
+
+    fake = _Predictor()
+    monkeypatch.setattr(sam_interactive, "get_predictor", lambda path: fake)
+
+    first = sam_interactive.segment(str(image), 100, 80, point=[5, 6], model_path=str(model))
+    second = sam_interactive.segment(str(image), 100, 80, box=[1, 2, 50, 60],
+                                     model_path=str(model))
+
+    assert first == second == [[10, 10], [40, 10], [40, 40], [10, 40]]
+    assert fake.encodes == 1
@@ -0,0 +1,87 @@
+import threading
+
+from app.database import SessionLocal
+from app.models import Setting
+from app.services import object_detection, warmup
+from app.services.inference import sam3
+
+
+def _configure(tmp_path, monkeypatch):
+    for name in ("yolo.pt", "sam3.pt"):
+        (tmp_path / name).write_bytes(b"x")
+    monkeypatch.setattr(warmup.settings, "models_dir", str(tmp_path))
+    monkeypatch.setattr(warmup.settings, "stream_max_width", 640)
+    db = SessionLocal()
+    try:
+        db.add(Setting(id=1, active_model="yolo.pt", qc_model="sam3.pt",
+                       defect_strategy="sam3_prompt"))
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_run_loads_and_infers_configured_models_at_stream_size(tmp_path, monkeypatch):
+    _configure(tmp_path, monkeypatch)
+    calls = []
+    monkeypatch.setattr(object_detection, "get_model", lambda p: calls.append(("load", p)))
+    monkeypatch.setattr(object_detection, "detect_local",
+                        lambda frame, conf, p: calls.append(("detect", frame.shape)))
+    monkeypatch.setattr(sam3, "get_predictor", lambda p: calls.append(("predictor", p)))
+    monkeypatch.setattr(sam3._strategy, "detect_local",
+                        lambda images, specs, params: calls.append(("segment", images[0].pixels.shape)))
+
+    warmup.run(SessionLocal)
+
+    assert calls == [
+        ("load", str(tmp_path / "yolo.pt")),
+        ("detect", (360, 640, 3)),
+        ("predictor", str(tmp_path / "sam3.pt")),
+        ("segment", (360, 640, 3)),
+    ]
+    state = warmup.status()
+    assert state["status"] == "ready"
+    assert set(state["models"]) == {"detection", "qc"}
+
+
+def test_failed_warmup_does_not_block_serving(tmp_path, monkeypatch):
+    _configure(tmp_path, monkeypatch)
+
+    def boom(path):
+        raise RuntimeError("CUDA unavailable")
+
+    monkeypatch.setattr(object_detection, "get_model", boom)
+    warmup.run(SessionLocal, infer=False)
+    assert warmup.status()["status"] == "failed"
+    assert warmup.status()["error"] == "CUDA unavailable"
+
+
+def test_health_is_503_while_warming(client, monkeypatch):
+    monkeypatch.setitem(warmup._state, "status", "warming")
+    resp = client.get("/health")
+    assert resp.status_code == 503
+    assert resp.json()["status"] == "warming"
+
+    monkeypatch.setitem(warmup._state, "status", "ready")
+    assert client.get("/health").json() == {"status": "ok"}
+    assert client.get("/health/warmup").json()["status"] == "ready"
+
+
+def test_preloading_without_warmup_keeps_health_ok(client, monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_configured_models(db):
+        started.set()
+        release.wait(2)
+        return "", ""
+
+    monkeypatch.setattr(warmup, "configured_models", slow_configured_models)
+    thread = warmup.start(SessionLocal, infer=False)
+    try:
+        assert started.wait(2)
+        assert warmup.status()["status"] == "preloading"
+        assert client.get("/health").json() == {"status": "ok"}
+    finally:
+        release.set()
+        thread.join(2)
+    assert warmup.status()["status"] == "ready"
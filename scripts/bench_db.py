@@ -0,0 +1,136 @@
+"""Query latency of the hot batch endpoints on a large SQLite database.
+
+Builds a throw-away database (default: 200 batches x 1000 images x 5 defects
+= 1M defects) once without the secondary indexes and the "default" pragma
+profile, then again with both, and times the queries behind the batch list,
+batch detail, defect recount and batch delete endpoints.
+
+Usage:   python scripts/bench_db.py [--batches 200] [--images 1000] [--defects 5]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "qc_server"))
+
+from sqlalchemy import create_engine, func, insert  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.database import Base, apply_sqlite_profile  # noqa: E402
+from app.migrations import migrate  # noqa: E402
+from app.models import Batch, Candidate, Defect, Image  # noqa: E402
+
+
+def build(path, batches, images, defects, indexed):
+    eng = create_engine(f"sqlite:///{path}")
+    tables = Base.metadata.sorted_tables
+    saved = {t.name: set(t.indexes) for t in tables}
+    for t in tables:
+        t.indexes.clear()
+    try:
+        Base.metadata.create_all(eng)
+    finally:
+        for t in tables:
+            t.indexes.update(saved[t.name])
+    with eng.begin() as conn:
+        for b in range(batches):
+            bid = f"batch_{b:05d}"
+            conn.execute(insert(Batch), [{
+                "id": bid, "name": bid, "source_path": "/data", "status": "done",
+                "created_at": f"2026-01-01T00:{b // 60:02d}:{b % 60:02d}",
+                "image_count": images, "defect_count": images * defects, "model_info": {},
+            }])
+            conn.execute(insert(Image), [{
+                "id": f"{bid}_img_{i:06d}", "batch_id": bid, "filename": f"weld_{i:06d}.jpg",
+                "url": "", "width": 640, "height": 480, "status": "defect",
+                "reviewed": i % 3 == 0,
+            } for i in range(images)])
+            conn.execute(insert(Defect), [{
+                "id": f"{bid}_def_{i:06d}_{d}", "image_id": f"{bid}_img_{i:06d}",
+                "type": "porosity", "category": "surface", "confidence": 0.9,
+                "polygon": [[0, 0], [1, 0], [1, 1]],
+            } for i in range(images) for d in range(defects)])
+            conn.execute(insert(Candidate), [{
+                "image_id": f"{bid}_img_{i:06d}",
+                "type": "porosity", "category": "surface", "confidence": 0.9,
+                "polygon": [[0, 0], [1, 0], [1, 1]],
+            } for i in range(images)])
+    if indexed:
+        migrate(eng)  # a pre-index database: migrations add the indexes
+    eng.dispose()
+
+
+def queries(session, batch_id, image_id):
+    return {
+        "list_batches": lambda: (
+            session.query(Batch).order_by(Batch.created_at.desc()).all(),
+            session.query(Image.batch_id, func.count())
+            .filter(Image.reviewed.is_(True)).group_by(Image.batch_id).all(),
+        ),
+        "get_batch": lambda: session.query(Image).filter(Image.batch_id == batch_id).all(),
+        "recount_defects": lambda: (
+            session.query(func.count(Defect.id))
+            .join(Image, Defect.image_id == Image.id)
+            .filter(Image.batch_id == batch_id).scalar()
+        ),
+        "image_defects": lambda: (
+            session.query(Defect).filter(Defect.image_id == image_id).all()
+        ),
+        "delete_batch_selects": lambda: (
+            session.query(Candidate.id).filter(Candidate.image_id.in_(
+                session.query(Image.id).filter(Image.batch_id == batch_id))).all()
+        ),
+    }
+
+
+def measure(path, profile, batch_id, image_id, repeat):
+    eng = create_engine(f"sqlite:///{path}")
+    apply_sqlite_profile(eng, profile)
+    timings = {}
+    with Session(eng) as session:
+        for name, fn in queries(session, batch_id, image_id).items():
+            fn()  # warm the page cache
+            best = float("inf")
+            for _ in range(repeat):
+                started = time.perf_counter()
+                fn()
+                best = min(best, time.perf_counter() - started)
+                session.expunge_all()
+            timings[name] = best * 1000
+    eng.dispose()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batches", type=int, default=200)
+    parser.add_argument("--images", type=int, default=1000)
+    parser.add_argument("--defects", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    batch_id = f"batch_{args.batches // 2:05d}"
+    image_id = f"{batch_id}_img_{args.images // 2:06d}"
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, indexed, profile in (("before", False, "default"),
+                                        ("after", True, "performance")):
+            path = os.path.join(tmp, f"{label}.db")
+            started = time.perf_counter()
+            build(path, args.batches, args.images, args.defects, indexed)
+            print(f"built {label} ({args.batches * args.images * args.defects} defects) "
+                  f"in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+            results[label] = measure(path, profile, batch_id, image_id, args.repeat)
+
+    print(f"{'query':<22}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+    for name, before in results["before"].items():
+        after = results["after"][name]
+        print(f"{name:<22}{before:>12.2f}{after:>12.2f}{before / max(after, 1e-6):>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()